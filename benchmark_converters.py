@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Converter Benchmark Suite
+Generates seeded synthetic dumps shaped like production_backup.sql and runs every
+converter version on them, recording rows/sec, peak RSS and output equivalence as JSON
+"""
+
+import os
+import sys
+import json
+import random
+import hashlib
+import argparse
+import platform
+import resource
+import tempfile
+import importlib
+import contextlib
+import subprocess
+import time
+from typing import List, Dict, Any, Optional
+
+# Converter versions, by the module holding their SQLiteToPostgreSQLConverter
+CONVERTER_MODULES = {
+    'v1': 'convert_sqlite_to_postgresql',
+    'v2': 'convert_sqlite_to_postgresql_v2',
+    'final': 'convert_sqlite_to_postgresql_final',
+}
+
+# Variant whose output the others are compared with
+REFERENCE_VARIANT = 'final'
+
+DEFAULT_ROW_COUNTS = [10000, 100000, 1000000]
+
+DEFAULT_SEED = 20250930
+
+DEFAULT_RESULTS_FILE = 'benchmark_results.json'
+
+# Generated dumps are kept here between runs, one file per (rows, seed)
+DEFAULT_WORK_DIR = os.path.join(tempfile.gettempdir(), 'converter-benchmark')
+
+# Epoch-ms range of the synthetic created_at/updated_at values (September 2025)
+TIMESTAMP_START = 1757619795000
+TIMESTAMP_SPAN = 30 * 24 * 3600 * 1000
+
+CUID_ALPHABET = 'abcdefghijklmnopqrstuvwxyz0123456789'
+
+SCHEMA_SQL = '''CREATE TABLE IF NOT EXISTS "Brand" (
+    "id" TEXT NOT NULL PRIMARY KEY,
+    "code" INTEGER,
+    "name" TEXT NOT NULL,
+    "slug" TEXT NOT NULL,
+    "created_at" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS "Category" (
+    "id" TEXT NOT NULL PRIMARY KEY,
+    "name" TEXT NOT NULL,
+    "slug" TEXT NOT NULL,
+    "parent_id" TEXT,
+    "created_at" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT "Category_parent_id_fkey" FOREIGN KEY ("parent_id") REFERENCES "Category" ("id") ON DELETE SET NULL ON UPDATE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "Product" (
+    "id" TEXT NOT NULL PRIMARY KEY,
+    "sku" TEXT,
+    "name" TEXT NOT NULL,
+    "slug" TEXT NOT NULL,
+    "brand_id" TEXT,
+    "category_id" TEXT,
+    "description" TEXT,
+    "attributes" JSONB,
+    "unit" TEXT,
+    "price_base" DECIMAL NOT NULL,
+    "currency" TEXT NOT NULL DEFAULT 'ARS',
+    "tax_rate" DECIMAL,
+    "stock_qty" DECIMAL,
+    "is_active" BOOLEAN NOT NULL DEFAULT true,
+    "featured" BOOLEAN NOT NULL DEFAULT false,
+    "is_deleted" BOOLEAN NOT NULL DEFAULT false,
+    "created_at" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT "Product_category_id_fkey" FOREIGN KEY ("category_id") REFERENCES "Category" ("id") ON DELETE SET NULL ON UPDATE CASCADE,
+    CONSTRAINT "Product_brand_id_fkey" FOREIGN KEY ("brand_id") REFERENCES "Brand" ("id") ON DELETE SET NULL ON UPDATE CASCADE
+);'''
+
+INDEX_SQL = '''CREATE UNIQUE INDEX "Brand_slug_key" ON "Brand"("slug");
+CREATE UNIQUE INDEX "Category_slug_key" ON "Category"("slug");
+CREATE UNIQUE INDEX "Product_sku_key" ON "Product"("sku");
+CREATE UNIQUE INDEX "Product_slug_key" ON "Product"("slug");
+CREATE INDEX "Product_brand_id_idx" ON "Product"("brand_id");
+CREATE INDEX "Product_category_id_idx" ON "Product"("category_id");'''
+
+BRAND_NAMES = ['Legrand', 'Philips', 'ABB', 'Schneider Electric', 'Siemens', 'SICA', 'TREFI', 'TUNISAN',
+               'ELEKTRON', 'FERROLUX', 'MACROLED']
+CATEGORY_NAMES = ['Material Eléctrico', 'Iluminación', 'Interruptores', 'Tomacorrientes', 'Cables',
+                  'Protecciones']
+PRODUCT_WORDS = ['SILIGHT', 'BASTIDOR', 'Interruptor', 'Tomacorriente', 'Cable', 'Lámpara', 'LED', 'Disyuntor',
+                 'Diferencial', 'Unipolar', 'Schuko', 'BIANCO', 'REALE', 'STRADA', 'CHAMPAGNE', 'Caño', 'Tapa']
+UNITS = ['unidad', 'unidad', 'unidad', 'rollo', 'metro', 'caja']
+
+
+class SyntheticDumpGenerator:
+    def __init__(self, seed: int = DEFAULT_SEED):
+        self.rng = random.Random(seed)
+
+    def cuid(self) -> str:
+        """Random id shaped like a Prisma cuid"""
+        return 'c' + ''.join(self.rng.choice(CUID_ALPHABET) for _ in range(24))
+
+    def timestamp(self) -> int:
+        """Epoch-ms timestamp, as SQLite stores Prisma DateTime values"""
+        return TIMESTAMP_START + self.rng.randrange(TIMESTAMP_SPAN)
+
+    def quote(self, text: str) -> str:
+        """SQLite string literal, with quotes doubled"""
+        return "'" + text.replace("'", "''") + "'"
+
+    def product_values(self, number: int, brand_ids: List[str], category_ids: List[str]) -> str:
+        """VALUES body of one Product row, mixing catalog-style and price-list-style rows"""
+        rng = self.rng
+        words = rng.sample(PRODUCT_WORDS, rng.randint(2, 4))
+        if rng.random() < 0.1:
+            # Inch sizes bring the '' escapes of the real catalog
+            words.append(f"{rng.choice(['1/2', '3/4', '1'])}'")
+        name = ' '.join(words)
+        sku = str(200000 + number)
+        slug = f"{sku}-{'-'.join(word.lower() for word in words)}".replace("'", '')
+
+        if rng.random() < 0.3:
+            description = self.quote(f"{name}, línea {rng.choice(BRAND_NAMES)} de {rng.randint(1, 63)}A")
+            attributes = {'amperaje': f"{rng.choice([10, 16, 25, 32])}A", 'polos': rng.randint(1, 4),
+                          'color': rng.choice(['Blanco', 'Negro', "Marfil 'Reale'"]),
+                          'puesta_tierra': rng.random() < 0.5}
+            attributes = self.quote(json.dumps(attributes, ensure_ascii=False, separators=(',', ':')))
+            unit = self.quote(rng.choice(UNITS))
+        else:
+            description = attributes = unit = 'NULL'
+
+        if rng.random() < 0.5:
+            price = str(rng.randrange(100, 100000) * 10)
+        else:
+            # SQLite writes REAL values with 17 significant digits
+            price = f"{rng.uniform(100, 5000):.16g}"
+
+        values = [
+            self.quote(self.cuid()), self.quote(sku), self.quote(name), self.quote(slug),
+            self.quote(rng.choice(brand_ids)) if rng.random() < 0.95 else 'NULL',
+            self.quote(rng.choice(category_ids)) if rng.random() < 0.6 else 'NULL',
+            description, attributes, unit, price,
+            self.quote('USD' if rng.random() < 0.1 else 'ARS'),
+            rng.choice(['21', '10.5', 'NULL']),
+            str(rng.randint(0, 500)),
+            str(int(rng.random() < 0.9)), str(int(rng.random() < 0.05)), str(int(rng.random() < 0.02)),
+        ]
+        created_at = self.timestamp()
+        values += [str(created_at), str(created_at + self.rng.randrange(TIMESTAMP_SPAN))]
+        return ','.join(values)
+
+    def write_dump(self, dump_file: str, rows: int):
+        """Write a SQLite .dump style file with Brand, Category and `rows` Product rows"""
+        brand_ids = [self.cuid() for _ in BRAND_NAMES]
+        category_ids = [self.cuid() for _ in CATEGORY_NAMES]
+
+        with open(dump_file, 'w', encoding='utf-8') as f:
+            f.write('PRAGMA foreign_keys=OFF;\nBEGIN TRANSACTION;\n')
+            brand_sql, category_sql, product_sql = SCHEMA_SQL.split('\nCREATE TABLE')
+            f.write(brand_sql + '\n')
+            for code, (brand_id, name) in enumerate(zip(brand_ids, BRAND_NAMES), 1001):
+                f.write(f"INSERT INTO Brand VALUES({self.quote(brand_id)},{code},{self.quote(name)},"
+                        f"{self.quote(name.lower().replace(' ', '-'))},{self.timestamp()});\n")
+            f.write('CREATE TABLE' + category_sql + '\n')
+            for category_id, name in zip(category_ids, CATEGORY_NAMES):
+                f.write(f"INSERT INTO Category VALUES({self.quote(category_id)},{self.quote(name)},"
+                        f"{self.quote(name.lower().replace(' ', '-'))},NULL,{self.timestamp()});\n")
+            f.write('CREATE TABLE' + product_sql + '\n')
+            for number in range(rows):
+                f.write(f"INSERT INTO Product VALUES({self.product_values(number, brand_ids, category_ids)});\n")
+            f.write(INDEX_SQL + '\nCOMMIT;\n')
+
+
+def ensure_dump(work_dir: str, rows: int, seed: int) -> str:
+    """Path of the synthetic dump for (rows, seed), generating it on first use"""
+    os.makedirs(work_dir, exist_ok=True)
+    dump_file = os.path.join(work_dir, f'synthetic_{rows}_{seed}.sql')
+    if not os.path.exists(dump_file):
+        print(f"Generating {rows} row dump: {dump_file}")
+        partial_file = dump_file + '.tmp'
+        SyntheticDumpGenerator(seed).write_dump(partial_file, rows)
+        os.replace(partial_file, dump_file)
+    return dump_file
+
+
+def output_digests(output_file: str) -> Dict[str, str]:
+    """Digest of the whole output (minus its generation time) and an order-free digest of its INSERT lines"""
+    whole = hashlib.sha256()
+    inserts = 0
+    count = 0
+    with open(output_file, 'rb') as f:
+        for line in f:
+            if line.startswith(b'-- Generated on:'):
+                continue
+            whole.update(line.rstrip(b'\n'))
+            whole.update(b'\n')
+            if line.startswith(b'INSERT INTO'):
+                digest = hashlib.blake2b(line.rstrip(b'\n'), digest_size=8).digest()
+                inserts = (inserts + int.from_bytes(digest, 'big')) % 2 ** 64
+                count += 1
+    return {'output_sha256': whole.hexdigest(), 'insert_digest': f'{inserts:016x}', 'insert_lines': count}
+
+
+def run_worker(variant: str, input_file: str, output_file: str):
+    """Convert one dump in this process and print its timing and peak RSS as JSON"""
+    module = importlib.import_module(CONVERTER_MODULES[variant])
+    converter = module.SQLiteToPostgreSQLConverter()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        converter.convert_file(input_file, output_file)
+    seconds = time.perf_counter() - start
+
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+    print(json.dumps({'seconds': seconds, 'peak_rss_bytes': peak_rss}))
+
+
+def benchmark_variant(variant: str, dump_file: str, rows: int, work_dir: str) -> Dict[str, Any]:
+    """Run one converter on one dump in a fresh interpreter, so peak RSS is its own"""
+    output_file = os.path.join(work_dir, f'{os.path.basename(dump_file)[:-4]}.{variant}.out.sql')
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', variant, dump_file, output_file],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        return {'variant': variant, 'rows': rows, 'error': completed.stderr.strip().splitlines()[-1:]}
+
+    measured = json.loads(completed.stdout.strip().splitlines()[-1])
+    result = {
+        'variant': variant,
+        'rows': rows,
+        'dump_bytes': os.path.getsize(dump_file),
+        'seconds': round(measured['seconds'], 3),
+        'rows_per_sec': round(rows / measured['seconds']),
+        'peak_rss_mib': round(measured['peak_rss_bytes'] / (1024 * 1024), 1),
+    }
+    result.update(output_digests(output_file))
+    os.remove(output_file)
+    return result
+
+
+def git_commit() -> Optional[str]:
+    """Commit the benchmark ran on, so results can be compared across commits"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(row_counts: List[int], variants: List[str], seed: int, work_dir: str) -> Dict[str, Any]:
+    """Benchmark every variant on a dump of each size, marking outputs that differ from the reference"""
+    results = []
+    for rows in row_counts:
+        dump_file = ensure_dump(work_dir, rows, seed)
+        size_results = []
+        for variant in variants:
+            print(f"  {rows:>9} rows  {variant:<6}", end='', flush=True)
+            result = benchmark_variant(variant, dump_file, rows, work_dir)
+            size_results.append(result)
+            if 'error' in result:
+                print(f"  failed: {result['error']}")
+            else:
+                print(f"  {result['seconds']:8.2f}s  {result['rows_per_sec']:>9} rows/s  "
+                      f"{result['peak_rss_mib']:8.1f} MiB")
+
+        # The converters differ in DDL and header text; equivalence is judged on the converted rows
+        reference = next((result for result in size_results
+                          if result['variant'] == REFERENCE_VARIANT and 'error' not in result), None)
+        for result in size_results:
+            if reference is not None and 'error' not in result:
+                result['rows_equivalent'] = (result['insert_digest'] == reference['insert_digest'] and
+                                             result['insert_lines'] == reference['insert_lines'])
+        results.extend(size_results)
+
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'reference': REFERENCE_VARIANT,
+        'results': results,
+    }
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--worker':
+        run_worker(*sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description='Benchmark the SQLite to PostgreSQL converters on synthetic dumps')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROW_COUNTS,
+                        help='Product rows per synthetic dump (default: 10k 100k 1M)')
+    parser.add_argument('--variants', nargs='+', choices=list(CONVERTER_MODULES), default=list(CONVERTER_MODULES),
+                        help='converter versions to run')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='generator seed')
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help='where generated dumps are kept')
+    parser.add_argument('--results', default=DEFAULT_RESULTS_FILE, help='JSON file the results are written to')
+    args = parser.parse_args()
+
+    print("Starting converter benchmark...")
+    report = run_benchmarks(args.rows, args.variants, args.seed, args.work_dir)
+
+    with open(args.results, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    differing = [f"{result['variant']}@{result['rows']}" for result in report['results']
+                 if result.get('rows_equivalent') is False]
+    if differing:
+        print(f"\nConverted rows differ from {REFERENCE_VARIANT}: {', '.join(differing)}")
+    print(f"\nResults written to: {args.results}")
+
+if __name__ == "__main__":
+    main()
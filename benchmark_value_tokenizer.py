@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the INSERT VALUES tokenizers
+Compares the original per-character loops with the current tokenizers on a dump
+and checks that both produce exactly the same tokens
+"""
+
+import re
+import sys
+import time
+import random
+from typing import List, Callable
+
+from convert_sqlite_to_postgresql import SQLiteToPostgreSQLConverter as ConverterV1
+from convert_sqlite_to_postgresql_final import SQLiteToPostgreSQLConverter as ConverterFinal
+
+DEFAULT_DUMP = 'database/backups/production_backup.sql'
+
+
+def legacy_parse_values_safely(values_str: str) -> List[str]:
+    """Original per-character tokenizer of the final/v2 converters"""
+    values = []
+    current_value = ""
+    in_quotes = False
+    quote_char = None
+    i = 0
+
+    while i < len(values_str):
+        char = values_str[i]
+
+        if not in_quotes:
+            if char in ["'"]:
+                in_quotes = True
+                quote_char = char
+                current_value += char
+            elif char == ',':
+                values.append(current_value.strip())
+                current_value = ""
+            else:
+                current_value += char
+        else:
+            if char == quote_char:
+                if i + 1 < len(values_str) and values_str[i + 1] == quote_char:
+                    current_value += char + char
+                    i += 1
+                else:
+                    in_quotes = False
+                    quote_char = None
+                    current_value += char
+            else:
+                current_value += char
+
+        i += 1
+
+    if current_value.strip():
+        values.append(current_value.strip())
+
+    return values
+
+
+def legacy_parse_insert_values(values_str: str) -> List[str]:
+    """Original per-character tokenizer of the v1 converter"""
+    values = []
+    current_value = ""
+    in_quotes = False
+    quote_char = None
+    i = 0
+    paren_depth = 0
+
+    while i < len(values_str):
+        char = values_str[i]
+
+        if not in_quotes:
+            if char in ["'", '"']:
+                in_quotes = True
+                quote_char = char
+                current_value += char
+            elif char == '(':
+                paren_depth += 1
+                current_value += char
+            elif char == ')':
+                paren_depth -= 1
+                current_value += char
+            elif char == ',' and paren_depth == 0:
+                values.append(current_value.strip())
+                current_value = ""
+            else:
+                current_value += char
+        else:
+            current_value += char
+            if char == quote_char:
+                if i + 1 < len(values_str) and values_str[i + 1] == quote_char:
+                    current_value += quote_char
+                    i += 1
+                else:
+                    in_quotes = False
+                    quote_char = None
+
+        i += 1
+
+    if current_value.strip():
+        values.append(current_value.strip())
+
+    return values
+
+
+def load_values_clauses(dump_file: str) -> List[str]:
+    """Extract the VALUES(...) body of every INSERT line in a dump"""
+    clauses = []
+    with open(dump_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = re.match(r'INSERT INTO ("?\w+"?) VALUES\((.*)\);', line.strip())
+            if match:
+                clauses.append(match.group(2))
+    return clauses
+
+
+def random_clauses(count: int, seed: int = 1) -> List[str]:
+    """Generate adversarial clauses: nested quotes, commas, parentheses, blobs"""
+    rng = random.Random(seed)
+    alphabet = ["'", "''", ',', ' ', '(', ')', '"', 'a', '1', 'X', 'NULL', '.', '-']
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))) for _ in range(count)]
+
+
+def time_tokenizer(tokenize: Callable[[str], List[str]], clauses: List[str], rounds: int) -> float:
+    """Return the best wall-clock time of tokenizing all clauses"""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for clause in clauses:
+            tokenize(clause)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    dump_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DUMP
+    rounds = 5
+
+    clauses = load_values_clauses(dump_file)
+    total_bytes = sum(len(clause) for clause in clauses)
+    print(f"Loaded {len(clauses)} VALUES clauses ({total_bytes / 1024:.0f} KiB) from {dump_file}")
+
+    pairs = [
+        ('final/v2 parse_values_safely', legacy_parse_values_safely, ConverterFinal().parse_values_safely),
+        ('v1 parse_insert_values', legacy_parse_insert_values, ConverterV1().parse_insert_values),
+    ]
+
+    fuzz = random_clauses(20000)
+    for name, legacy, current in pairs:
+        for clause in clauses + fuzz:
+            if legacy(clause) != current(clause):
+                print(f"MISMATCH in {name}: {clause!r}")
+                sys.exit(1)
+
+        legacy_time = time_tokenizer(legacy, clauses, rounds)
+        current_time = time_tokenizer(current, clauses, rounds)
+        print(f"\n{name}")
+        print(f"  legacy:  {legacy_time * 1000:8.1f} ms")
+        print(f"  current: {current_time * 1000:8.1f} ms")
+        print(f"  speedup: {legacy_time / current_time:8.1f}x")
+
+    print("\nToken output identical on dump and fuzz inputs")
+
+
+if __name__ == "__main__":
+    main()
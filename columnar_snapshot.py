@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Columnar Dump Snapshot
+Parses a SQLite dump once into per-table column files (NumPy arrays, memory-mappable)
+that the INSERT/COPY emitters, the price diff and the load verifier read without re-tokenizing
+"""
+
+import os
+import re
+import sys
+import json
+import array
+import argparse
+import contextlib
+from decimal import Decimal
+from typing import List, Dict, Tuple, Any, Optional, Iterator
+
+from convert_sqlite_to_postgresql_final import (SQLiteToPostgreSQLConverter, MappedDump, INSERT_PATTERN,
+                                                OUTPUT_FORMATS)
+from compressed_io import STANDARD_STREAM, detect_compression, open_input, open_output
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SNAPSHOT_MANIFEST_FILE = 'snapshot.json'
+
+# Bump when the layout of the column files changes
+SNAPSHOT_VERSION = 1
+
+INTEGER_LITERAL = re.compile(r'-?(0|[1-9][0-9]*)$')
+DECIMAL_LITERAL = re.compile(r'(-?)([0-9]+)\.([0-9]+)$')
+
+INT64_MAX = 2 ** 63 - 1
+
+# Column kinds, from most to least specific; a column holds the first kind all its literals fit:
+#   integer: int64 values
+#   decimal: int64 mantissa and int8 count of fraction digits, rendered back digit for digit
+#   string:  quoted literals, stored unquoted as UTF-8 bytes with int64 offsets
+#   literal: anything else (blobs, expressions), stored as the literal text
+COLUMN_KINDS = ('integer', 'decimal', 'string', 'literal')
+
+# Files of each column kind, with their dtype
+COLUMN_PARTS = {
+    'integer': (('values', 'int64'), ('nulls', 'bool')),
+    'decimal': (('values', 'int64'), ('scales', 'int8'), ('nulls', 'bool')),
+    'string': (('offsets', 'int64'), ('data', 'uint8'), ('nulls', 'bool')),
+    'literal': (('offsets', 'int64'), ('data', 'uint8'), ('nulls', 'bool')),
+}
+
+
+def require_numpy():
+    if numpy is None:
+        raise RuntimeError("numpy not installed: pip install numpy")
+
+
+def quote_string(value: str) -> str:
+    """SQL literal of a string, as the dump writes it"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def render_decimal(mantissa: int, scale: int) -> str:
+    """SQL literal of mantissa * 10**-scale with exactly `scale` fraction digits"""
+    digits = str(abs(mantissa)).rjust(scale + 1, '0')
+    sign = '-' if mantissa < 0 else ''
+    return f'{sign}{digits[:-scale]}.{digits[-scale:]}'
+
+
+def classify_literal(literal: str) -> Tuple[str, Any]:
+    """Most specific kind a literal can be stored as, with its stored value"""
+    if INTEGER_LITERAL.match(literal):
+        value = int(literal)
+        if -INT64_MAX <= value <= INT64_MAX and str(value) == literal:
+            return 'integer', value
+    match = DECIMAL_LITERAL.match(literal)
+    if match:
+        mantissa = int(match.group(2) + match.group(3))
+        scale = len(match.group(3))
+        if match.group(1):
+            mantissa = -mantissa
+        # Only literals that render back identically ('1.50', not '01.5' or '-0.0')
+        if mantissa <= INT64_MAX and -INT64_MAX <= mantissa and scale <= 127 \
+                and render_decimal(mantissa, scale) == literal:
+            return 'decimal', (mantissa, scale)
+    if len(literal) >= 2 and literal[0] == "'" and literal[-1] == "'":
+        value = literal[1:-1].replace("''", "'")
+        if quote_string(value) == literal:
+            return 'string', value
+    return 'literal', literal
+
+
+def literal_value(literal: str) -> Any:
+    """Python value of a literal of a mixed column; expressions and blobs stay as their text"""
+    kind, value = classify_literal(literal)
+    if kind == 'decimal':
+        mantissa, scale = value
+        return Decimal(mantissa).scaleb(-scale)
+    return value
+
+
+class ColumnBuilder:
+    """Accumulates one column in compact arrays while the dump is read"""
+
+    __slots__ = ('kind', 'values', 'scales', 'offsets', 'data', 'nulls', 'count')
+
+    def __init__(self, count: int = 0):
+        self.kind = 'integer'
+        self.values = array.array('q', bytes(8 * count))
+        self.scales = array.array('b', bytes(count))
+        self.offsets = array.array('q', [0])
+        self.data = bytearray()
+        self.nulls = bytearray(b'\x01' * count)
+        self.count = count
+
+    def append(self, literal: Optional[str]):
+        """Add a literal (None for a value the row does not have)"""
+        if literal is None or literal == 'NULL':
+            self.append_null()
+            return
+
+        kind, value = classify_literal(literal)
+        if kind != self.kind and not (kind == 'integer' and self.kind == 'decimal'):
+            self.promote(kind)
+
+        self.nulls.append(0)
+        self.count += 1
+        if self.kind == 'integer':
+            self.values.append(value)
+        elif self.kind == 'decimal':
+            mantissa, scale = (value, 0) if kind == 'integer' else value
+            self.values.append(mantissa)
+            self.scales.append(scale)
+        else:
+            self.append_text(value if self.kind == kind else literal)
+
+    def append_null(self):
+        self.nulls.append(1)
+        self.count += 1
+        if self.kind in ('integer', 'decimal'):
+            self.values.append(0)
+            if self.kind == 'decimal':
+                self.scales.append(0)
+        else:
+            self.offsets.append(self.offsets[-1])
+
+    def append_text(self, text: str):
+        self.data += text.encode('utf-8')
+        self.offsets.append(len(self.data))
+
+    def literals(self) -> List[Optional[str]]:
+        """Literals of the values added so far (None for NULL)"""
+        column = Column(self.kind, {'values': self.values, 'scales': self.scales, 'offsets': self.offsets,
+                                    'data': self.data, 'nulls': self.nulls}, self.count)
+        return column.literals(0, self.count)
+
+    def promote(self, kind: str):
+        """Widen the column to hold a literal of another kind, re-storing the values so far"""
+        if self.kind == 'integer' and kind == 'decimal':
+            self.kind = 'decimal'
+            self.scales = array.array('b', bytes(self.count))
+            return
+        if self.kind == 'literal':
+            return
+
+        literals = self.literals()
+        # Numbers seen so far can only share a column with strings as literals
+        new_kind = 'string' if kind == 'string' and all(literal is None for literal in literals) else 'literal'
+
+        self.kind = new_kind
+        self.values = array.array('q')
+        self.scales = array.array('b')
+        self.offsets = array.array('q', [0])
+        self.data = bytearray()
+        self.nulls = bytearray()
+        self.count = 0
+        for literal in literals:
+            if literal is None:
+                self.append_null()
+            else:
+                self.nulls.append(0)
+                self.count += 1
+                self.append_text(literal)
+
+    def save(self, directory: str, prefix: str) -> Dict[str, Any]:
+        """Write the column's files, returning their manifest entry"""
+        files = {}
+        for part, dtype in COLUMN_PARTS[self.kind]:
+            buffer = getattr(self, part)
+            file_name = f'{prefix}.{part}.npy'
+            numpy.save(os.path.join(directory, file_name), numpy.frombuffer(buffer, dtype=dtype)
+                       if len(buffer) else numpy.zeros(0, dtype=dtype))
+            files[part] = file_name
+        return {'kind': self.kind, 'files': files}
+
+
+class Column:
+    """One stored column, its arrays memory-mapped from the snapshot files"""
+
+    __slots__ = ('kind', 'parts', 'count')
+
+    def __init__(self, kind: str, parts: Dict[str, Any], count: int):
+        self.kind = kind
+        self.parts = parts
+        self.count = count
+
+    @classmethod
+    def load(cls, directory: str, entry: Dict[str, Any], count: int) -> 'Column':
+        parts = {part: numpy.load(os.path.join(directory, file_name), mmap_mode='r')
+                 for part, file_name in entry['files'].items()}
+        return cls(entry['kind'], parts, count)
+
+    def texts(self, start: int, stop: int) -> List[str]:
+        """Stored text of rows start..stop of a string/literal column"""
+        offsets = self.parts['offsets'][start:stop + 1].tolist()
+        if not offsets:
+            return []
+        data = bytes(self.parts['data'][offsets[0]:offsets[-1]])
+        base = offsets[0]
+        return [data[low - base:high - base].decode('utf-8') for low, high in zip(offsets, offsets[1:])]
+
+    def literals(self, start: int, stop: int) -> List[Optional[str]]:
+        """SQL literals of rows start..stop, exactly as the dump wrote them (None for NULL)"""
+        nulls = self.parts['nulls'][start:stop]
+        if self.kind == 'integer':
+            literals = [str(value) for value in self.parts['values'][start:stop].tolist()]
+        elif self.kind == 'decimal':
+            literals = [str(mantissa) if scale == 0 else render_decimal(mantissa, scale)
+                        for mantissa, scale in zip(self.parts['values'][start:stop].tolist(),
+                                                   self.parts['scales'][start:stop].tolist())]
+        elif self.kind == 'string':
+            literals = [quote_string(text) for text in self.texts(start, stop)]
+        else:
+            literals = self.texts(start, stop)
+        return [None if null else literal for literal, null in zip(literals, bytes(nulls))]
+
+    def values(self, start: int = 0, stop: Optional[int] = None) -> List[Any]:
+        """Python values of rows start..stop: int, Decimal, str or None"""
+        stop = self.count if stop is None else stop
+        nulls = bytes(self.parts['nulls'][start:stop])
+        if self.kind == 'integer':
+            values = self.parts['values'][start:stop].tolist()
+        elif self.kind == 'decimal':
+            values = [Decimal(mantissa).scaleb(-scale)
+                      for mantissa, scale in zip(self.parts['values'][start:stop].tolist(),
+                                                 self.parts['scales'][start:stop].tolist())]
+        elif self.kind == 'string':
+            values = self.texts(start, stop)
+        else:
+            values = [literal_value(literal) for literal in self.texts(start, stop)]
+        return [None if null else value for value, null in zip(values, nulls)]
+
+    def scaled(self, digits: int) -> Any:
+        """Integer array of value * 10**digits, rounded half-even, for integer/decimal columns"""
+        values = numpy.array(self.parts['values'], dtype=numpy.int64)
+        if self.kind == 'integer':
+            return values * 10 ** digits
+        shift = digits - numpy.array(self.parts['scales'], dtype=numpy.int64)
+        up = numpy.where(shift > 0, values * 10 ** numpy.clip(shift, 0, 18), 0)
+        divisor = 10 ** numpy.clip(-shift, 0, 18)
+        quotient, remainder = numpy.divmod(values, divisor)
+        # Half-even: round up past half, and at exactly half when the quotient is odd
+        twice = 2 * remainder
+        down = quotient + ((twice > divisor) | ((twice == divisor) & (quotient % 2 == 1)))
+        return numpy.where(shift >= 0, numpy.where(shift > 0, up, values), down)
+
+    def null_mask(self) -> Any:
+        return numpy.array(self.parts['nulls'], dtype=bool)
+
+
+class TableBuilder:
+    """Columns of one table being read from the dump"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.columns = []
+        self.widths = array.array('H')
+        self.rows = 0
+
+    def append(self, literals: List[str]):
+        while len(self.columns) < len(literals):
+            self.columns.append(ColumnBuilder(self.rows))
+        for position, column in enumerate(self.columns):
+            column.append(literals[position] if position < len(literals) else None)
+        self.widths.append(len(literals))
+        self.rows += 1
+
+
+def build_snapshot(input_file: str, snapshot_dir: str, converter: Optional[SQLiteToPostgreSQLConverter] = None):
+    """Parse a dump once and write it as a columnar snapshot directory.
+
+    The snapshot keeps every non-row statement in order and, in between, the
+    ranges of rows each run of INSERTs added to a table, so emitting from it
+    reproduces the conversion of the dump itself.
+    """
+    require_numpy()
+    converter = converter or SQLiteToPostgreSQLConverter()
+    parse = converter.parse_values_safely
+
+    if input_file == STANDARD_STREAM or detect_compression(input_file) != 'none':
+        source = open_input(input_file)
+        statements = converter.iter_statements(source)
+    else:
+        source = MappedDump(input_file)
+        statements = source.iter_statements()
+
+    tables = {}
+    entries = []
+    with source:
+        for statement in statements:
+            match = INSERT_PATTERN.match(statement) if statement.startswith('INSERT INTO') else None
+            if match is None:
+                entries.append({'statement': statement})
+                continue
+
+            table_name = match.group(1)
+            table = tables.get(table_name)
+            if table is None:
+                table = tables[table_name] = TableBuilder(table_name)
+            last = entries[-1] if entries else None
+            if last is None or last.get('table') != table_name:
+                last = {'table': table_name, 'start': table.rows, 'stop': table.rows}
+                entries.append(last)
+            table.append(parse(match.group(2)))
+            last['stop'] += 1
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    manifest_tables = {}
+    for table_name, table in tables.items():
+        table_dir = os.path.join(snapshot_dir, table_name)
+        os.makedirs(table_dir, exist_ok=True)
+        entry = {'rows': table.rows, 'columns': [column.save(table_dir, f'c{position}')
+                                                  for position, column in enumerate(table.columns)]}
+        # Rows are normally all as wide as the table; keep their widths only when they are not
+        if any(width != len(table.columns) for width in table.widths):
+            numpy.save(os.path.join(table_dir, 'widths.npy'), numpy.frombuffer(table.widths, dtype='uint16'))
+            entry['widths'] = 'widths.npy'
+        manifest_tables[table_name] = entry
+
+    manifest = {'version': SNAPSHOT_VERSION, 'source': os.path.basename(input_file),
+                'entries': entries, 'tables': manifest_tables}
+    with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+
+    rows = sum(table.rows for table in tables.values())
+    print(f"Wrote {rows} rows of {len(tables)} tables to {snapshot_dir}")
+
+
+def is_snapshot(path: str) -> bool:
+    """Whether a path is a snapshot directory written by build_snapshot"""
+    return os.path.isfile(os.path.join(path, SNAPSHOT_MANIFEST_FILE))
+
+
+class ColumnarSnapshot:
+    """Read side of a snapshot directory; column arrays are memory-mapped on first use"""
+
+    def __init__(self, snapshot_dir: str):
+        require_numpy()
+        self.snapshot_dir = snapshot_dir
+        with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != SNAPSHOT_VERSION:
+            raise RuntimeError(f"Snapshot {snapshot_dir} has version {self.manifest.get('version')}, "
+                               f"expected {SNAPSHOT_VERSION}: rebuild it")
+        self.loaded = {}
+
+    @property
+    def tables(self) -> List[str]:
+        return list(self.manifest['tables'])
+
+    def create_statements(self) -> Iterator[str]:
+        """The dump's CREATE TABLE statements"""
+        for entry in self.manifest['entries']:
+            statement = entry.get('statement')
+            if statement is not None and statement.startswith('CREATE TABLE'):
+                yield statement
+
+    def column_names(self, table_name: str) -> List[str]:
+        """Column names of a table, from its CREATE TABLE statement"""
+        for statement in self.create_statements():
+            if statement.startswith(f'CREATE TABLE IF NOT EXISTS "{table_name}" '):
+                return SQLiteToPostgreSQLConverter().parse_table_schema(table_name, statement)['columns']
+        raise RuntimeError(f"Snapshot {self.snapshot_dir} has no table {table_name}")
+
+    def named_column(self, table_name: str, column_name: str) -> Column:
+        return self.column(table_name, self.column_names(table_name).index(column_name))
+
+    def table_columns(self, table_name: str) -> Tuple[List[Column], Optional[Any]]:
+        """Columns of a table and its row widths (None when every row has all columns)"""
+        loaded = self.loaded.get(table_name)
+        if loaded is None:
+            entry = self.manifest['tables'][table_name]
+            table_dir = os.path.join(self.snapshot_dir, table_name)
+            columns = [Column.load(table_dir, column, entry['rows']) for column in entry['columns']]
+            widths = numpy.load(os.path.join(table_dir, entry['widths']), mmap_mode='r') \
+                if 'widths' in entry else None
+            loaded = self.loaded[table_name] = (columns, widths)
+        return loaded
+
+    def rows(self, table_name: str) -> int:
+        return self.manifest['tables'][table_name]['rows']
+
+    def column(self, table_name: str, position: int) -> Column:
+        return self.table_columns(table_name)[0][position]
+
+    def literal_rows(self, table_name: str, start: int, stop: int) -> List[List[str]]:
+        """Rows start..stop as lists of SQL literals, as parse_values_safely returns them"""
+        columns, widths = self.table_columns(table_name)
+        by_column = [column.literals(start, stop) for column in columns]
+        rows = [['NULL' if literal is None else literal for literal in row] for row in zip(*by_column)]
+        if widths is not None:
+            rows = [row[:width] for row, width in zip(rows, widths[start:stop].tolist())]
+        return rows
+
+    def iter_groups(self, converter: SQLiteToPostgreSQLConverter,
+                    output_format: str) -> Iterator[Tuple[Optional[str], List[str]]]:
+        """Converted (table_name, lines) groups, like iter_converted_groups gives for the dump"""
+        chunk_size = converter.row_chunk_size(output_format)
+        for entry in self.manifest['entries']:
+            statement = entry.get('statement')
+            if statement is not None:
+                yield None, converter.convert_statement(statement)
+                continue
+
+            table_name = entry['table']
+            for start in range(entry['start'], entry['stop'], chunk_size):
+                rows = self.literal_rows(table_name, start, min(start + chunk_size, entry['stop']))
+                outputs = converter.format_row_outputs(
+                    table_name, converter.convert_parsed_rows(table_name, rows), output_format)
+                yield table_name, converter.finish_row_outputs(table_name, outputs, output_format)
+
+    def emit(self, converter: SQLiteToPostgreSQLConverter, output_file: str, output_format: str = 'insert',
+             output_compression: str = 'auto'):
+        """Write the PostgreSQL script of the snapshot, as convert_file writes it for the dump"""
+        print("Extracting table schemas...")
+        for statement in self.create_statements():
+            converter.learn_table_schema(statement)
+
+        print("\nConverting SQL statements (from snapshot)...")
+        with open_output(output_file, output_compression) as f:
+            f.write('\n'.join(converter.generate_header()))
+            for line in converter.join_groups(self.iter_groups(converter, output_format), output_format):
+                f.write('\n')
+                f.write(line)
+
+    def value_rows(self, table_name: str) -> Iterator[Tuple[Any, ...]]:
+        """Rows of a table as tuples of Python values (int, Decimal, str or None)"""
+        columns, widths = self.table_columns(table_name)
+        rows = zip(*[column.values() for column in columns])
+        if widths is None:
+            return rows
+        return (row[:width] for row, width in zip(rows, widths.tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse a SQLite dump once into a columnar snapshot, '
+                                                 'or write a PostgreSQL script from a snapshot')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='write a snapshot of a dump')
+    build.add_argument('input', help="dump written by `sqlite3 DB .dump`, or '-' for standard input")
+    build.add_argument('snapshot_dir', help='directory to write the snapshot to')
+    emit = subparsers.add_parser('emit', help='convert a snapshot to a PostgreSQL script')
+    emit.add_argument('snapshot_dir', help='directory written by build')
+    emit.add_argument('output', nargs='?', default=STANDARD_STREAM,
+                      help="PostgreSQL script to write, or '-' for standard output (default)")
+    emit.add_argument('--format', choices=OUTPUT_FORMATS, default='insert',
+                      help='write rows as one INSERT per row, multi-row INSERTs or COPY FROM stdin blocks')
+    args = parser.parse_args()
+
+    # Messages go to stderr while standard output carries the converted script
+    to_stdout = args.command == 'emit' and args.output == STANDARD_STREAM
+    with contextlib.redirect_stdout(sys.stderr if to_stdout else sys.stdout):
+        try:
+            if args.command == 'build':
+                build_snapshot(args.input, args.snapshot_dir)
+            else:
+                ColumnarSnapshot(args.snapshot_dir).emit(SQLiteToPostgreSQLConverter(), args.output, args.format)
+        except (OSError, RuntimeError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Compressed Dump Streams
+Text readers and writers for plain, gzip, zstd and lzma files, with the
+(de)compression running on a background thread next to the conversion
+"""
+
+import io
+import os
+import sys
+import gzip
+import lzma
+import queue
+import threading
+from typing import Any, BinaryIO, TextIO
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIONS = ('none', 'gzip', 'zstd', 'lzma')
+
+# Path that stands for standard input or standard output
+STANDARD_STREAM = '-'
+
+# Compression picked from the file extension when none is given
+EXTENSION_COMPRESSIONS = {
+    '.gz': 'gzip',
+    '.gzip': 'gzip',
+    '.zst': 'zstd',
+    '.zstd': 'zstd',
+    '.xz': 'lzma',
+    '.lzma': 'lzma',
+}
+
+# Bytes handed between the conversion and the compression thread at a time
+BLOCK_SIZE = 1024 * 1024
+
+# Blocks buffered between the two threads
+QUEUE_BLOCKS = 8
+
+# Compression levels favouring throughput; the converter should not wait on the compressor
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+LZMA_PRESET = 1
+
+
+def detect_compression(path: str, compression: str = 'auto') -> str:
+    """Resolve 'auto' to the compression implied by the file extension"""
+    if compression != 'auto':
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        return compression
+    return EXTENSION_COMPRESSIONS.get(os.path.splitext(path)[1].lower(), 'none')
+
+
+def _open_standard_stream(mode: str, **kwargs) -> Any:
+    """Open stdin (read modes) or stdout (write modes) without taking ownership of the descriptor"""
+    if mode.startswith('r'):
+        return open(sys.__stdin__.fileno(), mode, closefd=False, **kwargs)
+    # sys.stdout may be redirected to stderr for messages; the data goes to the real stdout
+    sys.__stdout__.flush()
+    return open(sys.__stdout__.fileno(), mode, closefd=False, **kwargs)
+
+
+def _open_binary(path: str, mode: str, compression: str) -> BinaryIO:
+    """Open a compressed binary stream for reading ('rb') or writing ('wb')"""
+    if path == STANDARD_STREAM:
+        path = _open_standard_stream(mode)
+
+    if compression == 'gzip':
+        if mode == 'wb':
+            return gzip.open(path, mode, compresslevel=GZIP_LEVEL)
+        return gzip.open(path, mode)
+    if compression == 'lzma':
+        if mode == 'wb':
+            return lzma.open(path, mode, preset=LZMA_PRESET)
+        return lzma.open(path, mode)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard not installed: pip install zstandard (or use gzip/lzma)")
+        file = open(path, mode) if isinstance(path, str) else path
+        if mode == 'wb':
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(file, closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(file, closefd=True)
+    return open(path, mode) if isinstance(path, str) else path
+
+
+class _BackgroundReader(io.RawIOBase):
+    """Raw stream whose data is decompressed ahead of time by a background thread"""
+
+    def __init__(self, source: BinaryIO):
+        self.source = source
+        self.blocks = queue.Queue(maxsize=QUEUE_BLOCKS)
+        self.pending = b''
+        self.error = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._fill, daemon=True)
+        self.thread.start()
+
+    def _fill(self):
+        try:
+            while not self.stopped.is_set():
+                block = self.source.read(BLOCK_SIZE)
+                if not block:
+                    break
+                self.blocks.put(block)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.blocks.put(None)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        if not self.pending:
+            if self.blocks is None:
+                return 0
+            block = self.blocks.get()
+            if block is None:
+                self.blocks = None
+                if self.error is not None:
+                    raise self.error
+                return 0
+            self.pending = block
+
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.stopped.set()
+            # Unblock the thread if it is waiting on a full queue
+            while self.blocks is not None and self.thread.is_alive():
+                try:
+                    self.blocks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self.thread.join()
+            self.source.close()
+        super().close()
+
+
+class _BackgroundWriter(io.RawIOBase):
+    """Raw stream whose data is compressed and written by a background thread"""
+
+    def __init__(self, target: BinaryIO):
+        self.target = target
+        self.blocks = queue.Queue(maxsize=QUEUE_BLOCKS)
+        self.error = None
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        while True:
+            block = self.blocks.get()
+            if block is None:
+                break
+            if self.error is None:
+                try:
+                    self.target.write(block)
+                except Exception as e:
+                    self.error = e
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        if self.error is not None:
+            raise self.error
+        self.blocks.put(bytes(data))
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            self.blocks.put(None)
+            self.thread.join()
+            self.target.close()
+            if self.error is not None:
+                raise self.error
+
+
+def open_input(path: str, compression: str = 'auto') -> TextIO:
+    """Open a dump for reading as UTF-8 text; '-' reads standard input"""
+    compression = detect_compression(path, compression)
+    if compression == 'none':
+        if path == STANDARD_STREAM:
+            return _open_standard_stream('r', encoding='utf-8')
+        return open(path, 'r', encoding='utf-8')
+
+    raw = _BackgroundReader(_open_binary(path, 'rb', compression))
+    return io.TextIOWrapper(io.BufferedReader(raw, BLOCK_SIZE), encoding='utf-8')
+
+
+def open_output(path: str, compression: str = 'auto') -> TextIO:
+    """Open a converted script for writing as UTF-8 text; '-' writes standard output"""
+    compression = detect_compression(path, compression)
+    if compression == 'none':
+        if path == STANDARD_STREAM:
+            return _open_standard_stream('w', encoding='utf-8')
+        return open(path, 'w', encoding='utf-8')
+
+    raw = _BackgroundWriter(_open_binary(path, 'wb', compression))
+    return io.TextIOWrapper(io.BufferedWriter(raw, BLOCK_SIZE), encoding='utf-8')
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: compressed_io.py INPUT OUTPUT  (recompress by extension, e.g. dump.sql dump.sql.gz)")
+        sys.exit(1)
+
+    with open_input(sys.argv[1]) as src, open_output(sys.argv[2]) as dst:
+        while True:
+            text = src.read(BLOCK_SIZE)
+            if not text:
+                break
+            dst.write(text)
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,9 @@ import json
 import datetime
 from typing import List, Dict, Tuple, Any
 
+# Characters that delimit or nest values inside an INSERT VALUES clause
+VALUE_DELIMITERS = re.compile(r"['\"(),]")
+
 class SQLiteToPostgreSQLConverter:
     def __init__(self):
         self.sqlite_to_pg_types = {
@@ -145,48 +148,52 @@ class SQLiteToPostgreSQLConverter:
         return f'INSERT INTO "{table}" VALUES({", ".join(converted_values)});'
 
     def parse_insert_values(self, values_str: str) -> List[str]:
-        """Parse INSERT VALUES clause handling quotes and commas properly"""
+        """Parse INSERT VALUES clause handling quotes and commas properly
+
+        Jumps between the characters that matter (quotes, parentheses and
+        commas) with a compiled pattern, and over the body of quoted literals
+        with str.find, instead of visiting every character.
+        """
         values = []
-        current_value = ""
-        in_quotes = False
-        quote_char = None
-        i = 0
+        value_start = 0
         paren_depth = 0
-
-        while i < len(values_str):
-            char = values_str[i]
-
-            if not in_quotes:
-                if char in ["'", '"']:
-                    in_quotes = True
-                    quote_char = char
-                    current_value += char
-                elif char == '(':
-                    paren_depth += 1
-                    current_value += char
-                elif char == ')':
-                    paren_depth -= 1
-                    current_value += char
-                elif char == ',' and paren_depth == 0:
-                    values.append(current_value.strip())
-                    current_value = ""
-                else:
-                    current_value += char
+        pos = 0
+        length = len(values_str)
+        search = VALUE_DELIMITERS.search
+
+        while True:
+            match = search(values_str, pos)
+            if not match:
+                break
+
+            char = match.group()
+            i = match.start()
+            pos = i + 1
+
+            if char == ',':
+                if paren_depth == 0:
+                    values.append(values_str[value_start:i].strip())
+                    value_start = pos
+            elif char == '(':
+                paren_depth += 1
+            elif char == ')':
+                paren_depth -= 1
             else:
-                current_value += char
-                if char == quote_char:
-                    # Check if it's an escaped quote
-                    if i + 1 < len(values_str) and values_str[i + 1] == quote_char:
-                        current_value += quote_char
-                        i += 1  # Skip the next quote
+                # Skip to the closing quote, stepping over doubled (escaped) quotes
+                while True:
+                    end = values_str.find(char, pos)
+                    if end == -1:
+                        pos = length
+                        break
+                    if end + 1 < length and values_str[end + 1] == char:
+                        pos = end + 2
                     else:
-                        in_quotes = False
-                        quote_char = None
-
-            i += 1
+                        pos = end + 1
+                        break
 
-        if current_value.strip():
-            values.append(current_value.strip())
+        last_value = values_str[value_start:].strip()
+        if last_value:
+            values.append(last_value)
 
         return values
 
@@ -4,13 +4,695 @@ Final SQLite to PostgreSQL 16 Converter
 Converts SQLite database dump to PostgreSQL 16 compatible format with comprehensive handling
 """
 
+import os
 import re
+import sys
+import time
 import json
+import mmap
+import sqlite3
+import pstats
+import hashlib
+import cProfile
+import argparse
+import tracemalloc
 import datetime
-from typing import List, Dict, Tuple, Any, Optional
+import functools
+import contextlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from prisma_schema import PrismaSchema, PRISMA_TO_SQLITE_TYPES, load_prisma_schema
+from compressed_io import COMPRESSIONS, STANDARD_STREAM, detect_compression, open_input, open_output
+from typing import List, Dict, Tuple, Any, Optional, Iterable, Iterator, TextIO, Callable
+
+# Number of INSERT statements sent to a worker process at a time
+INSERT_CHUNK_SIZE = 500
+
+CREATE_INDEX_PATTERN = re.compile(
+    r'CREATE (UNIQUE )?INDEX (?:IF NOT EXISTS )?"(\w+)" ON "(\w+)"\s*\((.*)\);$')
+
+INSERT_PATTERN = re.compile(r'INSERT INTO "?(\w+)"? VALUES\((.*)\);', re.DOTALL)
+
+# Row output formats: one INSERT per row, multi-row INSERTs, or COPY FROM stdin blocks per table
+OUTPUT_FORMATS = ('insert', 'batch', 'copy')
+
+# Default limits of a multi-row INSERT statement
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_STATEMENT_BYTES = 1024 * 1024
+
+# Characters that must be backslash-escaped in COPY text format
+COPY_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+# Epoch millisecond arithmetic for EpochTimestampFormatter
+MS_PER_DAY = 86400 * 1000
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+MAX_EPOCH_MS = (datetime.date.max.toordinal() - EPOCH_ORDINAL + 1) * MS_PER_DAY - 1
+
+# Number of formatted dates kept by EpochTimestampFormatter
+DEFAULT_CACHED_DAYS = 4096
+
+# SQLite stores booleans as 0/1
+BOOLEAN_LITERALS = {'0': 'false', '1': 'true'}
+
+# Layout of a restore directory written by convert_to_directory
+RESTORE_MANIFEST_FILE = 'manifest.json'
+RESTORE_SCHEMA_FILE = 'schema.sql'
+RESTORE_POST_LOAD_FILE = 'post_load.sql'
+RESTORE_DATA_DIR = 'data'
+
+# Name of a foreign key CONSTRAINT line, quoted or bare, as it must be written to refer to the constraint
+CONSTRAINT_NAME_PATTERN = re.compile(r'CONSTRAINT\s+("[^"]+"|\w+)\s+FOREIGN\s+KEY\b')
+
+# Table referenced by a FOREIGN KEY constraint line
+REFERENCES_PATTERN = re.compile(r'REFERENCES "(\w+)"')
+
+# Bump when the layout of an incremental state file changes
+INCREMENTAL_STATE_VERSION = 1
+
+# Columns tried, in order, as a table's watermark in incremental mode
+WATERMARK_COLUMNS = ('updated_at', 'created_at')
+
+# One value of an INSERT VALUES body: unquoted text around complete quoted literals, up to a top-level comma
+VALUE_PATTERN = r"[^,']*(?:'[^']*'[^,']*)*"
+
+# Bump when the converted form of a row changes, so cached rows are not reused
+ROW_CACHE_VERSION = 1
+
+# Size bound of the converted row cache (bytes of cached output)
+DEFAULT_ROW_CACHE_BYTES = 256 * 1024 * 1024
+
+# Keys per SELECT when looking rows up in the cache
+ROW_CACHE_LOOKUP_SIZE = 500
+
+# Bump when the layout of a checkpoint state file changes
+CHECKPOINT_STATE_VERSION = 2
+
+# Rows converted between two commit points of a checkpointed conversion
+DEFAULT_CHECKPOINT_ROWS = 100000
+
+# Output line that opens each commit point of a checkpointed script, followed by its number
+CHECKPOINT_MARKER = '-- checkpoint '
+
+# Dump statements that produce no output, skipped by MappedDump without decoding
+SKIPPED_STATEMENT_PREFIXES = (b'PRAGMA', b'BEGIN TRANSACTION;')
+
+# Seconds between progress lines with --progress
+PROGRESS_INTERVAL = 2.0
+
+# Statements between clock reads of the progress line, so it costs next to nothing per row
+PROGRESS_CHECK_STATEMENTS = 1024
+
+# Conversion stages timed with --stats/--profile; 'convert' covers the typed value conversion
+STATS_STAGES = ('schema', 'read', 'tokenize', 'convert', 'format', 'write')
+
+# Entries of the cProfile and tracemalloc listings in a --profile report
+PROFILE_TOP_FUNCTIONS = 30
+PROFILE_TOP_ALLOCATIONS = 20
+
+def split_table_definition(table_def: str) -> List[str]:
+    """Column and constraint definitions of a CREATE TABLE body, split on top-level commas.
+
+    Lines are not enough: SQLite appends columns added by ALTER TABLE to an
+    existing line, several to a line.
+    """
+    definitions = []
+    start = 0
+    depth = 0
+    quote = None
+    for position, char in enumerate(table_def):
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in '\'"':
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            definitions.append(table_def[start:position].strip())
+            start = position + 1
+    definitions.append(table_def[start:].strip())
+    return [definition for definition in definitions if definition]
+
+
+class EpochTimestampFormatter:
+    """Formats Unix epoch milliseconds as 'YYYY-MM-DD HH:MM:SS.mmm+00' with integer arithmetic.
+
+    The value is split into a day number and a time of day with divmod; the
+    'YYYY-MM-DD' prefix of each day is computed once and kept in a bounded LRU
+    cache, since exports carry long runs of timestamps from the same days.
+    """
+
+    def __init__(self, max_cached_days: int = DEFAULT_CACHED_DAYS):
+        self.format_day = functools.lru_cache(maxsize=max_cached_days)(self._format_day)
+
+    @staticmethod
+    def _format_day(day: int) -> str:
+        return datetime.date.fromordinal(EPOCH_ORDINAL + day).isoformat()
+
+    def format(self, epoch_ms: int) -> Optional[str]:
+        """Format epoch milliseconds, or return None when outside 1970-01-01 .. 9999-12-31"""
+        if not 0 <= epoch_ms <= MAX_EPOCH_MS:
+            return None
+
+        day, ms_of_day = divmod(epoch_ms, MS_PER_DAY)
+        seconds, millis = divmod(ms_of_day, 1000)
+        hours, seconds = divmod(seconds, 3600)
+        minutes, seconds = divmod(seconds, 60)
+        return f"{self.format_day(day)} {hours:02d}:{minutes:02d}:{seconds:02d}.{millis:03d}+00"
+
+
+class IncrementalState:
+    """Per-table watermarks of a conversion run, used to emit only new and changed rows on the next one.
+
+    For every table the state keeps the row count, the highest epoch-ms value
+    of its watermark column (updated_at, else created_at) and a short content
+    hash of each row keyed by its id. A row is emitted when it is past the
+    previous watermark, or when its id is new or its hash changed (which
+    catches edits that did not bump updated_at).
+    """
+
+    def __init__(self, previous_tables: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.previous = previous_tables or {}
+        self.current = {}
+        self.changed_rows = {}
+        self.patterns = {}
+
+    @classmethod
+    def load(cls, state_file: str) -> 'IncrementalState':
+        """Load the state of the previous run; a missing or outdated file starts from scratch"""
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        if data.get('version') != INCREMENTAL_STATE_VERSION:
+            print(f"Ignoring incremental state {state_file} written by another version")
+            return cls()
+        return cls(data['tables'])
+
+    def save(self, state_file: str):
+        """Write the state of this run, replacing the previous one only once it is complete"""
+        temp_file = state_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': INCREMENTAL_STATE_VERSION, 'tables': self.current}, f)
+        os.replace(temp_file, state_file)
+
+    def start_table(self, table_name: str, columns: List[str]):
+        """Begin tracking a table, locating its id and watermark columns"""
+        id_position = columns.index('id') if 'id' in columns else None
+        watermark_position = next((columns.index(column) for column in WATERMARK_COLUMNS if column in columns), None)
+        self.patterns[table_name] = self.values_pattern(id_position, watermark_position)
+        self.current[table_name] = {'rows': 0, 'watermark': None, 'hashes': {}}
+        self.changed_rows[table_name] = 0
+
+    @staticmethod
+    def values_pattern(id_position: Optional[int], watermark_position: Optional[int]) -> Optional[re.Pattern]:
+        """Regex reaching the id and watermark values of a VALUES body in one match.
+
+        Rows are only filtered here, so the values before the last wanted one
+        are skipped inside the regex engine instead of being tokenized like
+        parse_values_safely does; the ones after it are never looked at.
+        """
+        groups = {id_position: 'id', watermark_position: 'watermark'}
+        groups.pop(None, None)
+        if not groups:
+            return None
+        values = [f'(?P<{groups[position]}>{VALUE_PATTERN})' if position in groups else VALUE_PATTERN
+                  for position in range(max(groups) + 1)]
+        return re.compile(','.join(values) + '(?:,|$)')
+
+    def row_changed(self, table_name: str, values_str: str) -> bool:
+        """Record a row of this run and tell whether it is new or changed since the previous one"""
+        pattern = self.patterns[table_name]
+        match = pattern.match(values_str) if pattern is not None else None
+        values = match.groupdict() if match else {}
+        row_id = values['id'].strip() if values.get('id') is not None else None
+        watermark = values['watermark'].strip() if values.get('watermark') is not None else None
+        table = self.current[table_name]
+        table['rows'] += 1
+
+        stamp = None
+        if watermark is not None and watermark.isdigit():
+            stamp = int(watermark)
+            if table['watermark'] is None or stamp > table['watermark']:
+                table['watermark'] = stamp
+
+        changed = True
+        if row_id is not None:
+            digest = hashlib.blake2b(values_str.encode('utf-8'), digest_size=8).hexdigest()
+            table['hashes'][row_id] = digest
+
+            previous = self.previous.get(table_name)
+            if previous is not None:
+                past_watermark = (stamp is not None and previous['watermark'] is not None
+                                  and stamp > previous['watermark'])
+                changed = past_watermark or previous['hashes'].get(row_id) != digest
+
+        if changed:
+            self.changed_rows[table_name] += 1
+        return changed
+
+    def removed_rows(self, table_name: str) -> int:
+        """Number of rows of the previous run that are gone from this one"""
+        previous = self.previous.get(table_name, {}).get('hashes', {})
+        current = self.current.get(table_name, {}).get('hashes', {})
+        return sum(1 for row_id in previous if row_id not in current)
+
+    def print_summary(self):
+        """Print how many rows of each table were emitted"""
+        for table_name, table in self.current.items():
+            line = f"  - {table_name}: {self.changed_rows[table_name]} of {table['rows']} rows new or changed"
+            removed = self.removed_rows(table_name)
+            if removed:
+                line += f" ({removed} removed since the last run, not deleted)"
+            print(line)
+
+
+class ConversionCheckpoint:
+    """Last commit point of a checkpointed conversion, kept in a small JSON state file.
+
+    The script of a checkpointed conversion commits every `every_rows` rows,
+    between row chunks. Each commit point records the byte offset of the next
+    dump statement, the table being converted, the rows emitted per table and
+    where its marker line starts in the output (byte offset and line number),
+    along with the indexes and foreign keys deferred so far. A resumed
+    conversion truncates the output there and goes on from that input offset;
+    a failed psql load can go on from the same output offset, since every
+    commit point restarts its transaction on its own.
+    """
+
+    def __init__(self, state_file: str, every_rows: int = DEFAULT_CHECKPOINT_ROWS):
+        self.state_file = state_file
+        self.every_rows = every_rows
+        self.number = 0
+        self.input_offset = 0
+        self.output_offset = 0
+        self.output_line = 1
+        self.table = None
+        self.rows = {}
+        self.source = {}
+        self.deferred_foreign_keys = []
+        self.deferred_indexes = []
+        self.complete = False
+
+    def restore(self):
+        """Read the last commit point back from the state file"""
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            raise RuntimeError(f"No checkpoint state to resume from: {self.state_file}")
+        if data.get('version') != CHECKPOINT_STATE_VERSION:
+            raise RuntimeError(f"Checkpoint state {self.state_file} was written by another version")
+
+        for name in ('number', 'input_offset', 'output_offset', 'output_line', 'table', 'rows', 'source',
+                     'complete'):
+            setattr(self, name, data[name])
+        self.deferred_foreign_keys = [tuple(item) for item in data['deferred_foreign_keys']]
+        self.deferred_indexes = [((key[0], tuple(key[1]), key[2]) if key else None, statement)
+                                 for key, statement in data['deferred_indexes']]
+
+    def save(self):
+        """Write the state atomically, so a crash leaves the previous commit point in place"""
+        data = {
+            'version': CHECKPOINT_STATE_VERSION,
+            'number': self.number,
+            'input_offset': self.input_offset,
+            'output_offset': self.output_offset,
+            'output_line': self.output_line,
+            'table': self.table,
+            'rows': self.rows,
+            'source': self.source,
+            'deferred_foreign_keys': self.deferred_foreign_keys,
+            'deferred_indexes': self.deferred_indexes,
+            'complete': self.complete,
+        }
+        temp_file = self.state_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.state_file)
+
+    def marker_lines(self) -> List[str]:
+        """Lines that open the commit point: a psql load can start over from its marker line"""
+        return [f"{CHECKPOINT_MARKER}{self.number}", "SET session_replication_role = replica;", "BEGIN;"]
+
+
+class ConvertedRowCache:
+    """On-disk cache (a SQLite file) mapping raw INSERT rows to their converted output.
+
+    Keys hash the raw VALUES body together with a fingerprint of the table
+    name, schema and output format, so a schema change never reuses stale rows
+    and a row is never reused for another table with the same columns.
+    Every entry remembers the last run that used it; when the cached output
+    grows past max_bytes the entries unused for the longest are evicted.
+    """
+
+    def __init__(self, cache_file: str, max_bytes: int = DEFAULT_ROW_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        self.conn = sqlite3.connect(cache_file)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS rows "
+                          "(key BLOB PRIMARY KEY, output TEXT NOT NULL, used INTEGER NOT NULL)")
+
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'run'").fetchone()
+        self.run = (row[0] if row else 0) + 1
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('run', ?)", (self.run,))
+
+    @staticmethod
+    def fingerprint(table_name: str, schema: Dict[str, Any], output_format: str, upsert: bool) -> bytes:
+        """Fingerprint of everything besides the raw row that decides its converted output"""
+        data = json.dumps([ROW_CACHE_VERSION, table_name, schema, output_format, upsert], sort_keys=True)
+        return hashlib.blake2b(data.encode('utf-8'), digest_size=16).digest()
+
+    @staticmethod
+    def key(fingerprint: bytes, values_str: str) -> bytes:
+        """Cache key of one raw VALUES body"""
+        return hashlib.blake2b(values_str.encode('utf-8'), digest_size=16, key=fingerprint).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, str]:
+        """Look keys up, returning the cached outputs found"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), ROW_CACHE_LOOKUP_SIZE):
+            batch = unique_keys[start:start + ROW_CACHE_LOOKUP_SIZE]
+            placeholders = ', '.join('?' * len(batch))
+            found.update(self.conn.execute(
+                f"SELECT key, output FROM rows WHERE key IN ({placeholders})", batch).fetchall())
+
+        if found:
+            self.conn.executemany("UPDATE rows SET used = ? WHERE key = ?",
+                                  [(self.run, key) for key in found])
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Dict[bytes, str]):
+        """Store newly converted rows"""
+        self.conn.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?)",
+                              [(key, output, self.run) for key, output in items.items()])
+
+    def evict(self):
+        """Drop the least recently used entries until the cached output fits in max_bytes"""
+        total = self.conn.execute("SELECT COALESCE(SUM(LENGTH(output)), 0) FROM rows").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+
+        victims = []
+        for key, size in self.conn.execute("SELECT key, LENGTH(output) FROM rows ORDER BY used, rowid"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.conn.executemany("DELETE FROM rows WHERE key = ?", victims)
+        self.evicted += len(victims)
+
+    def close(self):
+        """Apply the size bound, commit and close the cache file"""
+        self.evict()
+        self.conn.commit()
+        self.conn.close()
+
+    def print_summary(self):
+        """Print the hit/miss counters of this run"""
+        lookups = self.hits + self.misses
+        rate = 100.0 * self.hits / lookups if lookups else 0.0
+        print(f"Row cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), "
+              f"{self.evicted} entries evicted")
+
+
+class MappedDump:
+    """Read-only memory map of a dump file that finds statement boundaries on the raw bytes.
+
+    Statements are handed out as memoryview slices of the map: one per line,
+    except multi-line CREATE TABLE blocks and statements whose string literals
+    hold raw newlines (older sqlite3 versions dump them unescaped), which are
+    a single slice. Only the statements a caller asks for are decoded, so the
+    dump is never held as one large string or list of lines.
+    """
+
+    def __init__(self, input_file: str):
+        self.file = open(input_file, 'rb')
+        self.map = None
+        self.view = None
+        # Byte offset just past the last statement handed out by iter_slices
+        self.offset = 0
+        if os.fstat(self.file.fileno()).st_size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+
+    def __enter__(self) -> 'MappedDump':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release the map and the file"""
+        if self.view is not None:
+            self.view.release()
+            self.map.close()
+            self.view = self.map = None
+        self.file.close()
+
+    def iter_slices(self, start: int = 0) -> Iterator[memoryview]:
+        """Yield each non-empty statement from byte offset start, whitespace-trimmed, as a memoryview"""
+        if self.map is None:
+            return
+        data = self.map
+        size = len(data)
+        position = start
+
+        while position < size:
+            end = data.find(b'\n', position)
+            if end < 0:
+                end = size
+            start, stop = self._trim(position, end)
+            position = end + 1
+            if start == stop:
+                continue
+
+            if data[start:start + 12] == b'CREATE TABLE' and data[stop - 2:stop] != b');':
+                # Extend the slice over the rest of the table definition
+                while position < size:
+                    end = data.find(b'\n', position)
+                    if end < 0:
+                        end = size
+                    _, line_stop = self._trim(position, end)
+                    position = end + 1
+                    stop = end if data[end - 1:end] != b'\r' else end - 1
+                    if data[line_stop - 2:line_stop] == b');':
+                        break
+            elif data[start:stop].count(b"'") % 2:
+                # A literal is still open: the statement goes on until its closing quote
+                quotes = 1
+                while position < size and quotes % 2:
+                    end = data.find(b'\n', position)
+                    if end < 0:
+                        end = size
+                    quotes += data[position:end].count(b"'")
+                    _, stop = self._trim(position, end)
+                    position = end + 1
+
+            self.offset = min(position, size)
+            yield self.view[start:stop]
+
+    def _trim(self, start: int, end: int) -> Tuple[int, int]:
+        """Bounds of the line data[start:end] without leading and trailing whitespace"""
+        data = self.map
+        while start < end and data[start] in b' \t\r':
+            start += 1
+        while end > start and data[end - 1] in b' \t\r':
+            end -= 1
+        return start, end
+
+    def iter_statements(self, prefixes: Optional[Tuple[bytes, ...]] = None, start: int = 0) -> Iterator[str]:
+        """Decode and yield the statements worth converting from byte offset start, optionally only with prefixes"""
+        for view in self.iter_slices(start):
+            head = view[:24].tobytes()
+            if head.startswith(SKIPPED_STATEMENT_PREFIXES) or (prefixes and not head.startswith(prefixes)):
+                view.release()
+                continue
+
+            statement = str(view, 'utf-8')
+            view.release()
+            if '\r' in statement:
+                statement = statement.replace('\r\n', '\n')
+            yield statement
+
+
+class ConversionProgress:
+    """Periodic progress line on stderr with the statements read and rows converted so far"""
+
+    def __init__(self, interval: float = PROGRESS_INTERVAL, stream: Optional[TextIO] = None):
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.statements = 0
+        self.rows = 0
+        self.start = time.perf_counter()
+        self.next_report = self.start + interval
+
+    def update(self, statements: int, rows: int):
+        """Count converted statements and rows, reporting when the interval has passed"""
+        self.statements += statements
+        self.rows += rows
+        if self.statements % PROGRESS_CHECK_STATEMENTS:
+            return
+        now = time.perf_counter()
+        if now >= self.next_report:
+            self.next_report = now + self.interval
+            self.report(now)
+
+    def report(self, now: Optional[float] = None):
+        """Print the progress line"""
+        elapsed = (now or time.perf_counter()) - self.start
+        rate = self.rows / elapsed if elapsed > 0 else 0.0
+        print(f"  ... {self.statements} statements, {self.rows} rows in {elapsed:.1f}s ({rate:.0f} rows/s)",
+              file=self.stream, flush=True)
+
+
+class ConversionStats:
+    """Per-stage timers and per-table counters of a conversion (--stats, --profile).
+
+    Stages are timed per chunk of rows, not per value, so collecting them
+    costs a few clock reads per INSERT_CHUNK_SIZE rows. Worker processes keep
+    their own stats and hand them back with each chunk (see drain/merge).
+    """
 
-class SQLiteToPostgreSQLConverter:
     def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = dict.fromkeys(STATS_STAGES, 0.0)
+        self.tables = {}
+
+    def add_stage(self, stage: str, seconds: float):
+        """Add time spent in a stage"""
+        self.stages[stage] += seconds
+
+    def add_table(self, table_name: str, rows: int, input_bytes: int, seconds: float):
+        """Count rows converted for a table, with their VALUES bytes and conversion time"""
+        counters = self.tables.get(table_name)
+        if counters is None:
+            counters = self.tables[table_name] = {'rows': 0, 'bytes': 0, 'seconds': 0.0}
+        counters['rows'] += rows
+        counters['bytes'] += input_bytes
+        counters['seconds'] += seconds
+
+    def timed(self, iterable: Iterable[Any], stage: str) -> Iterator[Any]:
+        """Iterate, adding the time spent producing each item to a stage"""
+        iterator = iter(iterable)
+        stages = self.stages
+        clock = time.perf_counter
+        while True:
+            started = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                stages[stage] += clock() - started
+                return
+            stages[stage] += clock() - started
+            yield item
+
+    def drain(self) -> Dict[str, Any]:
+        """Take the stages and tables collected so far, resetting them (worker side)"""
+        collected = {'stages': self.stages, 'tables': self.tables}
+        self.stages = dict.fromkeys(STATS_STAGES, 0.0)
+        self.tables = {}
+        return collected
+
+    def merge(self, collected: Dict[str, Any]):
+        """Add stages and tables drained from a worker's stats"""
+        for stage, seconds in collected['stages'].items():
+            self.stages[stage] += seconds
+        for table_name, counters in collected['tables'].items():
+            self.add_table(table_name, counters['rows'], counters['bytes'], counters['seconds'])
+
+    def report(self) -> Dict[str, Any]:
+        """Machine-readable totals, stages and tables"""
+        elapsed = time.perf_counter() - self.start
+        rows = sum(counters['rows'] for counters in self.tables.values())
+
+        def rate(count, seconds):
+            return round(count / seconds) if seconds > 0 else None
+
+        return {
+            'seconds': round(elapsed, 3),
+            'rows': rows,
+            'bytes': sum(counters['bytes'] for counters in self.tables.values()),
+            'rows_per_sec': rate(rows, elapsed),
+            # Time in worker processes overlaps, so stages may add up to more than the wall time
+            'stages': {stage: round(seconds, 3) for stage, seconds in self.stages.items()},
+            'tables': {table_name: {'rows': counters['rows'], 'bytes': counters['bytes'],
+                                    'seconds': round(counters['seconds'], 3),
+                                    'rows_per_sec': rate(counters['rows'], counters['seconds'])}
+                       for table_name, counters in self.tables.items()},
+        }
+
+    def print_summary(self):
+        """Print stage times and table counters"""
+        report = self.report()
+        print(f"Converted {report['rows']} rows ({report['bytes']} bytes) in {report['seconds']:.2f}s")
+        for stage, seconds in report['stages'].items():
+            print(f"  {stage:<9} {seconds:8.3f}s")
+        for table_name, counters in sorted(report['tables'].items(), key=lambda item: -item[1]['seconds']):
+            print(f"  {table_name}: {counters['rows']} rows, {counters['bytes']} bytes, "
+                  f"{counters['seconds']:.3f}s ({counters['rows_per_sec'] or 0} rows/s)")
+
+
+class ConversionProfile:
+    """cProfile and tracemalloc around a conversion, written as a JSON report (--profile)"""
+
+    def __init__(self, report_file: str, stats: ConversionStats):
+        self.report_file = report_file
+        self.stats = stats
+        self.profiler = cProfile.Profile()
+
+    def __enter__(self) -> 'ConversionProfile':
+        tracemalloc.start()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        functions = []
+        profile_stats = pstats.Stats(self.profiler)
+        for (file_name, line, function), (_, calls, own_time, total_time, _) in sorted(
+                profile_stats.stats.items(), key=lambda item: -item[1][3])[:PROFILE_TOP_FUNCTIONS]:
+            functions.append({'function': f'{os.path.basename(file_name)}:{line}({function})', 'calls': calls,
+                              'own_seconds': round(own_time, 3), 'total_seconds': round(total_time, 3)})
+
+        allocations = [{'location': str(statistic.traceback), 'bytes': statistic.size, 'blocks': statistic.count}
+                       for statistic in snapshot.statistics('lineno')[:PROFILE_TOP_ALLOCATIONS]]
+
+        report = self.stats.report()
+        report['memory'] = {'traced_bytes': current, 'peak_traced_bytes': peak, 'top_allocations': allocations}
+        report['profile'] = functions
+        with open(self.report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+class SQLiteToPostgreSQLConverter:
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_statement_bytes: int = DEFAULT_MAX_STATEMENT_BYTES,
+                 prisma_schema: Optional[PrismaSchema] = None,
+                 defer_constraints: bool = False, post_load_file: Optional[str] = None,
+                 incremental_state: Optional[IncrementalState] = None,
+                 row_cache: Optional[ConvertedRowCache] = None):
         self.sqlite_to_pg_types = {
             'TEXT': 'VARCHAR',
             'INTEGER': 'INTEGER',
@@ -23,6 +705,37 @@ class SQLiteToPostgreSQLConverter:
         # Store table schemas to know column types and positions
         self.table_schemas = {}
 
+        # Optional Prisma model that overrides the column types parsed from the dump
+        self.prisma_schema = prisma_schema
+
+        # Compiled conversion plans keyed by (table, deferred_timestamps), derived from table_schemas
+        self.table_plans = {}
+
+        # Deferred build: foreign keys and indexes are created after the data load,
+        # inline before COMMIT or in post_load_file (see post_load_postgresql.py)
+        self.defer_constraints = defer_constraints
+        self.post_load_file = post_load_file
+        self.deferred_foreign_keys = []
+        self.deferred_indexes = []
+
+        # Formats epoch milliseconds, caching the date part per day
+        self.timestamp_formatter = EpochTimestampFormatter()
+
+        # Limits for multi-row INSERT statements ('batch' output format)
+        self.batch_size = batch_size
+        self.max_statement_bytes = max_statement_bytes
+
+        # Incremental mode: only rows changed since the previous run, written as upserts
+        self.incremental_state = incremental_state
+        self.upsert = incremental_state is not None
+
+        # Optional on-disk cache of converted rows, consulted before tokenizing
+        self.row_cache = row_cache
+
+        # Optional progress reporting (--progress) and stage/table instrumentation (--stats, --profile)
+        self.progress = None
+        self.stats = None
+
     def parse_table_schema(self, table_name: str, create_stmt: str) -> Dict[str, Any]:
         """Parse CREATE TABLE statement to extract column information"""
         schema = {
@@ -37,16 +750,12 @@ class SQLiteToPostgreSQLConverter:
             return schema
 
         table_def = match.group(1)
-        lines = [line.strip() for line in table_def.split('\n') if line.strip()]
 
         col_position = 0
-        for line in lines:
+        for line in split_table_definition(table_def):
             if line.startswith('CONSTRAINT'):
                 continue
 
-            # Remove trailing comma
-            line = line.rstrip(',')
-
             # Parse column definition - handle quoted column names properly
             match = re.match(r'"([^"]+)"\s+(\w+)', line)
             if match:
@@ -62,20 +771,19 @@ class SQLiteToPostgreSQLConverter:
 
     def convert_timestamp_from_epoch(self, epoch_ms: str) -> str:
         """Convert Unix epoch milliseconds to PostgreSQL timestamp"""
-        try:
-            # Check if it's a numeric epoch timestamp (13 digits for milliseconds)
-            if epoch_ms.isdigit() and len(epoch_ms) >= 10:
-                timestamp = datetime.datetime.fromtimestamp(int(epoch_ms) / 1000, tz=datetime.timezone.utc)
-                return f"'{timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}+00'"
-            else:
-                # It's already a formatted datetime string, just wrap in quotes if needed
-                if not epoch_ms.startswith("'"):
-                    return f"'{epoch_ms}'"
-                return epoch_ms
-        except (ValueError, OSError):
-            if not epoch_ms.startswith("'"):
-                return f"'{epoch_ms}'"
-            return epoch_ms
+        # Check if it's a numeric epoch timestamp (13 digits for milliseconds)
+        if epoch_ms.isdigit() and len(epoch_ms) >= 10:
+            try:
+                timestamp = self.timestamp_formatter.format(int(epoch_ms))
+            except ValueError:
+                timestamp = None
+            if timestamp is not None:
+                return f"'{timestamp}'"
+
+        # It's already a formatted datetime string (or out of range), just wrap in quotes if needed
+        if not epoch_ms.startswith("'"):
+            return f"'{epoch_ms}'"
+        return epoch_ms
 
     def escape_string_for_postgresql(self, value: str) -> str:
         """Properly escape string values for PostgreSQL"""
@@ -92,43 +800,37 @@ class SQLiteToPostgreSQLConverter:
         return f"'{escaped}'"
 
     def parse_values_safely(self, values_str: str) -> List[str]:
-        """Parse INSERT VALUES clause more carefully"""
+        """Parse INSERT VALUES clause more carefully
+
+        The clause is split on every comma and the pieces are glued back together
+        while a quoted literal is still open. A literal is open exactly when an
+        odd number of quotes has been seen ('' escapes add two), so the scanning
+        happens in str.split/str.count instead of a per-character loop.
+        """
         values = []
-        current_value = ""
-        in_quotes = False
-        quote_char = None
-        i = 0
-
-        while i < len(values_str):
-            char = values_str[i]
-
-            if not in_quotes:
-                if char in ["'"]:
-                    in_quotes = True
-                    quote_char = char
-                    current_value += char
-                elif char == ',':
-                    values.append(current_value.strip())
-                    current_value = ""
-                else:
-                    current_value += char
+        pending = None
+
+        for part in values_str.split(','):
+            if pending is not None:
+                pending.append(part)
+                if part.count("'") % 2:
+                    # This piece closes the open literal
+                    values.append(','.join(pending).strip())
+                    pending = None
+            elif part.count("'") % 2:
+                # A literal opens here and contains at least one comma
+                pending = [part]
             else:
-                if char == quote_char:
-                    # Check if it's an escaped quote (double quote)
-                    if i + 1 < len(values_str) and values_str[i + 1] == quote_char:
-                        current_value += char + char
-                        i += 1  # Skip the next quote
-                    else:
-                        in_quotes = False
-                        quote_char = None
-                        current_value += char
-                else:
-                    current_value += char
-
-            i += 1
+                values.append(part.strip())
 
-        if current_value.strip():
-            values.append(current_value.strip())
+        if pending is not None:
+            # Unterminated literal runs to the end of the clause
+            last_value = ','.join(pending).strip()
+            if last_value:
+                values.append(last_value)
+        elif not values[-1]:
+            # A trailing empty value is dropped, like a trailing comma
+            values.pop()
 
         return values
 
@@ -142,6 +844,10 @@ class SQLiteToPostgreSQLConverter:
             col_name = columns[col_position]
             col_type = column_types.get(col_name, '')
 
+            # Columns typed by the Prisma model are not guessed from their name
+            if col_name in schema.get('prisma_columns', ()):
+                return col_type == 'DATETIME'
+
             # Check if it's a DATETIME column or has timestamp-like name
             return col_type == 'DATETIME' or col_name.endswith('_at')
 
@@ -161,25 +867,20 @@ class SQLiteToPostgreSQLConverter:
 
         return False
 
-    def convert_value_by_type(self, table_name: str, col_position: int, value: str) -> str:
-        """Convert a value based on its column type and position"""
+    def convert_timestamp_value(self, value: str) -> str:
+        """Convert a value of a timestamp column"""
         if value == 'NULL':
             return 'NULL'
+        return self.convert_timestamp_from_epoch(value)
 
-        # Check if it's a timestamp column
-        if self.is_timestamp_column(table_name, col_position):
-            return self.convert_timestamp_from_epoch(value)
-
-        # Check if it's a boolean column
-        if self.is_boolean_column(table_name, col_position):
-            if value == '0':
-                return 'false'
-            elif value == '1':
-                return 'true'
-            elif value in ['true', 'false']:
-                return value
-            else:
-                return value
+    def convert_boolean_value(self, value: str) -> str:
+        """Convert a value of a boolean column (0/1 become false/true)"""
+        return BOOLEAN_LITERALS.get(value, value)
+
+    def convert_untyped_value(self, value: str) -> str:
+        """Convert a value of a column without special type handling"""
+        if value == 'NULL':
+            return 'NULL'
 
         # Handle string values
         if value.startswith("'") and value.endswith("'"):
@@ -187,24 +888,105 @@ class SQLiteToPostgreSQLConverter:
         elif value.replace('.', '').replace('-', '').isdigit():
             # Numeric value - no quotes needed
             return value
+        elif value[:2] in ("X'", "x'") and value.endswith("'"):
+            # SQLite blob literal - PostgreSQL bytea hex format
+            return f"'\\x{value[2:-1]}'"
         else:
             # String value that needs escaping
             return self.escape_string_for_postgresql(value)
 
+    def keep_value(self, value: str) -> str:
+        """Converter for values that were already converted by an earlier stage"""
+        return value
+
+    def compile_table_plan(self, table_name: str,
+                           deferred_timestamps: bool = False) -> Tuple[Callable[[str], str], ...]:
+        """Build the tuple of value converters for a table, indexed by column position
+
+        With deferred_timestamps the timestamp columns keep their values, because
+        convert_timestamp_columns has already converted them for the whole chunk.
+        """
+        columns = self.table_schemas.get(table_name, {}).get('columns', [])
+        timestamp_converter = self.keep_value if deferred_timestamps else self.convert_timestamp_value
+
+        plan = []
+        for col_position in range(len(columns)):
+            if self.is_timestamp_column(table_name, col_position):
+                plan.append(timestamp_converter)
+            elif self.is_boolean_column(table_name, col_position):
+                plan.append(self.convert_boolean_value)
+            else:
+                plan.append(self.convert_untyped_value)
+
+        return tuple(plan)
+
+    def get_table_plan(self, table_name: str, column_count: int = 0,
+                       deferred_timestamps: bool = False) -> Tuple[Callable[[str], str], ...]:
+        """Return the compiled plan for a table, covering at least column_count columns"""
+        key = (table_name, deferred_timestamps)
+        plan = self.table_plans.get(key)
+        if plan is None:
+            plan = self.compile_table_plan(table_name, deferred_timestamps)
+            self.table_plans[key] = plan
+
+        if column_count > len(plan):
+            # Values beyond the known columns get the untyped conversion
+            plan = plan + (self.convert_untyped_value,) * (column_count - len(plan))
+            self.table_plans[key] = plan
+
+        return plan
+
+    def forget_table_plans(self, table_name: str):
+        """Drop the compiled plans of a table after its schema changed"""
+        self.table_plans.pop((table_name, False), None)
+        self.table_plans.pop((table_name, True), None)
+
+    def get_timestamp_positions(self, table_name: str) -> List[int]:
+        """Positions of the timestamp columns of a table"""
+        columns = self.table_schemas.get(table_name, {}).get('columns', [])
+        return [position for position in range(len(columns)) if self.is_timestamp_column(table_name, position)]
+
+    def convert_timestamp_columns(self, table_name: str, rows: List[List[str]]):
+        """Convert the timestamp columns of a chunk of parsed rows in place.
+
+        Works column by column and formats each distinct value once per chunk;
+        rows written by one bulk import share their created_at/updated_at values,
+        so most cells become a dictionary lookup.
+        """
+        positions = self.get_timestamp_positions(table_name)
+        if not positions:
+            return
+
+        formatted = {'NULL': 'NULL'}
+        convert = self.convert_timestamp_from_epoch
+
+        for position in positions:
+            for row in rows:
+                if position < len(row):
+                    value = row[position]
+                    result = formatted.get(value)
+                    if result is None:
+                        result = formatted[value] = convert(value)
+                    row[position] = result
+
+    def convert_value_by_type(self, table_name: str, col_position: int, value: str) -> str:
+        """Convert a value based on its column type and position"""
+        return self.get_table_plan(table_name, col_position + 1)[col_position](value)
+
     def convert_table_definition(self, table_name: str, table_def: str) -> str:
         """Convert SQLite table definition to PostgreSQL"""
         lines = table_def.strip().split('\n')
         converted_lines = []
 
         for line in lines:
-            line = line.strip()
+            line = line.strip().rstrip(',')
             if not line:
                 continue
 
             # Handle column definitions
             if not line.startswith('CONSTRAINT'):
                 # Extract column definition and convert type
-                match = re.match(r'("[^"]+"\s+)(\w+)(.*)', line.rstrip(','))
+                match = re.match(r'("[^"]+"\s+)(\w+)(.*)', line)
                 if match:
                     col_part = match.group(1)  # "column_name"
                     col_type = match.group(2)  # TYPE
@@ -213,35 +995,208 @@ class SQLiteToPostgreSQLConverter:
                     # Convert type
                     pg_type = self.sqlite_to_pg_types.get(col_type, col_type)
                     line = col_part + pg_type + rest_part
-
-                    # Add comma back if it was there originally
-                    if line.rstrip() != line:
-                        line = line.rstrip() + ','
+            elif self.defer_constraints and 'FOREIGN KEY' in line:
+                # Added after the data load instead; a constraint without a usable name stays inline,
+                # since it could not be validated by name later
+                name = CONSTRAINT_NAME_PATTERN.match(line)
+                if name:
+                    self.deferred_foreign_keys.append((table_name, name.group(1), line))
+                    continue
 
             converted_lines.append('    ' + line)
 
-        return f'CREATE TABLE IF NOT EXISTS "{table_name}" (\n' + '\n'.join(converted_lines) + '\n);'
+        return f'CREATE TABLE IF NOT EXISTS "{table_name}" (\n' + ',\n'.join(converted_lines) + '\n);'
+
+    def convert_insert_values(self, table_name: str, values_str: str) -> List[str]:
+        """Convert the VALUES(...) body of an INSERT into PostgreSQL literals"""
+        # Parse values safely
+        values = self.parse_values_safely(values_str)
+
+        # Convert each value with the converter compiled for its column
+        plan = self.get_table_plan(table_name, len(values))
+        return [convert(value) for convert, value in zip(plan, values)]
 
     def convert_insert_statement(self, table_name: str, insert_stmt: str) -> str:
         """Convert SQLite INSERT statement to PostgreSQL"""
         # Extract values from INSERT statement
-        match = re.match(r"INSERT INTO (\w+) VALUES\((.*)\);", insert_stmt)
+        match = INSERT_PATTERN.match(insert_stmt)
         if not match:
             return insert_stmt
 
-        table = match.group(1)
-        values_str = match.group(2)
+        return self.convert_row_chunk(match.group(1), [match.group(2)], 'insert')[0]
+
+    def copy_text_value(self, literal: str) -> str:
+        """Turn a converted SQL literal into a COPY text-format field"""
+        if literal == 'NULL':
+            return '\\N'
+
+        if len(literal) >= 2 and literal.startswith("'") and literal.endswith("'"):
+            literal = literal[1:-1].replace("''", "'")
+
+        return literal.translate(COPY_TEXT_ESCAPES)
+
+    def generate_insert_prefix(self, table_name: str) -> str:
+        """Generate the INSERT INTO ... VALUES prefix of a multi-row statement"""
+        columns = self.table_schemas.get(table_name, {}).get('columns', [])
+        if not columns:
+            return f'INSERT INTO "{table_name}" VALUES '
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        return f'INSERT INTO "{table_name}" ({column_list}) VALUES '
+
+    def generate_upsert_clause(self, table_name: str) -> str:
+        """Generate the ON CONFLICT clause that turns a row INSERT into an upsert keyed on the id column"""
+        columns = self.table_schemas.get(table_name, {}).get('columns', [])
+        if 'id' not in columns:
+            return ' ON CONFLICT DO NOTHING'
+        updates = ', '.join(f'"{column}" = EXCLUDED."{column}"' for column in columns if column != 'id')
+        if not updates:
+            return ' ON CONFLICT ("id") DO NOTHING'
+        return f' ON CONFLICT ("id") DO UPDATE SET {updates}'
+
+    def pack_insert_batches(self, table_name: str, rows: List[str]) -> List[str]:
+        """Pack row tuples into multi-row INSERTs of at most batch_size rows and max_statement_bytes"""
+        prefix = self.generate_insert_prefix(table_name)
+        suffix = self.generate_upsert_clause(table_name) if self.upsert else ''
+        base_bytes = len(prefix.encode('utf-8')) + len(suffix.encode('utf-8'))
+        statements = []
+        batch = []
+        batch_bytes = base_bytes
+
+        for row in rows:
+            # Every row is followed by a comma or the final semicolon
+            row_bytes = len(row.encode('utf-8')) + 1
+            if batch and (len(batch) >= self.batch_size or batch_bytes + row_bytes > self.max_statement_bytes):
+                statements.append(prefix + ','.join(batch) + suffix + ';')
+                batch = []
+                batch_bytes = base_bytes
+            batch.append(row)
+            batch_bytes += row_bytes
+
+        if batch:
+            statements.append(prefix + ','.join(batch) + suffix + ';')
+
+        return statements
+
+    def generate_copy_header(self, table_name: str) -> str:
+        """Generate the COPY ... FROM stdin line that opens a table's data block"""
+        columns = self.table_schemas.get(table_name, {}).get('columns', [])
+        if not columns:
+            return f'COPY "{table_name}" FROM stdin;'
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        return f'COPY "{table_name}" ({column_list}) FROM stdin;'
+
+    def convert_rows(self, table_name: str, values_strs: List[str]) -> List[List[str]]:
+        """Parse and convert the VALUES bodies of consecutive INSERTs of one table"""
+        stats = self.stats
+        if stats is not None:
+            started = time.perf_counter()
+
+        parse = self.parse_values_safely
+        rows = [parse(values_str) for values_str in values_strs]
+
+        if stats is not None:
+            stats.add_stage('tokenize', time.perf_counter() - started)
+        return self.convert_parsed_rows(table_name, rows)
+
+    def convert_parsed_rows(self, table_name: str, rows: List[List[str]]) -> List[List[str]]:
+        """Convert rows already split into SQL literals, e.g. read back from a columnar snapshot"""
+        stats = self.stats
+        if stats is not None:
+            started = time.perf_counter()
+
+        # Timestamp stage: whole columns of the chunk at once
+        self.convert_timestamp_columns(table_name, rows)
+
+        converted_rows = []
+        for row in rows:
+            plan = self.get_table_plan(table_name, len(row), deferred_timestamps=True)
+            converted_rows.append([convert(value) for convert, value in zip(plan, row)])
+
+        if stats is not None:
+            stats.add_stage('convert', time.perf_counter() - started)
+        return converted_rows
+
+    def convert_row_outputs(self, table_name: str, values_strs: List[str], output_format: str) -> List[str]:
+        """Convert VALUES bodies into one output per row: an INSERT line, a COPY line or a batch tuple"""
+        stats = self.stats
+        if stats is None:
+            return self.format_row_outputs(table_name, self.convert_rows(table_name, values_strs), output_format)
+
+        started = time.perf_counter()
+        rows = self.convert_rows(table_name, values_strs)
+        converted = time.perf_counter()
+        outputs = self.format_row_outputs(table_name, rows, output_format)
+        finished = time.perf_counter()
+        stats.add_stage('format', finished - converted)
+        stats.add_table(table_name, len(values_strs), sum(map(len, values_strs)), finished - started)
+        return outputs
+
+    def format_row_outputs(self, table_name: str, rows: List[List[str]], output_format: str) -> List[str]:
+        """Render converted rows as INSERT lines, COPY lines or batch tuples"""
+        if output_format == 'copy':
+            copy_value = self.copy_text_value
+            return ['\t'.join([copy_value(literal) for literal in row]) for row in rows]
+
+        if output_format == 'batch':
+            return [f'({", ".join(row)})' for row in rows]
+
+        suffix = self.generate_upsert_clause(table_name) if self.upsert else ''
+        return [f'INSERT INTO "{table_name}" VALUES({", ".join(row)}){suffix};' for row in rows]
+
+    def lookup_cached_rows(self, table_name: str, values_strs: List[str],
+                           output_format: str) -> Tuple[List[bytes], Dict[bytes, str], List[str]]:
+        """Look rows up in the row cache, returning their keys, the cached outputs and the rows to convert"""
+        schema = self.table_schemas.get(table_name, {})
+        fingerprint = self.row_cache.fingerprint(table_name, schema, output_format, self.upsert)
+        keys = [self.row_cache.key(fingerprint, values_str) for values_str in values_strs]
+        cached = self.row_cache.get_many(keys)
+        misses = [values_str for key, values_str in zip(keys, values_strs) if key not in cached]
+        return keys, cached, misses
+
+    def merge_cached_rows(self, keys: List[bytes], cached: Dict[bytes, str], converted: List[str]) -> List[str]:
+        """Put cached and freshly converted outputs back in row order, caching the new ones"""
+        converted = iter(converted)
+        outputs = []
+        new_items = {}
+        for key in keys:
+            output = cached.get(key)
+            if output is None:
+                output = new_items.get(key)
+                if output is None:
+                    output = new_items[key] = next(converted)
+                else:
+                    # Identical row later in the chunk: its conversion was requested too
+                    next(converted)
+            outputs.append(output)
+
+        if new_items:
+            self.row_cache.put_many(new_items)
+        return outputs
+
+    def finish_row_outputs(self, table_name: str, outputs: List[str], output_format: str) -> List[str]:
+        """Turn per-row outputs into output lines, packing batch tuples into multi-row INSERTs"""
+        if output_format == 'batch':
+            return self.pack_insert_batches(table_name, outputs)
+        return outputs
+
+    def convert_row_chunk(self, table_name: str, values_strs: List[str], output_format: str) -> List[str]:
+        """Convert the VALUES bodies of consecutive INSERTs of one table into output lines"""
+        if self.row_cache is None:
+            outputs = self.convert_row_outputs(table_name, values_strs, output_format)
+        else:
+            keys, cached, misses = self.lookup_cached_rows(table_name, values_strs, output_format)
+            converted = self.convert_row_outputs(table_name, misses, output_format) if misses else []
+            outputs = self.merge_cached_rows(keys, cached, converted)
 
-        # Parse values safely
-        values = self.parse_values_safely(values_str)
+        return self.finish_row_outputs(table_name, outputs, output_format)
 
-        # Convert each value based on its column type
-        converted_values = []
-        for i, value in enumerate(values):
-            converted_value = self.convert_value_by_type(table, i, value)
-            converted_values.append(converted_value)
+    def filter_changed_rows(self, table_name: str, values_strs: List[str]) -> List[str]:
+        """Keep the VALUES bodies of rows that are new or changed since the previous incremental run"""
+        state = self.incremental_state
+        if table_name not in state.current:
+            state.start_table(table_name, self.table_schemas.get(table_name, {}).get('columns', []))
 
-        return f'INSERT INTO "{table}" VALUES({", ".join(converted_values)});'
+        return [values_str for values_str in values_strs if state.row_changed(table_name, values_str)]
 
     def generate_indexes(self) -> List[str]:
         """Generate recommended indexes for PostgreSQL"""
@@ -274,17 +1229,9 @@ class SQLiteToPostgreSQLConverter:
         ]
         return indexes
 
-    def convert_file(self, input_file: str, output_file: str):
-        """Convert entire SQLite dump file to PostgreSQL"""
-        with open(input_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Split into lines for processing
-        lines = content.split('\n')
-        converted_lines = []
-
-        # Add PostgreSQL header
-        converted_lines.extend([
+    def generate_header(self) -> List[str]:
+        """Generate the PostgreSQL script preamble"""
+        return [
             "-- PostgreSQL 16 Database Dump",
             "-- Converted from SQLite",
             f"-- Generated on: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
@@ -294,120 +1241,739 @@ class SQLiteToPostgreSQLConverter:
             "",
             "BEGIN;",
             ""
+        ]
+
+    def record_index(self, statement: str):
+        """Keep a CREATE [UNIQUE] INDEX statement of the dump for the post-load phase"""
+        match = CREATE_INDEX_PATTERN.match(statement)
+        if not match:
+            self.deferred_indexes.append((None, statement))
+            return
+
+        unique, name, table_name, column_list = match.groups()
+        key = (table_name, tuple(re.findall(r'"(\w+)"', column_list)), bool(unique))
+        self.deferred_indexes.append((key, f'CREATE {unique or ""}INDEX IF NOT EXISTS "{name}" '
+                                           f'ON "{table_name}"({column_list});'))
+
+    def derive_index_statements(self) -> List[str]:
+        """Index statements of the post-load phase: the dump's own, plus Prisma @unique/@@index ones it lacks"""
+        statements = [statement for _, statement in self.deferred_indexes]
+        known = {key for key, _ in self.deferred_indexes if key is not None}
+
+        if self.prisma_schema is not None:
+            for table_name, schema in self.table_schemas.items():
+                prisma_table = self.prisma_schema.tables.get(table_name)
+                if prisma_table is None:
+                    continue
+                for index in prisma_table.indexes:
+                    key = (table_name, index.columns, index.unique)
+                    if key in known or not all(column in schema['columns'] for column in index.columns):
+                        continue
+                    known.add(key)
+                    # Same naming as Prisma migrations
+                    name = f"{table_name}_{'_'.join(index.columns)}_{'key' if index.unique else 'idx'}"
+                    column_list = ', '.join(f'"{column}"' for column in index.columns)
+                    statements.append(f'CREATE {"UNIQUE " if index.unique else ""}INDEX IF NOT EXISTS "{name}" '
+                                      f'ON "{table_name}"({column_list});')
+
+        return statements
+
+    def generate_post_load_statements(self) -> List[str]:
+        """Generate the index and foreign key build that runs once the data is loaded"""
+        lines = ["-- Build indexes after the data load"]
+        lines.extend(self.derive_index_statements())
+
+        if self.deferred_foreign_keys:
+            lines.append("")
+            lines.append("-- Add foreign keys without checking existing rows, then validate them")
+            for table_name, _, constraint in self.deferred_foreign_keys:
+                lines.append(f'ALTER TABLE "{table_name}" ADD {constraint} NOT VALID;')
+            for table_name, name, _ in self.deferred_foreign_keys:
+                lines.append(f'ALTER TABLE "{table_name}" VALIDATE CONSTRAINT {name};')
+
+        return lines
+
+    def generate_footer(self) -> List[str]:
+        """Generate the lines that replace the dump's final COMMIT"""
+        if not self.defer_constraints:
+            footer = ["", "-- Create indexes for performance"]
+            footer.extend(self.generate_indexes())
+        elif self.post_load_file:
+            with open(self.post_load_file, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(self.generate_post_load_statements()) + '\n')
+            footer = ["", f"-- Indexes and foreign keys are built after the load from {self.post_load_file}"]
+        else:
+            footer = [""]
+            footer.extend(self.generate_post_load_statements())
+
+        footer.extend([
+            "",
+            "-- Re-enable foreign key checks",
+            "SET session_replication_role = DEFAULT;",
+            "",
+            "COMMIT;"
         ])
+        return footer
 
-        # First pass: extract all table schemas
-        print("Extracting table schemas...")
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
+    def iter_statements(self, lines: Iterable[str]) -> Iterator[str]:
+        """Yield stripped dump lines, joining each multi-line CREATE TABLE block or string literal into one statement"""
+        lines = iter(lines)
+        for raw_line in lines:
+            line = raw_line.strip()
 
-            if line.startswith('CREATE TABLE'):
-                # Find the complete table definition
+            if line.startswith('CREATE TABLE') and not line.endswith(');'):
+                # Collect the rest of the table definition
                 table_def_lines = [line]
-                i += 1
-
-                while i < len(lines) and not lines[i].strip().endswith(');'):
-                    table_def_lines.append(lines[i])
-                    i += 1
-
-                if i < len(lines):
-                    table_def_lines.append(lines[i])
-
-                # Extract table name and definition
-                table_match = re.match(r'CREATE TABLE IF NOT EXISTS "(\w+)"', line)
-                if table_match:
-                    table_name = table_match.group(1)
-                    full_def = '\n'.join(table_def_lines)
-
-                    # Parse and store schema
-                    schema = self.parse_table_schema(table_name, full_def)
-                    self.table_schemas[table_name] = schema
-                    print(f"  - {table_name}: {len(schema['columns'])} columns")
-                    print(f"    Columns: {', '.join(schema['columns'])}")
-
-            i += 1
-
-        # Second pass: convert the file
-        print("\nConverting SQL statements...")
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-
-            # Skip SQLite specific pragmas
-            if line.startswith('PRAGMA') or line == 'BEGIN TRANSACTION;':
-                i += 1
+                for raw_line in lines:
+                    table_def_lines.append(raw_line.rstrip('\n'))
+                    if raw_line.strip().endswith(');'):
+                        break
+                yield '\n'.join(table_def_lines)
                 continue
 
-            # Handle CREATE TABLE statements
-            if line.startswith('CREATE TABLE'):
-                # Find the complete table definition
-                table_def_lines = [line]
-                i += 1
-
-                while i < len(lines) and not lines[i].strip().endswith(');'):
-                    table_def_lines.append(lines[i])
-                    i += 1
-
-                if i < len(lines):
-                    table_def_lines.append(lines[i])
-
-                # Extract table name and definition
-                table_match = re.match(r'CREATE TABLE IF NOT EXISTS "(\w+)"', line)
-                if table_match:
-                    table_name = table_match.group(1)
-                    full_def = '\n'.join(table_def_lines)
-
-                    # Extract just the column definitions part
-                    def_match = re.search(r'CREATE TABLE IF NOT EXISTS "\w+" \((.*)\);', full_def, re.DOTALL)
-                    if def_match:
-                        table_def = def_match.group(1)
-                        converted_table = self.convert_table_definition(table_name, table_def)
-                        converted_lines.append(converted_table)
-                        converted_lines.append("")
-
-                i += 1
-                continue
+            if line.count("'") % 2:
+                # A literal holds a raw newline: collect lines until its closing quote
+                statement_lines = [raw_line.lstrip()]
+                for raw_line in lines:
+                    statement_lines.append(raw_line)
+                    if raw_line.count("'") % 2:
+                        break
+                line = ''.join(statement_lines).rstrip()
+
+            yield line
+
+    def register_table_schema(self, table_name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a parsed table schema, taking column types from the Prisma model when one is loaded.
+
+        Column names and positions always come from the dump; the Prisma model
+        only decides the type of the columns it knows. Those are listed in
+        'prisma_columns' so the name-based guesses don't apply to them.
+        """
+        prisma_table = self.prisma_schema.tables.get(table_name) if self.prisma_schema else None
+        if prisma_table is not None:
+            prisma_types = prisma_table.column_types()
+            prisma_columns = [column for column in schema['columns'] if column in prisma_types]
+            for column in prisma_columns:
+                schema['column_types'][column] = PRISMA_TO_SQLITE_TYPES.get(prisma_types[column], 'TEXT')
+            schema['prisma_columns'] = prisma_columns
+
+        self.table_schemas[table_name] = schema
+        self.forget_table_plans(table_name)
+        return schema
 
-            # Handle INSERT statements
-            if line.startswith('INSERT INTO'):
-                converted_insert = self.convert_insert_statement(line.split()[2], line)
-                converted_lines.append(converted_insert)
-                i += 1
-                continue
+    def learn_table_schema(self, statement: str):
+        """Parse and store the schema of a CREATE TABLE statement"""
+        table_match = re.match(r'CREATE TABLE IF NOT EXISTS "(\w+)"', statement)
+        if table_match:
+            table_name = table_match.group(1)
+            schema = self.register_table_schema(table_name, self.parse_table_schema(table_name, statement))
+            print(f"  - {table_name}: {len(schema['columns'])} columns")
+            print(f"    Columns: {', '.join(schema['columns'])}")
+
+    def convert_statement(self, statement: str) -> List[str]:
+        """Convert a single dump statement into zero or more output lines"""
+        # Skip SQLite specific pragmas
+        if statement.startswith('PRAGMA') or statement == 'BEGIN TRANSACTION;':
+            return []
+
+        # Handle CREATE TABLE statements
+        if statement.startswith('CREATE TABLE'):
+            table_match = re.match(r'CREATE TABLE IF NOT EXISTS "(\w+)"', statement)
+            if table_match:
+                table_name = table_match.group(1)
+
+                # Extract just the column definitions part
+                def_match = re.search(r'CREATE TABLE IF NOT EXISTS "\w+" \((.*)\);', statement, re.DOTALL)
+                if def_match:
+                    table_def = def_match.group(1)
+                    return [self.convert_table_definition(table_name, table_def), ""]
+            return []
+
+        # Handle INSERT statements
+        if statement.startswith('INSERT INTO'):
+            return [self.convert_insert_statement(statement.split()[2], statement)]
+
+        # Keep the dump's indexes for the post-load phase
+        if self.defer_constraints and statement.startswith(('CREATE INDEX', 'CREATE UNIQUE INDEX')):
+            self.record_index(statement)
+            return []
+
+        # Handle COMMIT
+        if statement == 'COMMIT;':
+            return self.generate_footer()
+
+        # Skip empty lines and keep other statements as they are
+        if statement:
+            return [statement]
+
+        return []
+
+    def convert_statements(self, statements: Iterable[str], learn_schemas: bool = False,
+                           jobs: int = 1, output_format: str = 'insert') -> Iterator[str]:
+        """Convert a sequence of dump statements into output lines, in order"""
+        return self.join_groups(self.iter_converted_groups(statements, learn_schemas, jobs, output_format),
+                                output_format)
+
+    def join_groups(self, groups: Iterable[Tuple[Optional[str], List[str]]], output_format: str) -> Iterator[str]:
+        """Flatten converted (table_name, lines) groups into output lines, adding COPY block boundaries"""
+        if output_format != 'copy':
+            for _, lines in groups:
+                yield from lines
+            return
+
+        # Wrap consecutive rows of the same table in one COPY block
+        copy_table = None
+        for table_name, lines in groups:
+            if table_name != copy_table:
+                if copy_table is not None:
+                    yield '\\.'
+                if table_name is not None:
+                    yield self.generate_copy_header(table_name)
+                copy_table = table_name
+            yield from lines
+
+        if copy_table is not None:
+            yield '\\.'
+
+    def row_chunk_size(self, output_format: str) -> int:
+        """Rows converted together; for 'batch' output a whole number of batches, so no batch is cut short"""
+        if output_format == 'batch':
+            return self.batch_size * max(1, INSERT_CHUNK_SIZE // self.batch_size)
+        return INSERT_CHUNK_SIZE
+
+    def iter_converted_groups(self, statements: Iterable[str], learn_schemas: bool, jobs: int,
+                              output_format: str) -> Iterator[Tuple[Optional[str], List[str]]]:
+        """Convert statements, yielding (table_name, lines) for row chunks and (None, lines) otherwise.
+
+        Consecutive INSERTs of one table are grouped into chunks of
+        INSERT_CHUNK_SIZE rows (rounded to whole batches for 'batch' output). With jobs > 1 the chunks are converted in
+        worker processes: the schemas known when the pool starts are sent to
+        every worker once, and a chunk only carries its table schema when it
+        was learned (or changed) after that, as happens in streaming mode.
+        At most 2 * jobs chunks are in flight so memory stays bounded, and
+        results are yielded in the original order.
+        """
+        chunk_size = self.row_chunk_size(output_format)
+
+        executor = None
+        shipped_schemas = {}
+        if jobs > 1:
+            executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                           initargs=(self.table_schemas, self.batch_size,
+                                                     self.max_statement_bytes, self.upsert,
+                                                     self.stats is not None))
+            shipped_schemas = dict(self.table_schemas)
+
+        pending = deque()
+        max_pending = 2 * jobs if executor else 0
+        chunk = []
+        chunk_table = None
+
+        def submit_chunk():
+            rows = chunk
+            if self.incremental_state is not None:
+                rows = self.filter_changed_rows(chunk_table, chunk)
+                if not rows:
+                    return
+            if executor is None:
+                pending.append((chunk_table, self.convert_row_chunk(chunk_table, rows, output_format), None))
+                return
+
+            # Cache lookups stay in this process; only the misses go to the workers
+            cache_lookup = None
+            if self.row_cache is not None:
+                cache_lookup = self.lookup_cached_rows(chunk_table, rows, output_format)
+                rows = cache_lookup[2]
+                if not rows:
+                    pending.append((chunk_table, [], cache_lookup))
+                    return
+            schema = self.table_schemas.get(chunk_table)
+            if shipped_schemas.get(chunk_table) == schema:
+                schema = None
+            pending.append((chunk_table, executor.submit(
+                _convert_row_outputs, chunk_table, schema, rows, output_format), cache_lookup))
+
+        def resolve(item):
+            table_name, lines, cache_lookup = item
+            if isinstance(lines, list):
+                if cache_lookup is None:
+                    return table_name, lines
+            else:
+                lines, collected = lines.result()
+                if collected is not None:
+                    self.stats.merge(collected)
+            if cache_lookup is not None:
+                keys, cached, _ = cache_lookup
+                lines = self.merge_cached_rows(keys, cached, lines)
+            return table_name, self.finish_row_outputs(table_name, lines, output_format)
+
+        progress = self.progress
+        if self.stats is not None:
+            statements = self.stats.timed(statements, 'read')
+        try:
+            for statement in statements:
+                match = INSERT_PATTERN.match(statement) if statement.startswith('INSERT INTO') else None
+                if progress is not None:
+                    progress.update(1, 1 if match else 0)
+                if match:
+                    table_name = match.group(1)
+                    if chunk and (table_name != chunk_table or len(chunk) >= chunk_size):
+                        submit_chunk()
+                        chunk = []
+                    chunk_table = table_name
+                    chunk.append(match.group(2))
+                else:
+                    if chunk:
+                        submit_chunk()
+                        chunk = []
+                    if learn_schemas and statement.startswith('CREATE TABLE'):
+                        self.learn_table_schema(statement)
+                    pending.append((None, self.convert_statement(statement), None))
+
+                while len(pending) > max_pending:
+                    yield resolve(pending.popleft())
+
+            if chunk:
+                submit_chunk()
+
+            while pending:
+                yield resolve(pending.popleft())
+
+            if progress is not None:
+                progress.report()
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def convert_file(self, input_file: str, output_file: str, streaming: bool = False, jobs: int = 1,
+                     output_format: str = 'insert', input_compression: str = 'auto',
+                     output_compression: str = 'auto', checkpoint: Optional[ConversionCheckpoint] = None,
+                     resume: bool = False):
+        """Convert entire SQLite dump file to PostgreSQL.
+
+        Either path may be '-' for standard input/output. Compression of either
+        file is taken from its extension (.gz, .zst, .xz) unless given. Standard
+        input and compressed dumps cannot be memory-mapped, so they are
+        converted in a single streaming pass. With a checkpoint the script
+        commits every few rows and the conversion can be resumed (plain files only).
+        """
+        if checkpoint is not None:
+            self.convert_with_checkpoints(input_file, output_file, checkpoint, resume, jobs, output_format)
+            return
+
+        input_compression = detect_compression(input_file, input_compression)
+        if streaming or input_file == STANDARD_STREAM or input_compression != 'none':
+            with open_input(input_file, input_compression) as src, \
+                    open_output(output_file, output_compression) as dst:
+                self.convert_stream(src, dst, jobs=jobs, output_format=output_format)
+            return
+
+        converted_lines = self.generate_header()
+
+        with MappedDump(input_file) as dump:
+            # First pass: extract all table schemas, without decoding the rows
+            print("Extracting table schemas...")
+            started = time.perf_counter()
+            for statement in dump.iter_statements(prefixes=(b'CREATE TABLE',)):
+                self.learn_table_schema(statement)
+            if self.stats is not None:
+                self.stats.add_stage('schema', time.perf_counter() - started)
+
+            # Second pass: convert the file
+            print("\nConverting SQL statements...")
+            converted_lines.extend(self.convert_statements(dump.iter_statements(), jobs=jobs,
+                                                           output_format=output_format))
 
-            # Handle COMMIT
-            if line == 'COMMIT;':
-                converted_lines.append("")
-                converted_lines.append("-- Create indexes for performance")
-                converted_lines.extend(self.generate_indexes())
-                converted_lines.append("")
-                converted_lines.append("-- Re-enable foreign key checks")
-                converted_lines.append("SET session_replication_role = DEFAULT;")
-                converted_lines.append("")
-                converted_lines.append("COMMIT;")
-                i += 1
-                continue
+        # Write converted content
+        started = time.perf_counter()
+        with open_output(output_file, output_compression) as f:
+            f.write('\n'.join(converted_lines))
+        if self.stats is not None:
+            self.stats.add_stage('write', time.perf_counter() - started)
+
+    def convert_with_checkpoints(self, input_file: str, output_file: str, checkpoint: ConversionCheckpoint,
+                                 resume: bool = False, jobs: int = 1, output_format: str = 'insert'):
+        """Convert a dump file into a script that commits every checkpoint.every_rows rows, saving each commit point.
+
+        A marker statement is slipped into the dump statements once enough rows
+        went by; it flushes the current row chunk like any other statement and
+        comes out of the (possibly parallel) pipeline in order, where it becomes
+        COMMIT plus the next commit point's marker lines. The state is saved
+        once everything before the COMMIT is on disk. With resume the output is
+        cut back to the last commit point and the dump is read from its offset,
+        so only the unfinished part is converted again.
+        """
+        stat = os.stat(input_file)
+        source = {'input_size': stat.st_size, 'input_mtime_ns': stat.st_mtime_ns, 'output_format': output_format}
+        if resume:
+            checkpoint.restore()
+            if checkpoint.source != source:
+                raise RuntimeError(f"{input_file} or the output format changed since {checkpoint.state_file} "
+                                   "was saved; convert again without --resume")
+            if checkpoint.complete:
+                print(f"Conversion recorded in {checkpoint.state_file} is already complete")
+                return
+            self.deferred_foreign_keys = list(checkpoint.deferred_foreign_keys)
+            self.deferred_indexes = list(checkpoint.deferred_indexes)
+        else:
+            checkpoint.source = source
+
+        with MappedDump(input_file) as dump, open(output_file, 'r+b' if resume else 'wb') as f:
+            print("Extracting table schemas...")
+            started = time.perf_counter()
+            for statement in dump.iter_statements(prefixes=(b'CREATE TABLE',)):
+                self.learn_table_schema(statement)
+            if self.stats is not None:
+                self.stats.add_stage('schema', time.perf_counter() - started)
+
+            # Commit points not yet written out: number -> (input offset, table, rows, deferred build)
+            pending = {}
+            rows = dict(checkpoint.rows)
+
+            def statements() -> Iterator[str]:
+                offset = checkpoint.input_offset
+                number = checkpoint.number
+                table_name = checkpoint.table
+                rows_since = 0
+                for statement in dump.iter_statements(start=offset):
+                    if rows_since >= checkpoint.every_rows:
+                        number += 1
+                        rows_since = 0
+                        pending[number] = (offset, table_name, dict(rows), list(self.deferred_foreign_keys),
+                                           list(self.deferred_indexes))
+                        yield f"{CHECKPOINT_MARKER}{number}"
+                    if statement.startswith('INSERT INTO'):
+                        table_name = statement.split(' ', 3)[2].strip('"')
+                        rows[table_name] = rows.get(table_name, 0) + 1
+                        rows_since += 1
+                    yield statement
+                    offset = dump.offset
+
+            line_number = 1
+            first_line = True
+
+            def write_lines(lines: Iterable[str]):
+                nonlocal line_number, first_line
+                for line in lines:
+                    text = line if first_line else '\n' + line
+                    f.write(text.encode('utf-8'))
+                    line_number += text.count('\n')
+                    first_line = False
+
+            if resume:
+                print(f"\nResuming from checkpoint {checkpoint.number} at byte {checkpoint.input_offset} "
+                      f"of the dump (table {checkpoint.table})...")
+                f.truncate(checkpoint.output_offset)
+                f.seek(checkpoint.output_offset)
+                line_number = checkpoint.output_line
+                write_lines(checkpoint.marker_lines())
+            else:
+                print(f"\nConverting SQL statements (commit every {checkpoint.every_rows} rows)...")
+                write_lines(self.generate_header())
+
+            next_marker = f"{CHECKPOINT_MARKER}{checkpoint.number + 1}"
+            groups = self.iter_converted_groups(statements(), False, jobs, output_format)
+            for line in self.join_groups(groups, output_format):
+                if line != next_marker:
+                    write_lines((line,))
+                    continue
+
+                write_lines(("COMMIT;", ""))
+                f.flush()
+                os.fsync(f.fileno())
+
+                checkpoint.number += 1
+                (checkpoint.input_offset, checkpoint.table, checkpoint.rows,
+                 checkpoint.deferred_foreign_keys, checkpoint.deferred_indexes) = pending.pop(checkpoint.number)
+                checkpoint.output_offset = f.tell()
+                checkpoint.output_line = line_number
+                checkpoint.save()
+
+                first_line = True
+                write_lines(checkpoint.marker_lines())
+                next_marker = f"{CHECKPOINT_MARKER}{checkpoint.number + 1}"
+
+            f.flush()
+            os.fsync(f.fileno())
+
+            checkpoint.input_offset = stat.st_size
+            checkpoint.rows = rows
+            checkpoint.complete = True
+            checkpoint.save()
+            print(f"\n{checkpoint.number} commit points saved to {checkpoint.state_file}")
+
+    def convert_stream(self, src: TextIO, dst: TextIO, jobs: int = 1, output_format: str = 'insert'):
+        """Convert a dump in a single pass, writing each statement as soon as it is converted.
+
+        Table schemas are learned as their CREATE TABLE blocks stream past, which
+        matches the order `sqlite3 .dump` writes them in (schema before rows).
+        Memory use stays bounded by the largest single statement.
+        """
+        first_line = True
+        stats = self.stats
+
+        def write_lines(lines: Iterable[str]):
+            nonlocal first_line
+            for line in lines:
+                if stats is not None:
+                    started = time.perf_counter()
+                if not first_line:
+                    dst.write('\n')
+                dst.write(line)
+                first_line = False
+                if stats is not None:
+                    stats.add_stage('write', time.perf_counter() - started)
+
+        write_lines(self.generate_header())
+
+        print("Converting SQL statements (streaming)...")
+        write_lines(self.convert_statements(self.iter_statements(src), learn_schemas=True, jobs=jobs,
+                                            output_format=output_format))
+
+    def table_dependencies(self) -> Dict[str, List[str]]:
+        """Tables each table references through its foreign keys, from the dump and the Prisma model"""
+        dependencies = {table_name: set() for table_name in self.table_schemas}
+
+        for table_name, _, constraint in self.deferred_foreign_keys:
+            match = REFERENCES_PATTERN.search(constraint)
+            if match:
+                dependencies.setdefault(table_name, set()).add(match.group(1))
+
+        if self.prisma_schema is not None:
+            for table_name in dependencies:
+                prisma_table = self.prisma_schema.tables.get(table_name)
+                if prisma_table is not None:
+                    dependencies[table_name].update(fk.referenced_table for fk in prisma_table.foreign_keys)
+
+        # Self references do not constrain the load order
+        return {table_name: sorted((referenced - {table_name}) & set(dependencies))
+                for table_name, referenced in dependencies.items()}
+
+    def convert_to_directory(self, input_file: str, output_dir: str, jobs: int = 1,
+                             output_format: str = 'copy'):
+        """Convert a dump into a restore directory for restore_postgresql_parallel.py.
+
+        The directory holds the table definitions (schema.sql), one data file per
+        table under data/, the deferred index and foreign key build
+        (post_load.sql, written at the dump's COMMIT) and manifest.json, which
+        lists every table with its data file, its size and the tables it
+        references, so independent tables can be loaded at the same time.
+        """
+        data_dir = os.path.join(output_dir, RESTORE_DATA_DIR)
+        os.makedirs(data_dir, exist_ok=True)
+
+        # Foreign keys must wait until every table is loaded
+        self.defer_constraints = True
+        self.post_load_file = os.path.join(output_dir, RESTORE_POST_LOAD_FILE)
+        # A build left by an earlier run must not be listed for this one
+        if os.path.exists(self.post_load_file):
+            os.remove(self.post_load_file)
+
+        # Plain files are memory-mapped; standard input and compressed dumps are streamed
+        if input_file == STANDARD_STREAM or detect_compression(input_file) != 'none':
+            source = open_input(input_file)
+            statements = self.iter_statements(source)
+        else:
+            source = MappedDump(input_file)
+            statements = source.iter_statements()
 
-            # Skip empty lines and other statements
-            if line:
-                converted_lines.append(line)
+        data_files = {}
+        try:
+            with source, \
+                    open(os.path.join(output_dir, RESTORE_SCHEMA_FILE), 'w', encoding='utf-8') as schema_out:
+                schema_out.write('\n'.join(self.generate_header()) + '\n')
+
+                print("Converting SQL statements (restore directory)...")
+                groups = self.iter_converted_groups(statements, True, jobs, output_format)
+                for table_name, lines in groups:
+                    if table_name is None:
+                        for line in lines:
+                            schema_out.write(line + '\n')
+                        continue
+
+                    data_out = data_files.get(table_name)
+                    if data_out is None:
+                        data_out = data_files[table_name] = open(
+                            os.path.join(data_dir, f'{table_name}.sql'), 'w', encoding='utf-8')
+                        if output_format == 'copy':
+                            data_out.write(self.generate_copy_header(table_name) + '\n')
+                    for line in lines:
+                        data_out.write(line + '\n')
+        finally:
+            for table_name, data_out in data_files.items():
+                if output_format == 'copy':
+                    data_out.write('\\.\n')
+                data_out.close()
+
+        tables = {}
+        for table_name, depends_on in self.table_dependencies().items():
+            data_file = None
+            size = 0
+            if table_name in data_files:
+                data_file = f'{RESTORE_DATA_DIR}/{table_name}.sql'
+                size = os.path.getsize(os.path.join(output_dir, data_file))
+            tables[table_name] = {'file': data_file, 'bytes': size, 'depends_on': depends_on}
+
+        manifest = {
+            'format': output_format,
+            'schema': RESTORE_SCHEMA_FILE,
+            'post_load': RESTORE_POST_LOAD_FILE if os.path.exists(self.post_load_file) else None,
+            'tables': tables,
+        }
+        with open(os.path.join(output_dir, RESTORE_MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
 
-            i += 1
+        print(f"\nWrote {len(data_files)} table data files to {data_dir}")
 
-        # Write converted content
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(converted_lines))
 
-def main():
-    converter = SQLiteToPostgreSQLConverter()
-    input_file = '/Users/sebastianfente/Documents/Development/elecsion-web/database_export_20250930_150522.sql'
-    output_file = '/Users/sebastianfente/Documents/Development/elecsion-web/database_postgresql_complete.sql'
+# Converter instance of a worker process, set up by _init_worker
+_worker_converter = None
+
+
+def _init_worker(table_schemas: Dict[str, Dict[str, Any]], batch_size: int, max_statement_bytes: int,
+                 upsert: bool = False, collect_stats: bool = False):
+    """Create the worker's converter from the schemas known when the pool starts"""
+    global _worker_converter
+    _worker_converter = SQLiteToPostgreSQLConverter(batch_size, max_statement_bytes)
+    _worker_converter.table_schemas = dict(table_schemas)
+    _worker_converter.upsert = upsert
+    if collect_stats:
+        _worker_converter.stats = ConversionStats()
 
-    print("Starting final SQLite to PostgreSQL conversion...")
-    converter.convert_file(input_file, output_file)
-    print(f"\nConversion completed successfully!")
-    print(f"Output written to: {output_file}")
+
+def _convert_row_outputs(table_name: str, schema: Optional[Dict[str, Any]], values_strs: List[str],
+                         output_format: str) -> Tuple[List[str], Optional[Dict[str, Any]]]:
+    """Convert a chunk of rows of one table inside a worker process, one output per row.
+
+    Returns the outputs and, when collecting stats, the chunk's stage times and table counters.
+    """
+    converter = _worker_converter
+    if schema is not None and converter.table_schemas.get(table_name) != schema:
+        converter.table_schemas[table_name] = schema
+        converter.forget_table_plans(table_name)
+    outputs = converter.convert_row_outputs(table_name, values_strs, output_format)
+    return outputs, converter.stats.drain() if converter.stats is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convert a SQLite dump to PostgreSQL 16',
+        epilog='example: sqlite3 prisma/dev.db .dump | %(prog)s --format copy | psql elecsion')
+    parser.add_argument('input', nargs='?', default=STANDARD_STREAM,
+                        help="dump written by `sqlite3 DB .dump`, or '-' for standard input (default)")
+    parser.add_argument('output', nargs='?', default=STANDARD_STREAM,
+                        help="PostgreSQL script to write, or '-' for standard output (default)")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='number of worker processes used to convert INSERT statements')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='insert',
+                        help='write rows as one INSERT per row, multi-row INSERTs or COPY FROM stdin blocks')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='maximum rows per INSERT statement with --format batch')
+    parser.add_argument('--max-statement-bytes', type=int, default=DEFAULT_MAX_STATEMENT_BYTES,
+                        help='maximum size in bytes of an INSERT statement with --format batch')
+    parser.add_argument('--streaming', action='store_true',
+                        help='convert an input file in a single pass, writing output as it goes '
+                             '(always the case for standard input and compressed dumps)')
+    parser.add_argument('--progress', action='store_true',
+                        help='print statements and rows converted to stderr every few seconds')
+    parser.add_argument('--stats', action='store_true',
+                        help='time the read, tokenize, convert, format and write stages and count rows, '
+                             'bytes and rows/s per table, printed at the end')
+    parser.add_argument('--profile', metavar='REPORT',
+                        help='run under cProfile and tracemalloc (much slower) and write the stage/table '
+                             'stats, top functions and top allocations to REPORT as JSON')
+    parser.add_argument('--input-compression', choices=('auto',) + COMPRESSIONS, default='auto',
+                        help='compression of the dump (default: from its extension)')
+    parser.add_argument('--output-compression', choices=('auto',) + COMPRESSIONS, default='auto',
+                        help='compression of the converted script (default: from its extension)')
+    parser.add_argument('--prisma-schema', metavar='PATH',
+                        help='take column types from a schema.prisma file instead of the dump')
+    parser.add_argument('--defer-constraints', action='store_true',
+                        help='create indexes and foreign keys after the data load')
+    parser.add_argument('--incremental', metavar='STATE_FILE',
+                        help='only write rows that are new or changed since the run that saved STATE_FILE, '
+                             'as INSERT ... ON CONFLICT ("id") DO UPDATE upserts, then update STATE_FILE')
+    parser.add_argument('--cache-file', metavar='PATH',
+                        help='reuse converted rows cached in this file by earlier runs (created if missing)')
+    parser.add_argument('--cache-max-bytes', type=int, default=DEFAULT_ROW_CACHE_BYTES,
+                        help='evict the least recently used cached rows beyond this many bytes of output')
+    parser.add_argument('--restore-dir', metavar='DIR',
+                        help='write a restore directory (schema, one data file per table, post-load build '
+                             'and manifest) for restore_postgresql_parallel.py instead of a single script')
+    parser.add_argument('--post-load-file', metavar='PATH',
+                        help='with --defer-constraints, write the index/foreign key build to this file '
+                             'for post_load_postgresql.py instead of the end of the script')
+    parser.add_argument('--checkpoint', metavar='STATE_FILE',
+                        help='commit the script every --checkpoint-rows rows and save the input offset, table, '
+                             'rows emitted and output offset of each commit point to STATE_FILE')
+    parser.add_argument('--checkpoint-rows', type=int, default=DEFAULT_CHECKPOINT_ROWS,
+                        help='rows between two commit points with --checkpoint')
+    parser.add_argument('--resume', action='store_true',
+                        help='with --checkpoint, cut the output back to the last saved commit point and '
+                             'convert the rest of the dump from there')
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint:
+        parser.error('--resume needs --checkpoint STATE_FILE')
+    if args.checkpoint:
+        if args.restore_dir or args.incremental or args.streaming:
+            parser.error('--checkpoint cannot be combined with --restore-dir, --incremental or --streaming')
+        if STANDARD_STREAM in (args.input, args.output) or \
+                detect_compression(args.input, args.input_compression) != 'none' or \
+                detect_compression(args.output, args.output_compression) != 'none':
+            parser.error('--checkpoint needs an uncompressed input file and output file to seek in')
+    if args.incremental and args.format == 'copy':
+        parser.error('--incremental writes upserts and needs --format insert or batch')
+    if args.incremental and args.restore_dir:
+        parser.error('--incremental cannot be combined with --restore-dir')
+
+    # Messages go to stderr while standard output carries the converted script
+    to_stdout = args.output == STANDARD_STREAM and not args.restore_dir
+    with contextlib.redirect_stdout(sys.stderr if to_stdout else sys.stdout):
+        prisma_schema = load_prisma_schema(args.prisma_schema) if args.prisma_schema else None
+        incremental_state = IncrementalState.load(args.incremental) if args.incremental else None
+        row_cache = ConvertedRowCache(args.cache_file, args.cache_max_bytes) if args.cache_file else None
+        converter = SQLiteToPostgreSQLConverter(args.batch_size, args.max_statement_bytes, prisma_schema,
+                                                args.defer_constraints, args.post_load_file, incremental_state,
+                                                row_cache)
+        checkpoint = ConversionCheckpoint(args.checkpoint, args.checkpoint_rows) if args.checkpoint else None
+        if args.progress:
+            converter.progress = ConversionProgress()
+        if args.stats or args.profile:
+            converter.stats = ConversionStats()
+        profile = ConversionProfile(args.profile, converter.stats) if args.profile else contextlib.nullcontext()
+
+        print("Starting final SQLite to PostgreSQL conversion...")
+        try:
+            with profile:
+                if args.restore_dir:
+                    converter.convert_to_directory(args.input, args.restore_dir, jobs=args.jobs,
+                                                   output_format=args.format)
+                else:
+                    converter.convert_file(args.input, args.output, streaming=args.streaming, jobs=args.jobs,
+                                           output_format=args.format, input_compression=args.input_compression,
+                                           output_compression=args.output_compression, checkpoint=checkpoint,
+                                           resume=args.resume)
+        except (OSError, RuntimeError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        finally:
+            if row_cache is not None:
+                row_cache.close()
+
+        if row_cache is not None:
+            print()
+            row_cache.print_summary()
+        if incremental_state is not None:
+            print("\nIncremental changes:")
+            incremental_state.print_summary()
+            incremental_state.save(args.incremental)
+        if converter.stats is not None:
+            print()
+            converter.stats.print_summary()
+        if args.profile:
+            print(f"Profile report written to: {args.profile}")
+        print(f"\nConversion completed successfully!")
+        print(f"Output written to: {args.restore_dir or args.output}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
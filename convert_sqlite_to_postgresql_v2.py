@@ -89,43 +89,37 @@ class SQLiteToPostgreSQLConverter:
         return f"'{escaped}'"
 
     def parse_values_safely(self, values_str: str) -> List[str]:
-        """Parse INSERT VALUES clause more carefully"""
-        values = []
-        current_value = ""
-        in_quotes = False
-        quote_char = None
-        i = 0
+        """Parse INSERT VALUES clause more carefully
 
-        while i < len(values_str):
-            char = values_str[i]
-
-            if not in_quotes:
-                if char in ["'"]:
-                    in_quotes = True
-                    quote_char = char
-                    current_value += char
-                elif char == ',':
-                    values.append(current_value.strip())
-                    current_value = ""
-                else:
-                    current_value += char
+        The clause is split on every comma and the pieces are glued back together
+        while a quoted literal is still open. A literal is open exactly when an
+        odd number of quotes has been seen ('' escapes add two), so the scanning
+        happens in str.split/str.count instead of a per-character loop.
+        """
+        values = []
+        pending = None
+
+        for part in values_str.split(','):
+            if pending is not None:
+                pending.append(part)
+                if part.count("'") % 2:
+                    # This piece closes the open literal
+                    values.append(','.join(pending).strip())
+                    pending = None
+            elif part.count("'") % 2:
+                # A literal opens here and contains at least one comma
+                pending = [part]
             else:
-                if char == quote_char:
-                    # Check if it's an escaped quote (double quote)
-                    if i + 1 < len(values_str) and values_str[i + 1] == quote_char:
-                        current_value += char + char
-                        i += 1  # Skip the next quote
-                    else:
-                        in_quotes = False
-                        quote_char = None
-                        current_value += char
-                else:
-                    current_value += char
-
-            i += 1
-
-        if current_value.strip():
-            values.append(current_value.strip())
+                values.append(part.strip())
+
+        if pending is not None:
+            # Unterminated literal runs to the end of the clause
+            last_value = ','.join(pending).strip()
+            if last_value:
+                values.append(last_value)
+        elif not values[-1]:
+            # A trailing empty value is dropped, like a trailing comma
+            values.pop()
 
         return values
 
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Price List Diff
+Compares two price snapshots (an xlsx list, the Product table in PostgreSQL or a SQLite backup,
+or a columnar dump snapshot) column by column and writes only the changed SKUs as SQL updates or COPY data
+"""
+
+import os
+import sys
+import sqlite3
+import argparse
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import List, Optional
+
+from import_price_list import map_header, normalize_sku, parse_number, normalize_currency
+from pump_sqlite_to_postgresql import connect_postgresql, POSTGRESQL_ERRORS
+from convert_sqlite_to_postgresql_final import COPY_TEXT_ESCAPES
+from columnar_snapshot import ColumnarSnapshot, is_snapshot
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+OUTPUT_FORMATS = ('summary', 'sql', 'copy')
+
+# Prices and tax rates are compared as integers in millionths, exactly
+SCALE_DIGITS = 6
+SCALE = 10 ** SCALE_DIGITS
+
+# Rows per UPDATE ... FROM (VALUES ...) statement
+DEFAULT_BATCH_SIZE = 1000
+
+PRODUCT_QUERY = 'SELECT sku, price_base, currency, tax_rate FROM "Product" WHERE sku IS NOT NULL'
+
+# Soft-delete column of Product, missing from databases older than its migration
+DELETED_COLUMN = 'is_deleted'
+
+
+def to_scaled(value: Optional[Decimal]) -> int:
+    """Integer millionths of a decimal amount"""
+    return int((value * SCALE).to_integral_value(ROUND_HALF_EVEN))
+
+
+def from_scaled(value: int) -> str:
+    """SQL/COPY text of an amount held in millionths"""
+    return format(Decimal(int(value)).scaleb(-SCALE_DIGITS).normalize(), 'f')
+
+
+class PriceSnapshot:
+    """Prices of one side of the diff as parallel column arrays, sorted by SKU"""
+
+    def __init__(self, label: str, skus: List[str], prices: List[Decimal], currencies: List[str],
+                 tax_rates: List[Optional[Decimal]]):
+        if numpy is None:
+            raise RuntimeError("numpy not installed: pip install numpy")
+        self.set_columns(label, numpy.array(skus, dtype=str),
+                         numpy.array([to_scaled(price) for price in prices], dtype=numpy.int64),
+                         numpy.array(currencies, dtype=str),
+                         numpy.array([tax_rate is None for tax_rate in tax_rates], dtype=bool),
+                         numpy.array([0 if tax_rate is None else to_scaled(tax_rate) for tax_rate in tax_rates],
+                                     dtype=numpy.int64))
+
+    @classmethod
+    def from_columns(cls, label: str, skus, prices, currencies, tax_missing, tax_rates) -> 'PriceSnapshot':
+        """Snapshot of column arrays with amounts already in millionths"""
+        snapshot = cls.__new__(cls)
+        snapshot.set_columns(label, skus, prices, currencies, tax_missing, tax_rates)
+        return snapshot
+
+    def set_columns(self, label: str, skus, prices, currencies, tax_missing, tax_rates):
+        self.label = label
+
+        # Keep the last row of a repeated SKU, like applying the list top to bottom
+        reversed_skus = skus[::-1]
+        _, first_positions = numpy.unique(reversed_skus, return_index=True)
+        keep = len(skus) - 1 - first_positions
+
+        self.duplicates = len(skus) - len(keep)
+        self.skus = skus[keep]
+        self.prices = prices[keep]
+        self.currencies = currencies[keep]
+        self.tax_missing = tax_missing[keep]
+        self.tax_rates = tax_rates[keep]
+
+    def __len__(self) -> int:
+        return len(self.skus)
+
+
+def load_price_list(price_list: str) -> PriceSnapshot:
+    """Snapshot of an xlsx price list, read in read-only streaming mode"""
+    if openpyxl is None:
+        raise RuntimeError("openpyxl not installed: pip install openpyxl")
+
+    skus, prices, currencies, tax_rates = [], [], [], []
+    workbook = openpyxl.load_workbook(price_list, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        positions = map_header(next(rows, ()))
+
+        def cell(row, field):
+            position = positions.get(field)
+            return row[position] if position is not None and position < len(row) else None
+
+        for row in rows:
+            if not row:
+                continue
+            sku = normalize_sku(cell(row, 'sku'))
+            price = parse_number(cell(row, 'price'))
+            if not sku or price is None:
+                continue
+            skus.append(sku)
+            prices.append(price)
+            currencies.append(normalize_currency(cell(row, 'currency')))
+            tax_rates.append(parse_number(cell(row, 'tax_rate')))
+    finally:
+        workbook.close()
+
+    return PriceSnapshot(price_list, skus, prices, currencies, tax_rates)
+
+
+def load_product_table(source: str) -> PriceSnapshot:
+    """Snapshot of the Product table, from a PostgreSQL DSN or a SQLite database file"""
+    if source.startswith(('postgres://', 'postgresql://')):
+        conn = connect_postgresql(source)
+        not_deleted = f' AND NOT {DELETED_COLUMN}'
+    else:
+        conn = sqlite3.connect(source)
+        not_deleted = f' AND {DELETED_COLUMN} = 0'
+
+    try:
+        cursor = conn.cursor()
+        # Older databases have no soft-delete column: every product is live
+        cursor.execute('SELECT * FROM "Product" LIMIT 0')
+        if DELETED_COLUMN not in [column[0] for column in cursor.description]:
+            not_deleted = ''
+        cursor.execute(PRODUCT_QUERY + not_deleted)
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    return PriceSnapshot(source, [str(sku) for sku, _, _, _ in rows],
+                         [parse_number(price) or Decimal(0) for _, price, _, _ in rows],
+                         [currency or 'ARS' for _, _, currency, _ in rows],
+                         [parse_number(tax_rate) for _, _, _, tax_rate in rows])
+
+
+def scaled_column(column) -> 'numpy.ndarray':
+    """Amounts of a snapshot column in millionths; NULL and unparsable amounts are 0"""
+    if column.kind in ('integer', 'decimal'):
+        return numpy.where(column.null_mask(), 0, column.scaled(SCALE_DIGITS))
+    return numpy.array([to_scaled(parse_number(value) or Decimal(0)) for value in column.values()],
+                       dtype=numpy.int64)
+
+
+def load_dump_snapshot(snapshot_dir: str) -> PriceSnapshot:
+    """Snapshot of the Product rows of a columnar dump snapshot, read column by column"""
+    snapshot = ColumnarSnapshot(snapshot_dir)
+    sku = snapshot.named_column('Product', 'sku')
+    currency = snapshot.named_column('Product', 'currency')
+    tax_rate = snapshot.named_column('Product', 'tax_rate')
+
+    if DELETED_COLUMN not in snapshot.column_names('Product'):
+        live = numpy.ones(snapshot.rows('Product'), dtype=bool)
+    else:
+        deleted = snapshot.named_column('Product', DELETED_COLUMN)
+        if deleted.kind == 'integer':
+            live = numpy.array(deleted.parts['values']) == 0
+        else:
+            live = numpy.array([value in (0, None) for value in deleted.values()], dtype=bool)
+    keep = live & ~sku.null_mask()
+
+    skus = numpy.array([str(value) for value in sku.values()], dtype=str)
+    currencies = numpy.array([value or 'ARS' for value in currency.values()], dtype=str)
+    return PriceSnapshot.from_columns(
+        snapshot_dir, skus[keep], scaled_column(snapshot.named_column('Product', 'price_base'))[keep],
+        currencies[keep], tax_rate.null_mask()[keep], scaled_column(tax_rate)[keep])
+
+
+def load_snapshot(source: str) -> PriceSnapshot:
+    """Snapshot of an xlsx list, a columnar dump snapshot, a PostgreSQL DSN or a SQLite database file"""
+    if source.lower().endswith('.xlsx'):
+        return load_price_list(source)
+    if os.path.isdir(source) and is_snapshot(source):
+        return load_dump_snapshot(source)
+    return load_product_table(source)
+
+
+class PriceDiff:
+    """Added, removed and changed SKUs between two snapshots, computed on whole columns at once"""
+
+    def __init__(self, old: PriceSnapshot, new: PriceSnapshot):
+        self.old = old
+        self.new = new
+
+        common, old_positions, new_positions = numpy.intersect1d(
+            old.skus, new.skus, assume_unique=True, return_indices=True)
+        self.added = numpy.setdiff1d(new.skus, old.skus, assume_unique=True)
+        self.removed = numpy.setdiff1d(old.skus, new.skus, assume_unique=True)
+
+        price_changed = old.prices[old_positions] != new.prices[new_positions]
+        currency_changed = old.currencies[old_positions] != new.currencies[new_positions]
+        # A list without an Iva column (or an empty cell) leaves the tax rate as it is
+        new_tax_known = ~new.tax_missing[new_positions]
+        tax_changed = new_tax_known & (old.tax_missing[old_positions] |
+                                       (old.tax_rates[old_positions] != new.tax_rates[new_positions]))
+
+        changed = price_changed | currency_changed | tax_changed
+        self.changed = common[changed]
+        self.changed_positions = new_positions[changed]
+        self.counts = {
+            'old': len(old),
+            'new': len(new),
+            'unchanged': int(len(common) - changed.sum()),
+            'changed': int(changed.sum()),
+            'price_changed': int(price_changed.sum()),
+            'currency_changed': int(currency_changed.sum()),
+            'tax_rate_changed': int(tax_changed.sum()),
+            'added': len(self.added),
+            'removed': len(self.removed),
+        }
+
+    def iter_changed_rows(self):
+        """(sku, price, currency, tax_rate) text of each changed SKU, from the new side"""
+        new = self.new
+        for position in self.changed_positions:
+            tax_rate = None if new.tax_missing[position] else from_scaled(new.tax_rates[position])
+            yield (str(new.skus[position]), from_scaled(new.prices[position]), str(new.currencies[position]),
+                   tax_rate)
+
+    def to_sql(self, batch_size: int = DEFAULT_BATCH_SIZE) -> List[str]:
+        """UPDATE statements that apply the changed prices to Product by SKU"""
+        def literal(value):
+            return 'NULL' if value is None else "'" + value.replace("'", "''") + "'"
+
+        rows = list(self.iter_changed_rows())
+        statements = []
+        for start in range(0, len(rows), batch_size):
+            values = ',\n    '.join(
+                f"({literal(sku)}, {price}::numeric, {literal(currency)}, "
+                f"{'NULL' if tax_rate is None else tax_rate}::numeric)"
+                for sku, price, currency, tax_rate in rows[start:start + batch_size])
+            statements.append(
+                'UPDATE "Product" AS p SET price_base = v.price_base, currency = v.currency,\n'
+                '    tax_rate = COALESCE(v.tax_rate, p.tax_rate), updated_at = now()\n'
+                f'FROM (VALUES\n    {values}\n) AS v(sku, price_base, currency, tax_rate)\n'
+                'WHERE p.sku = v.sku;')
+        return statements
+
+    def to_copy(self) -> List[str]:
+        """COPY text rows (sku, price_base, currency, tax_rate) of the changed SKUs, for a staging table"""
+        return ['\t'.join('\\N' if value is None else value.translate(COPY_TEXT_ESCAPES) for value in row)
+                for row in self.iter_changed_rows()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Diff two price snapshots and write only the changed SKUs')
+    parser.add_argument('old', help='previous snapshot: xlsx list, PostgreSQL DSN, SQLite database file '
+                                    'or columnar_snapshot.py directory')
+    parser.add_argument('new', help='new snapshot, usually the xlsx list about to be applied')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='summary',
+                        help='print counts only, or write UPDATE statements / COPY rows of the changed SKUs')
+    parser.add_argument('--output', metavar='PATH', help='file for --format sql/copy (default: stdout)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='rows per UPDATE statement with --format sql')
+    args = parser.parse_args()
+
+    try:
+        old = load_snapshot(args.old)
+        new = load_snapshot(args.new)
+    except (RuntimeError, sqlite3.Error, *POSTGRESQL_ERRORS) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    diff = PriceDiff(old, new)
+
+    # Counts go to stderr when stdout carries the delta
+    log = sys.stderr if args.format != 'summary' and not args.output else sys.stdout
+    print(f"Compared {old.label} ({len(old)} SKUs) with {new.label} ({len(new)} SKUs)", file=log)
+    for name, count in diff.counts.items():
+        print(f"  {name}: {count}", file=log)
+    if old.duplicates or new.duplicates:
+        print(f"  repeated SKUs ignored: {old.duplicates} old, {new.duplicates} new (last row kept)", file=log)
+
+    if args.format == 'summary':
+        return
+
+    lines = diff.to_sql(args.batch_size) if args.format == 'sql' else diff.to_copy()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n' if lines else '')
+        print(f"\nDelta written to: {args.output}", file=log)
+    else:
+        for line in lines:
+            print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Excel Price List Importer
+Streams a products-xlsx price list and applies its price/stock changes to Product in batches,
+recording the run in CatalogImport
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+from decimal import Decimal, InvalidOperation
+from typing import List, Dict, Tuple, Any, Optional, Iterator, NamedTuple
+
+from pump_sqlite_to_postgresql import connect_postgresql
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+DEFAULT_PRICE_LIST = 'products-xlsx/lista-productos.xlsx'
+
+# Rows per UPDATE ... FROM (VALUES ...) / INSERT statement
+DEFAULT_BATCH_SIZE = 1000
+
+PRODUCT_QUERY = 'SELECT sku, id, price_base, currency, stock_qty FROM "Product" WHERE sku IS NOT NULL'
+
+# Soft-delete column of Product, missing from databases older than its migration
+DELETED_COLUMN = 'is_deleted'
+
+# Normalized sheet headers for each field, as used by scripts/import-from-xlsx.ts
+HEADER_ALIASES = {
+    'sku': ('código', 'codigo', 'sku', 'cod', 'item', 'referencia'),
+    'currency': ('currency', 'moneda'),
+    'price': ('price', 'precio', 'precio unitario', 'precio sin iva', 'precio unit s/iva', 'unit price'),
+    'stock': ('stock',),
+    'tax_rate': ('iva',),
+}
+
+# Currency cells of the price lists and their Product.currency code
+CURRENCY_CODES = {
+    'U$S': 'USD', 'USD': 'USD', '$USD': 'USD', 'US$': 'USD', 'DOLLAR': 'USD', 'DOLAR': 'USD',
+    '$': 'ARS', 'ARS': 'ARS', '$ARS': 'ARS', 'AR$': 'ARS', 'PESO': 'ARS', 'PESOS': 'ARS',
+}
+
+
+class PriceRow(NamedTuple):
+    sku: str
+    price: Decimal
+    currency: str
+    stock: Optional[Decimal]
+
+
+class ProductState(NamedTuple):
+    id: str
+    price: Decimal
+    currency: str
+    stock: Optional[Decimal]
+
+
+def normalize_sku(value: Any) -> str:
+    """SKU text of a cell: numeric codes lose the '.0' Excel gives them"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    text = str(value).strip() if value is not None else ''
+    if text.endswith('.0') and text[:-2].isdigit():
+        return text[:-2]
+    return text
+
+
+def parse_number(value: Any) -> Optional[Decimal]:
+    """Decimal of a numeric cell or a text amount like '1.234,56' or 'U$S 17.61'"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+
+    text = str(value).upper()
+    for symbol in ('U$S', 'USD', 'US$', 'AR$', 'ARS', '$'):
+        text = text.replace(symbol, '')
+    text = text.strip()
+    if ',' in text:
+        # Spanish format: '.' groups thousands, ',' is the decimal point
+        text = text.replace('.', '').replace(',', '.')
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+
+def normalize_currency(value: Any) -> str:
+    """Product.currency code of a currency cell, ARS when empty or unknown"""
+    return CURRENCY_CODES.get(str(value or '').strip().upper(), 'ARS')
+
+
+def map_header(header: Tuple[Any, ...]) -> Dict[str, int]:
+    """Column position of each field, from a price list's header row"""
+    names = [str(cell).strip().lower() if cell is not None else '' for cell in header]
+    positions = {}
+    for field, aliases in HEADER_ALIASES.items():
+        for alias in aliases:
+            if alias in names:
+                positions[field] = names.index(alias)
+                break
+
+    missing = [field for field in ('sku', 'price') if field not in positions]
+    if missing:
+        raise RuntimeError(f"Price list header has no {', '.join(missing)} column: {names}")
+    return positions
+
+
+class PriceListImporter:
+    def __init__(self, dsn: str, source: str = 'xlsx', batch_size: int = DEFAULT_BATCH_SIZE,
+                 dry_run: bool = False):
+        self.dsn = dsn
+        self.source = source
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+
+        self.counts = {'rows': 0, 'invalid': 0, 'matched': 0, 'unmatched': 0,
+                       'updated': 0, 'unchanged': 0, 'mapped': 0}
+        self.timings = {}
+
+    def read_rows(self, price_list: str) -> Iterator[PriceRow]:
+        """Stream the rows of the first sheet, skipping rows without SKU or price"""
+        if openpyxl is None:
+            raise RuntimeError("openpyxl not installed: pip install openpyxl")
+
+        workbook = openpyxl.load_workbook(price_list, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            positions = map_header(next(rows, ()))
+            width = max(positions.values()) + 1
+
+            def cell(row, field):
+                position = positions.get(field)
+                return row[position] if position is not None else None
+
+            for row in rows:
+                if not row or all(value is None for value in row):
+                    continue
+                self.counts['rows'] += 1
+                if len(row) < width:
+                    row = tuple(row) + (None,) * (width - len(row))
+
+                sku = normalize_sku(cell(row, 'sku'))
+                price = parse_number(cell(row, 'price'))
+                if not sku or price is None:
+                    self.counts['invalid'] += 1
+                    continue
+
+                yield PriceRow(sku, price, normalize_currency(cell(row, 'currency')),
+                               parse_number(cell(row, 'stock')))
+        finally:
+            workbook.close()
+
+    def load_product_index(self, conn: Any) -> Dict[str, ProductState]:
+        """Hash index of the live products by SKU, read in one query"""
+        with conn.cursor() as cursor:
+            # Older databases have no soft-delete column: every product is live
+            cursor.execute('SELECT * FROM "Product" LIMIT 0')
+            if DELETED_COLUMN in [column[0] for column in cursor.description]:
+                cursor.execute(f'{PRODUCT_QUERY} AND NOT {DELETED_COLUMN}')
+            else:
+                cursor.execute(PRODUCT_QUERY)
+            return {sku: ProductState(product_id, price, currency, stock)
+                    for sku, product_id, price, currency, stock in cursor.fetchall()}
+
+    def plan_changes(self, rows: Iterator[PriceRow],
+                     index: Dict[str, ProductState]) -> Tuple[List[Tuple[Any, ...]], List[Tuple[str, str]]]:
+        """Match rows to products, returning the product updates and the SKU -> product mappings"""
+        updates = {}
+        mappings = {}
+        for row in rows:
+            product = index.get(row.sku)
+            if product is None:
+                self.counts['unmatched'] += 1
+                continue
+
+            self.counts['matched'] += 1
+            mappings[row.sku] = product.id
+
+            stock = row.stock if row.stock is not None else product.stock
+            # A later row of the same SKU wins, like applying the rows one by one
+            if row.price == product.price and row.currency == product.currency and stock == product.stock:
+                self.counts['unchanged'] += 1
+                updates.pop(product.id, None)
+                continue
+            updates[product.id] = (product.id, row.price, row.currency, row.stock)
+
+        self.counts['updated'] = len(updates)
+        self.counts['mapped'] = len(mappings)
+        return list(updates.values()), list(mappings.items())
+
+    def apply_updates(self, conn: Any, updates: List[Tuple[Any, ...]]):
+        """Update prices, currency and stock with one UPDATE ... FROM (VALUES ...) per batch"""
+        with conn.cursor() as cursor:
+            for start in range(0, len(updates), self.batch_size):
+                batch = updates[start:start + self.batch_size]
+                values = ', '.join(['(%s, %s::numeric, %s, %s::numeric)'] * len(batch))
+                cursor.execute(
+                    'UPDATE "Product" AS p SET price_base = v.price_base, currency = v.currency, '
+                    'stock_qty = COALESCE(v.stock_qty, p.stock_qty), updated_at = now() '
+                    f'FROM (VALUES {values}) AS v(id, price_base, currency, stock_qty) WHERE p.id = v.id',
+                    [value for update in batch for value in update])
+
+    def apply_mappings(self, conn: Any, mappings: List[Tuple[str, str]]):
+        """Upsert the price list code -> product mapping into ExternalProductMap"""
+        with conn.cursor() as cursor:
+            for start in range(0, len(mappings), self.batch_size):
+                batch = mappings[start:start + self.batch_size]
+                values = ', '.join(['(%s, %s, %s)'] * len(batch))
+                cursor.execute(
+                    f'INSERT INTO "ExternalProductMap" (external_id, product_id, source) VALUES {values} '
+                    'ON CONFLICT (external_id, source) DO UPDATE SET product_id = EXCLUDED.product_id',
+                    [value for external_id, product_id in batch for value in (external_id, product_id, self.source)])
+
+    def start_import(self, conn: Any, price_list: str) -> str:
+        """Record the run in CatalogImport, committed so it is visible while the import runs"""
+        import_id = uuid.uuid4().hex
+        with conn.cursor() as cursor:
+            cursor.execute('INSERT INTO "CatalogImport" (id, source, file_name, status, created_at) '
+                           "VALUES (%s, %s, %s, 'RUNNING', now())",
+                           (import_id, self.source, os.path.basename(price_list)))
+        conn.commit()
+        return import_id
+
+    def finish_import(self, conn: Any, import_id: str, status: str, summary: Dict[str, Any]):
+        """Store the final status and summary of the run"""
+        with conn.cursor() as cursor:
+            cursor.execute('UPDATE "CatalogImport" SET status = %s, summary = %s::jsonb, finished_at = now() '
+                           'WHERE id = %s', (status, json.dumps(summary), import_id))
+        conn.commit()
+
+    def summary(self, price_list: str) -> Dict[str, Any]:
+        """Counts and timings of the run, stored as CatalogImport.summary"""
+        return {
+            'file': os.path.basename(price_list),
+            'dry_run': self.dry_run,
+            'counts': dict(self.counts),
+            'timings': {stage: round(seconds, 3) for stage, seconds in self.timings.items()},
+        }
+
+    def run(self, price_list: str) -> Dict[str, Any]:
+        """Import a price list, returning its summary"""
+        start = time.perf_counter()
+        conn = connect_postgresql(self.dsn)
+        import_id = None
+        try:
+            if not self.dry_run:
+                import_id = self.start_import(conn, price_list)
+
+            stage_start = time.perf_counter()
+            index = self.load_product_index(conn)
+            self.timings['index'] = time.perf_counter() - stage_start
+
+            # Reading and matching overlap: rows are matched as the sheet streams
+            stage_start = time.perf_counter()
+            updates, mappings = self.plan_changes(self.read_rows(price_list), index)
+            self.timings['read'] = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            if not self.dry_run:
+                self.apply_updates(conn, updates)
+                self.apply_mappings(conn, mappings)
+                conn.commit()
+            self.timings['write'] = time.perf_counter() - stage_start
+            self.timings['total'] = time.perf_counter() - start
+
+            summary = self.summary(price_list)
+            if import_id is not None:
+                self.finish_import(conn, import_id, 'COMPLETED', summary)
+            return summary
+        except Exception as e:
+            conn.rollback()
+            if import_id is not None:
+                summary = self.summary(price_list)
+                summary['error'] = str(e)
+                self.finish_import(conn, import_id, 'FAILED', summary)
+            raise
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply a products-xlsx price list to the Product table')
+    parser.add_argument('dsn', help='PostgreSQL connection string, e.g. postgresql://localhost/elecsion')
+    parser.add_argument('price_list', nargs='?', default=DEFAULT_PRICE_LIST,
+                        help=f'xlsx price list (default: {DEFAULT_PRICE_LIST})')
+    parser.add_argument('--source', default='xlsx',
+                        help='CatalogImport.source and ExternalProductMap.source of this list')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='rows per UPDATE/INSERT statement')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='match and count the changes without writing anything')
+    args = parser.parse_args()
+
+    importer = PriceListImporter(args.dsn, args.source, args.batch_size, args.dry_run)
+
+    print(f"Importing price list {args.price_list}...")
+    try:
+        summary = importer.run(args.price_list)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(json.dumps(summary, indent=2))
+    print("\nPrice list import completed successfully!")
+
+if __name__ == "__main__":
+    main()
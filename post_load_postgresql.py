@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+PostgreSQL Post-Load Builder
+Runs the index and foreign key build written by the converter's --post-load-file,
+building indexes concurrently over several connections
+"""
+
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Any, Callable
+
+from pump_sqlite_to_postgresql import connect_postgresql, POSTGRESQL_ERRORS
+
+DEFAULT_CONNECTIONS = 4
+
+
+def read_post_load_statements(post_load_file: str) -> Tuple[List[str], List[str], List[str]]:
+    """Split a post-load file into index builds, NOT VALID foreign keys and validations"""
+    indexes = []
+    add_constraints = []
+    validations = []
+
+    with open(post_load_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            statement = line.strip()
+            if not statement or statement.startswith('--'):
+                continue
+            if statement.startswith(('CREATE INDEX', 'CREATE UNIQUE INDEX')):
+                indexes.append(statement)
+            elif ' VALIDATE CONSTRAINT ' in statement:
+                validations.append(statement)
+            else:
+                add_constraints.append(statement)
+
+    return indexes, add_constraints, validations
+
+
+def run_concurrently(dsn: str, statements: List[str], connections: int,
+                     connect: Callable[[str], Any] = connect_postgresql):
+    """Run independent statements over a pool of autocommit connections"""
+    local = threading.local()
+    opened = []
+    lock = threading.Lock()
+
+    def execute(statement: str) -> float:
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = local.conn = connect(dsn)
+            conn.autocommit = True
+            with lock:
+                opened.append(conn)
+
+        start = time.perf_counter()
+        with conn.cursor() as cursor:
+            cursor.execute(statement)
+        return time.perf_counter() - start
+
+    try:
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            for statement, elapsed in zip(statements, executor.map(execute, statements)):
+                print(f"  {elapsed:6.2f}s  {statement}")
+    finally:
+        for conn in opened:
+            conn.close()
+
+
+def run_post_load(dsn: str, post_load_file: str, connections: int = DEFAULT_CONNECTIONS):
+    """Build indexes concurrently, then add the foreign keys as NOT VALID and validate them"""
+    indexes, add_constraints, validations = read_post_load_statements(post_load_file)
+
+    print(f"Building {len(indexes)} indexes over {connections} connections...")
+    run_concurrently(dsn, indexes, connections)
+
+    # Adding NOT VALID constraints only takes brief locks; do it in one transaction
+    print(f"\nAdding {len(add_constraints)} foreign keys...")
+    conn = connect_postgresql(dsn)
+    try:
+        with conn.cursor() as cursor:
+            for statement in add_constraints:
+                cursor.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"\nValidating {len(validations)} foreign keys...")
+    run_concurrently(dsn, validations, connections)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build indexes and foreign keys after a bulk load')
+    parser.add_argument('post_load_file', help='file written by the converter with --post-load-file')
+    parser.add_argument('dsn', help='PostgreSQL connection string, e.g. postgresql://localhost/elecsion')
+    parser.add_argument('--connections', type=int, default=DEFAULT_CONNECTIONS,
+                        help='number of connections building indexes at the same time')
+    args = parser.parse_args()
+
+    print("Starting post-load build...")
+    try:
+        run_post_load(args.dsn, args.post_load_file, args.connections)
+    except (RuntimeError, *POSTGRESQL_ERRORS) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print("\nPost-load build completed successfully!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Prisma Schema Loader
+Parses prisma/schema.prisma into a compact typed model of tables, columns, indexes and relations
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+from typing import List, Dict, Tuple, Any, Optional, NamedTuple
+
+DEFAULT_SCHEMA_FILE = 'prisma/schema.prisma'
+
+# Bump when the cached model layout changes
+CACHE_VERSION = 1
+
+SCALAR_TYPES = {'String', 'Int', 'BigInt', 'Float', 'Decimal', 'Boolean', 'DateTime', 'Json', 'Bytes'}
+
+# Column types of the SQLite dump that correspond to Prisma scalar types
+PRISMA_TO_SQLITE_TYPES = {
+    'String': 'TEXT',
+    'Int': 'INTEGER',
+    'BigInt': 'INTEGER',
+    'Float': 'REAL',
+    'Decimal': 'DECIMAL',
+    'Boolean': 'BOOLEAN',
+    'DateTime': 'DATETIME',
+    'Json': 'JSONB',
+    'Bytes': 'BLOB',
+}
+
+TRAILING_COMMENT = re.compile(r'//[^"]*$')
+BLOCK_START = re.compile(r'^(model|enum)\s+(\w+)\s*\{')
+FIELD_LINE = re.compile(r'^(\w+)\s+(\w+)(\[\])?(\?)?(.*)$')
+MAP_ATTRIBUTE = re.compile(r'@map\(\s*"([^"]+)"')
+RELATION_FIELDS = re.compile(r'fields:\s*\[([^\]]*)\]')
+RELATION_REFERENCES = re.compile(r'references:\s*\[([^\]]*)\]')
+BLOCK_MAP = re.compile(r'^@@map\(\s*"([^"]+)"')
+BLOCK_FIELD_LIST = re.compile(r'^@@(index|unique|id)\(\s*(?:fields:\s*)?\[([^\]]*)\]')
+
+
+class PrismaColumn(NamedTuple):
+    name: str          # database column name (@map or the field name)
+    field: str         # Prisma field name
+    type: str          # Prisma scalar type or enum name
+    optional: bool
+
+
+class PrismaIndex(NamedTuple):
+    columns: Tuple[str, ...]
+    unique: bool
+
+
+class PrismaForeignKey(NamedTuple):
+    columns: Tuple[str, ...]
+    referenced_table: str
+    referenced_columns: Tuple[str, ...]
+
+
+class PrismaTable(NamedTuple):
+    model: str
+    name: str          # database table name (@@map or the model name)
+    columns: Tuple[PrismaColumn, ...]
+    primary_key: Tuple[str, ...]
+    indexes: Tuple[PrismaIndex, ...]
+    foreign_keys: Tuple[PrismaForeignKey, ...]
+
+    def column_types(self) -> Dict[str, str]:
+        """Prisma type of each column, keyed by database column name"""
+        return {column.name: column.type for column in self.columns}
+
+
+class PrismaSchema(NamedTuple):
+    tables: Dict[str, PrismaTable]      # keyed by database table name
+    enums: Dict[str, Tuple[str, ...]]
+
+
+def _split_names(names: str) -> List[str]:
+    """Split a Prisma field list like 'a, b(sort: Desc)' into field names"""
+    return [name.strip().split('(')[0].strip() for name in names.split(',') if name.strip()]
+
+
+def parse_prisma_schema(text: str) -> PrismaSchema:
+    """Parse the text of a schema.prisma file"""
+    models = []
+    enums = {}
+    block_kind = None
+    block_name = None
+    block_lines = []
+
+    for raw_line in text.split('\n'):
+        line = TRAILING_COMMENT.sub('', raw_line).strip()
+        if not line:
+            continue
+
+        if block_kind is None:
+            match = BLOCK_START.match(line)
+            if match:
+                block_kind, block_name = match.groups()
+                block_lines = []
+            continue
+
+        if line == '}':
+            if block_kind == 'model':
+                models.append((block_name, block_lines))
+            else:
+                enums[block_name] = tuple(block_lines)
+            block_kind = None
+            continue
+
+        block_lines.append(line)
+
+    enum_names = set(enums)
+    model_names = {name for name, _ in models}
+
+    # First pass: table names and field -> column maps, needed to resolve relations
+    table_names = {}
+    field_columns = {}
+    for model_name, lines in models:
+        table_names[model_name] = model_name
+        field_columns[model_name] = {}
+        for line in lines:
+            block_map = BLOCK_MAP.match(line)
+            if block_map:
+                table_names[model_name] = block_map.group(1)
+                continue
+            field = FIELD_LINE.match(line)
+            if field and not line.startswith('@@'):
+                field_name = field.group(1)
+                column_map = MAP_ATTRIBUTE.search(field.group(5))
+                field_columns[model_name][field_name] = column_map.group(1) if column_map else field_name
+
+    # Second pass: columns, keys, indexes and foreign keys
+    tables = {}
+    for model_name, lines in models:
+        to_columns = field_columns[model_name]
+        columns = []
+        primary_key = ()
+        indexes = []
+        foreign_keys = []
+
+        for line in lines:
+            if line.startswith('@@'):
+                block_fields = BLOCK_FIELD_LIST.match(line)
+                if block_fields:
+                    kind, names = block_fields.groups()
+                    index_columns = tuple(to_columns.get(name, name) for name in _split_names(names))
+                    if kind == 'id':
+                        primary_key = index_columns
+                    else:
+                        indexes.append(PrismaIndex(index_columns, kind == 'unique'))
+                continue
+
+            field = FIELD_LINE.match(line)
+            if not field:
+                continue
+
+            field_name, field_type, is_list, optional, attributes = field.groups()
+
+            if field_type in model_names:
+                # Relation field: only the owning side (with fields: [...]) maps to a foreign key
+                fields = RELATION_FIELDS.search(attributes)
+                references = RELATION_REFERENCES.search(attributes)
+                if fields and references:
+                    foreign_keys.append(PrismaForeignKey(
+                        tuple(to_columns.get(name, name) for name in _split_names(fields.group(1))),
+                        table_names[field_type],
+                        tuple(field_columns[field_type].get(name, name)
+                              for name in _split_names(references.group(1)))
+                    ))
+                continue
+
+            if is_list or (field_type not in SCALAR_TYPES and field_type not in enum_names):
+                continue
+
+            column_name = to_columns[field_name]
+            columns.append(PrismaColumn(column_name, field_name, field_type, bool(optional)))
+
+            if re.search(r'@id\b', attributes):
+                primary_key = (column_name,)
+            if re.search(r'@unique\b', attributes):
+                indexes.append(PrismaIndex((column_name,), True))
+
+        table_name = table_names[model_name]
+        tables[table_name] = PrismaTable(model_name, table_name, tuple(columns), primary_key,
+                                         tuple(indexes), tuple(foreign_keys))
+
+    return PrismaSchema(tables, enums)
+
+
+def schema_to_json(schema: PrismaSchema) -> Dict[str, Any]:
+    """Convert a parsed schema into plain JSON data"""
+    return {
+        'tables': [
+            {
+                'model': table.model,
+                'name': table.name,
+                'columns': [list(column) for column in table.columns],
+                'primary_key': list(table.primary_key),
+                'indexes': [[list(index.columns), index.unique] for index in table.indexes],
+                'foreign_keys': [[list(fk.columns), fk.referenced_table, list(fk.referenced_columns)]
+                                 for fk in table.foreign_keys],
+            }
+            for table in schema.tables.values()
+        ],
+        'enums': {name: list(values) for name, values in schema.enums.items()},
+    }
+
+
+def schema_from_json(data: Dict[str, Any]) -> PrismaSchema:
+    """Rebuild a parsed schema from schema_to_json data"""
+    tables = {}
+    for table in data['tables']:
+        tables[table['name']] = PrismaTable(
+            table['model'],
+            table['name'],
+            tuple(PrismaColumn(*column) for column in table['columns']),
+            tuple(table['primary_key']),
+            tuple(PrismaIndex(tuple(columns), unique) for columns, unique in table['indexes']),
+            tuple(PrismaForeignKey(tuple(columns), referenced_table, tuple(referenced_columns))
+                  for columns, referenced_table, referenced_columns in table['foreign_keys']),
+        )
+    enums = {name: tuple(values) for name, values in data['enums'].items()}
+    return PrismaSchema(tables, enums)
+
+
+def default_cache_file(schema_file: str) -> str:
+    """Cache file kept next to the schema file"""
+    return os.path.join(os.path.dirname(os.path.abspath(schema_file)), '.schema_cache.json')
+
+
+def load_prisma_schema(schema_file: str = DEFAULT_SCHEMA_FILE, cache_file: Optional[str] = None) -> PrismaSchema:
+    """Load a schema.prisma file, reusing the parsed model cached on disk while the file hash matches"""
+    with open(schema_file, 'rb') as f:
+        content = f.read()
+    file_hash = hashlib.sha256(content).hexdigest()
+
+    if cache_file is None:
+        cache_file = default_cache_file(schema_file)
+
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('version') == CACHE_VERSION and cached.get('hash') == file_hash:
+            return schema_from_json(cached['schema'])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    schema = parse_prisma_schema(content.decode('utf-8'))
+
+    try:
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'hash': file_hash, 'schema': schema_to_json(schema)}, f)
+    except OSError:
+        # A read-only checkout still works, it just parses every time
+        pass
+
+    return schema
+
+
+def main():
+    schema_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SCHEMA_FILE
+    schema = load_prisma_schema(schema_file)
+
+    for table in schema.tables.values():
+        print(f"{table.name} ({table.model}): {len(table.columns)} columns")
+        print(f"  Columns: {', '.join(f'{column.name} {column.type}' for column in table.columns)}")
+        print(f"  Primary key: {', '.join(table.primary_key)}")
+        for index in table.indexes:
+            print(f"  {'Unique' if index.unique else 'Index'}: {', '.join(index.columns)}")
+        for fk in table.foreign_keys:
+            print(f"  Foreign key: {', '.join(fk.columns)} -> {fk.referenced_table}({', '.join(fk.referenced_columns)})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+SQLite to PostgreSQL 16 Data Pump
+Streams rows from a SQLite database straight into PostgreSQL with COPY, without a text dump
+"""
+
+import re
+import sys
+import sqlite3
+import argparse
+from typing import List, Dict, Any, Optional, Iterator, Callable, Tuple
+
+from convert_sqlite_to_postgresql_final import SQLiteToPostgreSQLConverter, COPY_TEXT_ESCAPES
+from prisma_schema import PrismaSchema, load_prisma_schema
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+# Error base classes of the installed PostgreSQL drivers (empty when neither is installed)
+POSTGRESQL_ERRORS = tuple(driver.Error for driver in (psycopg, psycopg2) if driver is not None)
+
+# Rows fetched from SQLite per round trip
+DEFAULT_FETCH_SIZE = 5000
+
+
+class SQLiteToPostgreSQLPump:
+    def __init__(self, sqlite_path: str, fetch_size: int = DEFAULT_FETCH_SIZE,
+                 prisma_schema: Optional[PrismaSchema] = None):
+        self.sqlite_path = sqlite_path
+        self.fetch_size = fetch_size
+
+        # The converter holds the table schemas and the type rules (DATETIME/BOOLEAN columns)
+        self.converter = SQLiteToPostgreSQLConverter(prisma_schema=prisma_schema)
+
+    def read_table_schema(self, sqlite_conn: sqlite3.Connection, table_name: str) -> Dict[str, Any]:
+        """Columns and declared types of a table from PRAGMA table_info, in the converter's schema layout.
+
+        The stored CREATE TABLE text is not parsed: after ALTER TABLE ADD COLUMN,
+        SQLite appends the new columns to one line of it.
+        """
+        schema = {'columns': [], 'column_types': {}, 'column_positions': {}}
+        for position, (_, col_name, col_type, _, _, _) in enumerate(
+                sqlite_conn.execute(f'PRAGMA table_info("{table_name}")')):
+            # Only the type name matters to the converter, e.g. DECIMAL of DECIMAL(10,2)
+            type_name = re.match(r'\w*', col_type or '').group(0).upper()
+            schema['columns'].append(col_name)
+            schema['column_types'][col_name] = type_name
+            schema['column_positions'][col_name] = position
+        return schema
+
+    def load_schemas(self, sqlite_conn: sqlite3.Connection) -> List[str]:
+        """Read the table schemas into the converter, returning table names in order"""
+        tables = [table_name for (table_name,) in sqlite_conn.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid")]
+
+        for table_name in tables:
+            self.converter.register_table_schema(table_name, self.read_table_schema(sqlite_conn, table_name))
+
+        return tables
+
+    def copy_timestamp(self, value: Any) -> str:
+        """COPY field for a timestamp column holding epoch milliseconds or a datetime string"""
+        if isinstance(value, float) and value.is_integer():
+            # REAL epoch values would otherwise reach the formatter as '1757619795000.0'
+            value = int(value)
+        return self.converter.convert_timestamp_from_epoch(str(value))[1:-1].translate(COPY_TEXT_ESCAPES)
+
+    def copy_boolean(self, value: Any) -> str:
+        """COPY field for a boolean column stored as 0/1"""
+        if isinstance(value, int):
+            return 'true' if value else 'false'
+        return str(value).translate(COPY_TEXT_ESCAPES)
+
+    def copy_untyped(self, value: Any) -> str:
+        """COPY field for a column without special type handling"""
+        if isinstance(value, str):
+            return value.translate(COPY_TEXT_ESCAPES)
+        if isinstance(value, bytes):
+            return '\\\\x' + value.hex()
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    def compile_copy_plan(self, table_name: str) -> Tuple[Callable[[Any], str], ...]:
+        """Build the tuple of COPY field formatters for a table, indexed by column position"""
+        columns = self.converter.table_schemas.get(table_name, {}).get('columns', [])
+
+        plan = []
+        for col_position in range(len(columns)):
+            if self.converter.is_timestamp_column(table_name, col_position):
+                plan.append(self.copy_timestamp)
+            elif self.converter.is_boolean_column(table_name, col_position):
+                plan.append(self.copy_boolean)
+            else:
+                plan.append(self.copy_untyped)
+
+        return tuple(plan)
+
+    def iter_copy_data(self, sqlite_conn: sqlite3.Connection, table_name: str) -> Iterator[str]:
+        """Yield COPY text data for a table, one string per fetchmany batch"""
+        columns = self.converter.table_schemas[table_name]['columns']
+        plan = self.compile_copy_plan(table_name)
+        column_list = ', '.join(f'"{column}"' for column in columns)
+
+        cursor = sqlite_conn.execute(f'SELECT {column_list} FROM "{table_name}"')
+        while True:
+            rows = cursor.fetchmany(self.fetch_size)
+            if not rows:
+                break
+
+            lines = []
+            for row in rows:
+                lines.append('\t'.join([
+                    '\\N' if value is None else convert(value)
+                    for convert, value in zip(plan, row)
+                ]))
+            lines.append('')
+            yield '\n'.join(lines)
+
+    def generate_copy_command(self, table_name: str) -> str:
+        """Generate the COPY ... FROM STDIN command for a table"""
+        columns = self.converter.table_schemas[table_name]['columns']
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        return f'COPY "{table_name}" ({column_list}) FROM STDIN'
+
+    def pump_table(self, sqlite_conn: sqlite3.Connection, pg_conn: Any, table_name: str) -> int:
+        """Stream one table into PostgreSQL, returning the number of rows copied"""
+        return copy_into(pg_conn, self.generate_copy_command(table_name),
+                         self.iter_copy_data(sqlite_conn, table_name))
+
+    def run(self, dsn: str, tables: Optional[List[str]] = None, truncate: bool = False):
+        """Copy the selected tables (all by default) in one PostgreSQL transaction"""
+        sqlite_conn = sqlite3.connect(self.sqlite_path)
+        try:
+            all_tables = self.load_schemas(sqlite_conn)
+            selected = [table for table in all_tables if not tables or table in tables]
+
+            pg_conn = connect_postgresql(dsn)
+            try:
+                with pg_conn.cursor() as pg_cursor:
+                    # Disable foreign key checks during import, like the converted scripts do
+                    pg_cursor.execute("SET session_replication_role = replica")
+                    if truncate and selected:
+                        quoted = ', '.join(f'"{table}"' for table in selected)
+                        pg_cursor.execute(f"TRUNCATE {quoted}")
+
+                for table_name in selected:
+                    row_count = self.pump_table(sqlite_conn, pg_conn, table_name)
+                    print(f"  - {table_name}: {row_count} rows")
+
+                with pg_conn.cursor() as pg_cursor:
+                    pg_cursor.execute("SET session_replication_role = DEFAULT")
+                pg_conn.commit()
+            except Exception:
+                pg_conn.rollback()
+                raise
+            finally:
+                pg_conn.close()
+        finally:
+            sqlite_conn.close()
+
+
+class _IteratorReader:
+    """Minimal file-like reader over string blocks, for psycopg2's copy_expert"""
+
+    def __init__(self, blocks: Iterator[str]):
+        self.blocks = blocks
+        self.buffer = ''
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self.buffer) < size:
+            block = next(self.blocks, None)
+            if block is None:
+                break
+            self.buffer += block
+
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def copy_into(pg_conn: Any, command: str, blocks: Iterator[str]) -> int:
+    """Run COPY ... FROM STDIN feeding it text blocks, returning the number of rows copied"""
+    with pg_conn.cursor() as pg_cursor:
+        if psycopg is not None and isinstance(pg_conn, psycopg.Connection):
+            with pg_cursor.copy(command) as copy:
+                for block in blocks:
+                    copy.write(block)
+        else:
+            pg_cursor.copy_expert(command, _IteratorReader(blocks))
+        return pg_cursor.rowcount
+
+
+def connect_postgresql(dsn: str) -> Any:
+    """Open a PostgreSQL connection with psycopg 3, falling back to psycopg2"""
+    if psycopg is not None:
+        return psycopg.connect(dsn)
+    if psycopg2 is not None:
+        return psycopg2.connect(dsn)
+    raise RuntimeError("PostgreSQL driver not found: install psycopg (or psycopg2)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Copy a SQLite database into PostgreSQL 16 without a text dump')
+    parser.add_argument('sqlite_path', help='SQLite database file, e.g. prisma/dev.db')
+    parser.add_argument('dsn', help='PostgreSQL connection string, e.g. postgresql://localhost/elecsion')
+    parser.add_argument('--tables', nargs='+', help='only copy these tables')
+    parser.add_argument('--fetch-size', type=int, default=DEFAULT_FETCH_SIZE,
+                        help='rows read from SQLite per fetchmany call')
+    parser.add_argument('--truncate', action='store_true', help='empty the target tables first')
+    parser.add_argument('--prisma-schema', metavar='PATH',
+                        help='take column types from a schema.prisma file instead of SQLite')
+    args = parser.parse_args()
+
+    prisma_schema = load_prisma_schema(args.prisma_schema) if args.prisma_schema else None
+    pump = SQLiteToPostgreSQLPump(args.sqlite_path, args.fetch_size, prisma_schema)
+
+    print("Starting SQLite to PostgreSQL data pump...")
+    try:
+        pump.run(args.dsn, args.tables, args.truncate)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print("\nData pump completed successfully!")
+
+if __name__ == "__main__":
+    main()
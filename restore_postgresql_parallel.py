@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+PostgreSQL Parallel Restore
+Loads a restore directory written by the converter's --restore-dir, copying independent
+tables at the same time over a pool of connections, then builds indexes and foreign keys
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Iterator, TextIO
+
+from convert_sqlite_to_postgresql_final import RESTORE_MANIFEST_FILE
+from pump_sqlite_to_postgresql import connect_postgresql, copy_into, POSTGRESQL_ERRORS
+from post_load_postgresql import run_post_load, DEFAULT_CONNECTIONS
+
+# Data file lines sent to the server per COPY write or execute call
+LINES_PER_BLOCK = 1000
+
+
+def load_manifest(restore_dir: str) -> Dict[str, Any]:
+    """Read the manifest.json of a restore directory"""
+    with open(os.path.join(restore_dir, RESTORE_MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_copy_blocks(f: TextIO) -> Iterator[str]:
+    """Yield the COPY data of a table data file up to its end-of-data marker"""
+    block = []
+    for line in f:
+        if line.rstrip('\n') == '\\.':
+            break
+        block.append(line)
+        if len(block) >= LINES_PER_BLOCK:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+def load_table_file(conn: Any, data_file: str) -> int:
+    """Load one table data file in its own transaction.
+
+    Returns the number of rows copied for a COPY file, or of statements run
+    for a file of INSERT statements.
+    """
+    rows = 0
+    with open(data_file, 'r', encoding='utf-8') as f:
+        first_line = f.readline()
+        if first_line.startswith('COPY '):
+            command = first_line.strip().rstrip(';')
+            rows = copy_into(conn, command, iter_copy_blocks(f))
+        else:
+            with conn.cursor() as cursor:
+                lines = [first_line]
+                for line in f:
+                    lines.append(line)
+                    if len(lines) >= LINES_PER_BLOCK:
+                        cursor.execute(''.join(lines))
+                        rows += len(lines)
+                        lines = []
+                if lines:
+                    cursor.execute(''.join(lines))
+                    rows += len(lines)
+    conn.commit()
+    return rows
+
+
+def schedule_tables(tables: Dict[str, Dict[str, Any]], done: List[str], running: List[str]) -> List[str]:
+    """Tables whose data can be loaded now, largest first.
+
+    A table is ready once every table it references is loaded. Foreign keys
+    are only added after the load, so when a cycle leaves nothing ready and
+    nothing running, the largest waiting table is released anyway.
+    """
+    waiting = [name for name, table in tables.items()
+               if table['file'] and name not in done and name not in running]
+    ready = [name for name in waiting
+             if all(dependency in done or not tables.get(dependency, {}).get('file')
+                    for dependency in tables[name]['depends_on'])]
+    if not ready and not running and waiting:
+        ready = [max(waiting, key=lambda name: tables[name]['bytes'])]
+    return sorted(ready, key=lambda name: tables[name]['bytes'], reverse=True)
+
+
+def restore_tables(dsn: str, restore_dir: str, manifest: Dict[str, Any], connections: int):
+    """Load every table data file, running independent tables concurrently"""
+    tables = manifest['tables']
+    unit = 'rows' if manifest['format'] == 'copy' else 'statements'
+    local = threading.local()
+    opened = []
+    lock = threading.Lock()
+
+    def load(table_name: str):
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = local.conn = connect_postgresql(dsn)
+            with lock:
+                opened.append(conn)
+
+        start = time.perf_counter()
+        try:
+            rows = load_table_file(conn, os.path.join(restore_dir, tables[table_name]['file']))
+        except Exception as e:
+            try:
+                conn.rollback()
+            except POSTGRESQL_ERRORS:
+                # The connection is gone; the error that lost it is the one to report
+                pass
+            if isinstance(e, POSTGRESQL_ERRORS):
+                raise RuntimeError(f"Loading table {table_name} failed: {e}") from e
+            raise
+        return rows, time.perf_counter() - start
+
+    done = []
+    running = {}
+    try:
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            while True:
+                for table_name in schedule_tables(tables, done, list(running.values())):
+                    if len(running) >= connections:
+                        break
+                    running[executor.submit(load, table_name)] = table_name
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    table_name = running.pop(future)
+                    rows, elapsed = future.result()
+                    done.append(table_name)
+                    print(f"  {elapsed:6.2f}s  {table_name}: {rows} {unit}")
+    finally:
+        for conn in opened:
+            conn.close()
+
+
+def run_script(dsn: str, script_file: str):
+    """Run a whole SQL script (the schema file) on one connection"""
+    with open(script_file, 'r', encoding='utf-8') as f:
+        script = f.read()
+
+    conn = connect_postgresql(dsn)
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(script)
+    finally:
+        conn.close()
+
+
+def run_restore(dsn: str, restore_dir: str, connections: int = DEFAULT_CONNECTIONS):
+    """Create the tables, load their data in parallel, then build indexes and foreign keys"""
+    manifest = load_manifest(restore_dir)
+
+    print("Creating tables...")
+    run_script(dsn, os.path.join(restore_dir, manifest['schema']))
+
+    table_count = sum(1 for table in manifest['tables'].values() if table['file'])
+    print(f"\nLoading {table_count} tables over {connections} connections...")
+    restore_tables(dsn, restore_dir, manifest, connections)
+
+    if manifest.get('post_load'):
+        print()
+        run_post_load(dsn, os.path.join(restore_dir, manifest['post_load']), connections)
+    else:
+        print("\nNo post-load build in this restore directory (the dump had no COMMIT)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Restore a converter restore directory into PostgreSQL 16 in parallel')
+    parser.add_argument('restore_dir', help='directory written by the converter with --restore-dir')
+    parser.add_argument('dsn', help='PostgreSQL connection string, e.g. postgresql://localhost/elecsion')
+    parser.add_argument('--connections', type=int, default=DEFAULT_CONNECTIONS,
+                        help='number of tables loaded (and indexes built) at the same time')
+    args = parser.parse_args()
+
+    print("Starting parallel restore...")
+    try:
+        run_restore(args.dsn, args.restore_dir, args.connections)
+    except (RuntimeError, *POSTGRESQL_ERRORS) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print("\nParallel restore completed successfully!")
+
+if __name__ == "__main__":
+    main()
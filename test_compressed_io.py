@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the compressed dump readers and writers
+Run with: python -m pytest test_compressed_io.py
+"""
+
+import os
+
+import pytest
+
+import compressed_io
+from compressed_io import BLOCK_SIZE, QUEUE_BLOCKS, detect_compression, open_input, open_output
+from convert_sqlite_to_postgresql_final import SQLiteToPostgreSQLConverter
+
+PRODUCTION_DUMP = 'database/backups/production_backup.sql'
+
+# More text than the background threads buffer, with multi-byte characters across block boundaries
+TEXT = ''.join(f"INSERT INTO Note VALUES('n{number}','ñandú €{number}');\n"
+               for number in range(BLOCK_SIZE * QUEUE_BLOCKS // 40))
+
+COMPRESSED_FILES = [('gzip', 'dump.sql.gz'), ('zstd', 'dump.sql.zst'), ('lzma', 'dump.sql.xz')]
+
+
+def require(compression):
+    if compression == 'zstd' and compressed_io.zstandard is None:
+        pytest.skip('zstandard not installed')
+
+
+@pytest.mark.parametrize('compression, file_name', COMPRESSED_FILES)
+def test_round_trip(tmp_path, compression, file_name):
+    require(compression)
+    path = str(tmp_path / file_name)
+    assert detect_compression(path) == compression
+
+    with open_output(path) as f:
+        for start in range(0, len(TEXT), 100003):
+            f.write(TEXT[start:start + 100003])
+    assert os.path.getsize(path) < len(TEXT.encode('utf-8')) // 4
+
+    with open_input(path) as f:
+        assert f.read() == TEXT
+    with open_input(path) as f:
+        assert sum(1 for line in f) == TEXT.count('\n')
+
+
+def test_reader_closed_early_stops_its_thread(tmp_path):
+    path = str(tmp_path / 'dump.sql.gz')
+    with open_output(path) as f:
+        f.write(TEXT)
+
+    f = open_input(path)
+    f.readline()
+    f.close()
+    assert not f.buffer.raw.thread.is_alive()
+
+
+@pytest.mark.parametrize('compression, file_name', COMPRESSED_FILES)
+def test_compressed_conversion_matches_plain(tmp_path, compression, file_name):
+    require(compression)
+    compressed_dump = str(tmp_path / file_name)
+    with open(PRODUCTION_DUMP, encoding='utf-8') as src, open_output(compressed_dump) as dst:
+        dst.write(src.read())
+
+    plain_output = tmp_path / 'plain.sql'
+    compressed_output = str(tmp_path / ('out' + file_name[4:]))
+    SQLiteToPostgreSQLConverter().convert_file(PRODUCTION_DUMP, str(plain_output))
+    SQLiteToPostgreSQLConverter().convert_file(compressed_dump, compressed_output)
+
+    def body(text):
+        return [line for line in text.split('\n') if not line.startswith('-- Generated on:')]
+
+    with open_input(compressed_output) as f:
+        assert body(f.read()) == body(plain_output.read_text(encoding='utf-8'))
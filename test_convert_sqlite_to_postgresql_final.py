@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the final SQLite to PostgreSQL converter
+Run with: python -m pytest test_convert_sqlite_to_postgresql_final.py
+"""
+
+import datetime
+
+import pytest
+
+from convert_sqlite_to_postgresql_final import (SQLiteToPostgreSQLConverter, ConvertedRowCache, IncrementalState,
+                                                MappedDump, EpochTimestampFormatter, MAX_EPOCH_MS,
+                                                ConversionCheckpoint)
+
+# Two tables with the same column layout holding the same row
+IDENTICAL_TABLES_DUMP = '''PRAGMA foreign_keys=OFF;
+BEGIN TRANSACTION;
+CREATE TABLE IF NOT EXISTS "A" ("id" TEXT NOT NULL PRIMARY KEY, "n" INTEGER);
+INSERT INTO A VALUES('x',1);
+CREATE TABLE IF NOT EXISTS "B" ("id" TEXT NOT NULL PRIMARY KEY, "n" INTEGER);
+INSERT INTO B VALUES('x',1);
+COMMIT;
+'''
+
+# Rows with a comma inside a literal before the watermark column
+ORDERS_DUMP = '''PRAGMA foreign_keys=OFF;
+BEGIN TRANSACTION;
+CREATE TABLE IF NOT EXISTS "Order" (
+    "id" TEXT NOT NULL PRIMARY KEY,
+    "note" TEXT,
+    "updated_at" DATETIME NOT NULL
+);
+{rows}
+COMMIT;
+'''
+
+
+# A text column with COPY's special characters and a blob column
+FILES_DUMP = '''PRAGMA foreign_keys=OFF;
+BEGIN TRANSACTION;
+CREATE TABLE IF NOT EXISTS "File" (
+    "id" TEXT NOT NULL PRIMARY KEY,
+    "name" TEXT,
+    "data" BLOB
+);
+INSERT INTO File VALUES('f1','tab\tback\\slash it''s\r',X'00FF10');
+INSERT INTO File VALUES('f2',NULL,NULL);
+COMMIT;
+'''
+
+
+def converted_lines(tmp_path, dump_text, converter, **options):
+    dump = tmp_path / 'dump.sql'
+    output = tmp_path / 'out.sql'
+    dump.write_text(dump_text, encoding='utf-8', newline='')
+    converter.convert_file(str(dump), str(output), **options)
+    return output.read_text(encoding='utf-8').split('\n')
+
+
+def converted_rows(tmp_path, dump_text, converter):
+    return [line for line in converted_lines(tmp_path, dump_text, converter) if line.startswith('INSERT INTO')]
+
+
+def test_row_cache_keeps_tables_with_the_same_columns_apart(tmp_path):
+    dump = tmp_path / 'dump.sql'
+    dump.write_text(IDENTICAL_TABLES_DUMP, encoding='utf-8')
+
+    for run in range(2):
+        output = tmp_path / f'out{run}.sql'
+        row_cache = ConvertedRowCache(str(tmp_path / 'rows.cache'))
+        try:
+            SQLiteToPostgreSQLConverter(row_cache=row_cache).convert_file(str(dump), str(output))
+        finally:
+            row_cache.close()
+
+        inserts = [line for line in output.read_text(encoding='utf-8').splitlines()
+                   if line.startswith('INSERT INTO')]
+        assert [line.split()[2] for line in inserts] == ['"A"', '"B"']
+
+
+def test_deferred_foreign_keys_validate_by_name_or_stay_inline():
+    converter = SQLiteToPostgreSQLConverter(defer_constraints=True)
+    table = converter.convert_table_definition('Item', '''
+        "id" TEXT NOT NULL PRIMARY KEY,
+        "order_id" TEXT,
+        "product_id" TEXT,
+        "brand_id" TEXT,
+        CONSTRAINT "Item_order_id_fkey" FOREIGN KEY ("order_id") REFERENCES "Order" ("id"),
+        CONSTRAINT item_product_fkey FOREIGN KEY ("product_id") REFERENCES "Product" ("id"),
+        CONSTRAINT FOREIGN KEY ("brand_id") REFERENCES "Brand" ("id")''')
+
+    # Without a name it could not be validated later, so it is created with the table
+    assert 'CONSTRAINT FOREIGN KEY ("brand_id")' in table
+    statements = converter.generate_post_load_statements()
+    assert 'ALTER TABLE "Item" VALIDATE CONSTRAINT "Item_order_id_fkey";' in statements
+    assert 'ALTER TABLE "Item" VALIDATE CONSTRAINT item_product_fkey;' in statements
+    assert len([statement for statement in statements if 'VALIDATE' in statement]) == 2
+
+
+def test_table_schema_keeps_columns_appended_by_alter_table():
+    schema = SQLiteToPostgreSQLConverter().parse_table_schema('User', '''CREATE TABLE IF NOT EXISTS "User" (
+    "id" TEXT NOT NULL PRIMARY KEY,
+    "role" TEXT NOT NULL DEFAULT 'A, B',
+    "price" DECIMAL(10,2),
+    "assigned_seller_id" TEXT, "address" TEXT, "is_active" BOOLEAN, "zip" TEXT,
+    CONSTRAINT "User_assigned_seller_id_fkey" FOREIGN KEY ("assigned_seller_id") REFERENCES "User" ("id")
+);''')
+    assert schema['columns'] == ['id', 'role', 'price', 'assigned_seller_id', 'address', 'is_active', 'zip']
+    assert schema['column_types']['is_active'] == 'BOOLEAN'
+
+
+def test_incremental_run_emits_rows_past_the_watermark_or_edited(tmp_path):
+    rows = ["INSERT INTO \"Order\" VALUES('o1','a, b',1757619795000);",
+            "INSERT INTO \"Order\" VALUES('o2','it''s, done',1757619796000);",
+            "INSERT INTO \"Order\" VALUES('o3',NULL,1757619797000);"]
+    state_file = str(tmp_path / 'state.json')
+
+    def run(dump_rows):
+        state = IncrementalState.load(state_file)
+        inserted = converted_rows(tmp_path, ORDERS_DUMP.format(rows='\n'.join(dump_rows)),
+                                  SQLiteToPostgreSQLConverter(incremental_state=state))
+        state.save(state_file)
+        return [row.split("VALUES('")[1].split("'")[0] for row in inserted]
+
+    assert run(rows) == ['o1', 'o2', 'o3']
+    assert run(rows) == []
+
+    # o1 moves past the watermark, o2 is edited without touching updated_at, o4 is new
+    rows[0] = rows[0].replace('1757619795000', '1757619798000')
+    rows[1] = rows[1].replace('done', 'undone')
+    rows.append("INSERT INTO \"Order\" VALUES('o4','x',1757619790000);")
+    assert run(rows) == ['o1', 'o2', 'o4']
+    assert run(rows) == []
+
+
+def test_statements_keep_newlines_inside_string_literals(tmp_path):
+    dump = tmp_path / 'dump.sql'
+    dump.write_text("INSERT INTO Note VALUES('a','one\ntwo; it''s\n);',1);\n"
+                    "INSERT INTO Note VALUES('b','plain',2);\n", encoding='utf-8')
+    expected = ["INSERT INTO Note VALUES('a','one\ntwo; it''s\n);',1);", "INSERT INTO Note VALUES('b','plain',2);"]
+
+    with MappedDump(str(dump)) as mapped:
+        assert list(mapped.iter_statements()) == expected
+    with open(dump, encoding='utf-8') as lines:
+        assert list(SQLiteToPostgreSQLConverter().iter_statements(lines)) == expected
+
+
+def test_copy_output_escapes_text_and_writes_blobs_as_bytea(tmp_path):
+    lines = converted_lines(tmp_path, FILES_DUMP, SQLiteToPostgreSQLConverter(), output_format='copy')
+    start = lines.index('COPY "File" ("id", "name", "data") FROM stdin;')
+    assert lines[start + 1:start + 4] == ['f1\ttab\\tback\\\\slash it\'s\\r\t\\\\x00FF10',
+                                          'f2\t\\N\t\\N',
+                                          '\\.']
+
+
+def test_batches_stop_at_the_row_limit_or_the_byte_limit():
+    rows = [f"('r{number}', 'ñandú')" for number in range(7)]
+    prefix = 'INSERT INTO "T" VALUES '
+
+    by_rows = SQLiteToPostgreSQLConverter(batch_size=3).pack_insert_batches('T', rows)
+    assert by_rows == [prefix + ','.join(rows[start:start + 3]) + ';' for start in (0, 3, 6)]
+
+    # Two rows and their separators fit; the limit counts UTF-8 bytes, not characters
+    limit = len(prefix) + 2 * (len(rows[0].encode('utf-8')) + 1)
+    by_bytes = SQLiteToPostgreSQLConverter(batch_size=100, max_statement_bytes=limit).pack_insert_batches('T', rows)
+    assert [statement.count("('r") for statement in by_bytes] == [2, 2, 2, 1]
+    assert max(len(statement.encode('utf-8')) for statement in by_bytes) == limit
+
+    # A row larger than the limit still gets a statement of its own
+    alone = SQLiteToPostgreSQLConverter(max_statement_bytes=10).pack_insert_batches('T', rows[:2])
+    assert alone == [prefix + rows[0] + ';', prefix + rows[1] + ';']
+
+
+def test_batch_output_is_cut_into_statements_of_batch_size_rows(tmp_path):
+    rows = '\n'.join(f"INSERT INTO \"Order\" VALUES('o{number}',NULL,1757619795000);" for number in range(7))
+    lines = converted_lines(tmp_path, ORDERS_DUMP.format(rows=rows), SQLiteToPostgreSQLConverter(batch_size=3),
+                            output_format='batch')
+    assert [line.count("('o") for line in lines if line.startswith('INSERT INTO')] == [3, 3, 1]
+
+
+@pytest.mark.parametrize('output_format', ['insert', 'batch', 'copy'])
+def test_parallel_conversion_matches_serial(tmp_path, output_format):
+    # Several chunks per table and interleaved tables, so the workers' results must be put back in order
+    rows = []
+    for number in range(1200):
+        rows.append(f"INSERT INTO \"Order\" VALUES('o{number}','n''{number}, x',{1757619795000 + number});")
+        if number % 400 == 0:
+            rows.append(f"INSERT INTO File VALUES('f{number}','a\tb',X'0{number % 10}');")
+    tables = FILES_DUMP.split('INSERT INTO')[0].split('BEGIN TRANSACTION;\n')[1]
+    dump_text = ORDERS_DUMP.format(rows='\n'.join(rows)).replace('BEGIN TRANSACTION;\n', 'BEGIN TRANSACTION;\n' + tables)
+
+    def convert(jobs):
+        lines = converted_lines(tmp_path, dump_text, SQLiteToPostgreSQLConverter(batch_size=100),
+                                output_format=output_format, jobs=jobs)
+        return [line for line in lines if not line.startswith('-- Generated on:')]
+
+    serial = convert(1)
+    assert sum(line.count("('o") + line.startswith('o') for line in serial) == 1200
+    assert convert(2) == serial
+
+
+def test_epoch_formatter_edge_cases():
+    formatter = EpochTimestampFormatter(max_cached_days=2)
+
+    def reference(epoch_ms):
+        moment = datetime.datetime(1970, 1, 1) + datetime.timedelta(milliseconds=epoch_ms)
+        return moment.strftime('%Y-%m-%d %H:%M:%S.') + f'{moment.microsecond // 1000:03d}+00'
+
+    for epoch_ms in (0, 1, 999, 1000, 86399999, 86400000, 951782400000, 1757619795123, MAX_EPOCH_MS):
+        assert formatter.format(epoch_ms) == reference(epoch_ms)
+    assert formatter.format(999) == '1970-01-01 00:00:00.999+00'
+
+    # Before the epoch or past year 9999 is left to the caller
+    assert formatter.format(-1) is None
+    assert formatter.format(MAX_EPOCH_MS + 1) is None
+    assert SQLiteToPostgreSQLConverter().convert_timestamp_from_epoch('-1000') == "'-1000'"
+
+
+def test_epoch_formatter_caches_days_up_to_its_bound():
+    formatter = EpochTimestampFormatter(max_cached_days=2)
+    day = 86400000
+    for epoch_ms in (0, 1, day, day + 1, 0, 2 * day):
+        formatter.format(epoch_ms)
+
+    info = formatter.format_day.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (3, 3, 2)
+    # Day 1 was the least recently used when day 2 came in, so it is computed again, correctly
+    assert formatter.format(day + 1) == '1970-01-02 00:00:00.001+00'
+    assert formatter.format_day.cache_info().misses == 4
+
+
+class Killed(Exception):
+    """Stands for the conversion process dying"""
+
+
+@pytest.mark.parametrize('output_format', ['insert', 'batch', 'copy'])
+def test_resume_after_a_crash_matches_an_uninterrupted_run(tmp_path, monkeypatch, output_format):
+    rows = '\n'.join(f"INSERT INTO \"Order\" VALUES('o{number}','n{number}',{1757619795000 + number});"
+                     for number in range(1000))
+    dump = tmp_path / 'dump.sql'
+    dump.write_text(ORDERS_DUMP.format(rows=rows), encoding='utf-8')
+    options = {'output_format': output_format, 'jobs': 2}
+
+    def body(path):
+        return [line for line in path.read_text(encoding='utf-8').split('\n')
+                if not line.startswith('-- Generated on:')]
+
+    expected = tmp_path / 'expected.sql'
+    SQLiteToPostgreSQLConverter(batch_size=30).convert_file(
+        str(dump), str(expected), checkpoint=ConversionCheckpoint(str(tmp_path / 'expected.json'), 150), **options)
+
+    # Die just before commit point 3 is saved: rows past commit point 2 are already in the output
+    save = ConversionCheckpoint.save
+
+    def crashing_save(checkpoint):
+        if checkpoint.number == 3:
+            raise Killed()
+        save(checkpoint)
+
+    output = tmp_path / 'out.sql'
+    state_file = str(tmp_path / 'out.json')
+    monkeypatch.setattr(ConversionCheckpoint, 'save', crashing_save)
+    with pytest.raises(Killed):
+        SQLiteToPostgreSQLConverter(batch_size=30).convert_file(
+            str(dump), str(output), checkpoint=ConversionCheckpoint(state_file, 150), **options)
+    monkeypatch.setattr(ConversionCheckpoint, 'save', save)
+    # A torn last write
+    with open(output, 'a', encoding='utf-8') as f:
+        f.write("INSERT INTO \"Order\" VALUES('o4")
+
+    checkpoint = ConversionCheckpoint(state_file, 150)
+    checkpoint.restore()
+    assert checkpoint.number == 2 and output.stat().st_size > checkpoint.output_offset
+    SQLiteToPostgreSQLConverter(batch_size=30).convert_file(str(dump), str(output), checkpoint=checkpoint,
+                                                            resume=True, **options)
+    assert checkpoint.number > 3
+    assert body(output) == body(expected)
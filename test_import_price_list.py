@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the Excel price list importer
+Run with: python -m pytest test_import_price_list.py
+"""
+
+import sqlite3
+from decimal import Decimal
+
+from import_price_list import PriceListImporter, PriceRow, ProductState
+
+
+class SQLiteConnection:
+    """A SQLite database standing in for PostgreSQL: cursors usable as context managers"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self):
+        return SQLiteCursor(self.conn.cursor())
+
+
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cursor.close()
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def execute(self, query, params=()):
+        self.cursor.execute(query, params)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+
+def product_index(with_deleted_column):
+    conn = sqlite3.connect(':memory:')
+    deleted = ', is_deleted BOOLEAN NOT NULL DEFAULT 0' if with_deleted_column else ''
+    conn.execute(f'CREATE TABLE "Product" (id TEXT, sku TEXT, price_base NUMERIC, currency TEXT, '
+                 f'stock_qty NUMERIC{deleted})')
+    conn.execute("""INSERT INTO "Product" (id, sku, price_base, currency, stock_qty) VALUES
+                    ('p1', 'A1', 10, 'USD', 5), ('p2', 'B2', 20, 'ARS', NULL)""")
+    if with_deleted_column:
+        conn.execute("UPDATE \"Product\" SET is_deleted = 1 WHERE id = 'p2'")
+    return PriceListImporter('').load_product_index(SQLiteConnection(conn))
+
+
+def test_product_index_without_soft_delete_column():
+    assert sorted(product_index(with_deleted_column=False)) == ['A1', 'B2']
+    assert sorted(product_index(with_deleted_column=True)) == ['A1']
+
+
+def test_later_row_matching_the_product_drops_the_pending_update():
+    index = {'A1': ProductState('p1', Decimal('10'), 'USD', Decimal('5'))}
+    rows = [PriceRow('A1', Decimal('12'), 'USD', None), PriceRow('A1', Decimal('10'), 'USD', None)]
+    importer = PriceListImporter('')
+    updates, mappings = importer.plan_changes(iter(rows), index)
+    assert updates == []
+    assert mappings == [('A1', 'p1')]
+    assert importer.counts['updated'] == 0
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the Prisma schema loader and its on-disk cache
+Run with: python -m pytest test_prisma_schema.py
+"""
+
+import json
+import shutil
+
+import pytest
+
+import prisma_schema
+from prisma_schema import load_prisma_schema
+
+SCHEMA_FILE = 'prisma/schema.prisma'
+
+
+@pytest.fixture
+def schema_file(tmp_path):
+    path = tmp_path / 'schema.prisma'
+    shutil.copyfile(SCHEMA_FILE, path)
+    return path
+
+
+def forbid_parsing(monkeypatch):
+    def parse(text):
+        raise AssertionError('schema parsed although the cache matches')
+    monkeypatch.setattr(prisma_schema, 'parse_prisma_schema', parse)
+
+
+def test_unchanged_schema_is_read_from_the_cache(schema_file, monkeypatch):
+    parsed = load_prisma_schema(str(schema_file))
+    assert (schema_file.parent / '.schema_cache.json').exists()
+
+    forbid_parsing(monkeypatch)
+    assert load_prisma_schema(str(schema_file)) == parsed
+
+
+def test_edited_schema_invalidates_the_cache(schema_file):
+    load_prisma_schema(str(schema_file))
+    text = schema_file.read_text(encoding='utf-8')
+    schema_file.write_text(text.replace('model Brand {\n', 'model Brand {\n  website String?\n', 1), encoding='utf-8')
+
+    columns = [column.name for column in load_prisma_schema(str(schema_file)).tables['Brand'].columns]
+    assert 'website' in columns
+
+
+@pytest.mark.parametrize('cache_text', ['not json', json.dumps({'version': -1})])
+def test_unreadable_or_outdated_cache_is_replaced(schema_file, monkeypatch, cache_text):
+    cache_file = schema_file.parent / '.schema_cache.json'
+    parsed = load_prisma_schema(str(schema_file))
+    cache_file.write_text(cache_text, encoding='utf-8')
+
+    assert load_prisma_schema(str(schema_file)) == parsed
+    forbid_parsing(monkeypatch)
+    assert load_prisma_schema(str(schema_file)) == parsed
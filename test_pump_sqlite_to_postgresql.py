@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the SQLite to PostgreSQL data pump
+Run with: python -m pytest test_pump_sqlite_to_postgresql.py
+"""
+
+import sqlite3
+
+from pump_sqlite_to_postgresql import SQLiteToPostgreSQLPump
+
+# Database whose User and Order tables gained columns through ALTER TABLE
+ALTERED_DATABASE = 'prisma/dev.db.backup'
+
+
+def test_copy_covers_every_source_column():
+    pump = SQLiteToPostgreSQLPump(ALTERED_DATABASE)
+    conn = sqlite3.connect(ALTERED_DATABASE)
+    try:
+        for table_name in pump.load_schemas(conn):
+            source_columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+            column_list = ', '.join(f'"{column}"' for column in source_columns)
+            assert pump.generate_copy_command(table_name) == f'COPY "{table_name}" ({column_list}) FROM STDIN'
+
+            for block in pump.iter_copy_data(conn, table_name):
+                for line in block.splitlines():
+                    assert len(line.split('\t')) == len(source_columns)
+    finally:
+        conn.close()
+
+
+def test_copy_timestamp_of_real_epoch_values():
+    pump = SQLiteToPostgreSQLPump(ALTERED_DATABASE)
+    assert pump.copy_timestamp(1757619795000.0) == pump.copy_timestamp(1757619795000) == '2025-09-11 19:43:15.000+00'
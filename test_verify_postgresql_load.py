@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the PostgreSQL load verifier
+Run with: python -m pytest test_verify_postgresql_load.py
+"""
+
+import shutil
+import sqlite3
+from decimal import Decimal
+
+import verify_postgresql_load
+from verify_postgresql_load import LoadVerifier, normalize_number
+
+# Database whose User and Order tables gained columns through ALTER TABLE
+ALTERED_DATABASE = 'prisma/dev.db.backup'
+
+
+class SQLiteTarget:
+    """A SQLite file standing in for the PostgreSQL side: %s placeholders and the "C" collation"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.create_collation('C', lambda a, b: (a > b) - (a < b))
+
+    def cursor(self, name=None):
+        return SQLiteCursor(self.conn.cursor())
+
+    def close(self):
+        self.conn.close()
+
+
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, query, params=()):
+        self.cursor.execute(query.replace('%s', '?'), params)
+
+    def fetchmany(self, size):
+        return self.cursor.fetchmany(size)
+
+    def close(self):
+        self.cursor.close()
+
+
+def verify(source, target, monkeypatch):
+    monkeypatch.setattr(verify_postgresql_load, 'connect_postgresql', SQLiteTarget)
+    verifier = LoadVerifier(source, target, chunk_rows=10)
+    return {result['table']: result for result in map(verifier.verify_table, verifier.tables)}
+
+
+def test_columns_added_by_alter_table_are_checksummed(tmp_path, monkeypatch):
+    target = str(tmp_path / 'target.db')
+    shutil.copyfile(ALTERED_DATABASE, target)
+    conn = sqlite3.connect(target)
+    conn.execute('UPDATE "User" SET "zip" = \'0000\' WHERE rowid = (SELECT MIN(rowid) FROM "User")')
+    conn.commit()
+    conn.close()
+
+    results = verify(ALTERED_DATABASE, target, monkeypatch)
+    assert not results['User']['ok']
+    assert all(result['ok'] for table_name, result in results.items() if table_name != 'User')
+
+
+def test_decimals_are_compared_with_every_digit():
+    assert normalize_number(Decimal('12345678901234567.89')) != normalize_number(Decimal('12345678901234567.88'))
+    assert normalize_number(Decimal('10.50')) == normalize_number(10.5) == '10.5'
+    assert normalize_number(Decimal('1E+2')) == normalize_number(100.0) == '100'
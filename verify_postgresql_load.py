@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+PostgreSQL Load Verifier
+Compares row counts and order-independent checksums of every table between the source
+(a SQLite database or a columnar dump snapshot) and the loaded PostgreSQL database,
+localizing differences to primary-key ranges
+"""
+
+import re
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+import datetime
+from bisect import bisect_right
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Any, Optional, Iterator
+
+from pump_sqlite_to_postgresql import SQLiteToPostgreSQLPump, connect_postgresql
+from prisma_schema import load_prisma_schema
+from columnar_snapshot import ColumnarSnapshot, is_snapshot
+
+# Rows per checksum chunk; a mismatch is reported for the primary-key range of its chunk
+DEFAULT_CHUNK_ROWS = 10000
+
+# Rows fetched per round trip on either side
+FETCH_SIZE = 5000
+
+# Differing chunks and rows listed per table
+MAX_REPORTED_CHUNKS = 5
+MAX_REPORTED_ROWS = 10
+
+# Tables verified at the same time, each on its own pair of connections
+DEFAULT_JOBS = 4
+
+CHECKSUM_MODULUS = 2 ** 64
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+NULL_MARKER = '\\N'
+
+# SQLite column types whose values are compared as numbers, whatever their storage class
+NUMERIC_TYPES = ('DECIMAL', 'NUMERIC', 'REAL', 'FLOAT', 'DOUBLE')
+
+
+def normalize_timestamp(value: Any) -> str:
+    """UTC epoch milliseconds of an epoch-ms number, a datetime or an ISO timestamp string"""
+    if isinstance(value, (int, float)):
+        return str(int(value))
+    if isinstance(value, str):
+        if value.isdigit():
+            return value
+        value = datetime.datetime.fromisoformat(value.replace('Z', '+00:00').replace(' ', 'T'))
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return str((value - EPOCH) // datetime.timedelta(milliseconds=1))
+    return str(value)
+
+
+def normalize_number(value: Any) -> str:
+    """Canonical text of a number, the same for SQLite REAL/INTEGER and PostgreSQL numeric"""
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    # Floats go through their shortest repr, so 10.5 and numeric 10.50 agree; Decimal keeps every digit
+    number = Decimal(repr(value)) if isinstance(value, float) else Decimal(value)
+    if not number.is_finite():
+        return str(number)
+    if number == 0:
+        return '0'
+    return format(number.normalize(), 'f')
+
+
+def normalize_value(value: Any, kind: str) -> str:
+    """Canonical text of a value, so both databases produce the same string for the same data"""
+    if value is None:
+        return NULL_MARKER
+    if kind == 'timestamp':
+        try:
+            return normalize_timestamp(value)
+        except ValueError:
+            return str(value)
+    if kind == 'boolean' or isinstance(value, bool):
+        return '1' if value in (1, True, '1', 'true', 't') else '0'
+    if isinstance(value, (int, float, Decimal)):
+        return normalize_number(value)
+    if kind == 'number':
+        # SQLite may hold a decimal column as text, e.g. '10.50'
+        try:
+            return normalize_number(Decimal(value))
+        except (ValueError, ArithmeticError):
+            return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, separators=(',', ':'))
+    if kind == 'json':
+        try:
+            return json.dumps(json.loads(value), sort_keys=True, separators=(',', ':'))
+        except ValueError:
+            return value
+    return str(value)
+
+
+def row_digest(row: Tuple[Any, ...], kinds: Tuple[str, ...]) -> int:
+    """64-bit digest of a normalized row"""
+    text = '\x1f'.join([normalize_value(value, kind) for value, kind in zip(row, kinds)])
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class LoadVerifier:
+    def __init__(self, sqlite_path: str, dsn: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                 prisma_schema: Optional[Any] = None):
+        self.sqlite_path = sqlite_path
+        self.dsn = dsn
+        self.chunk_rows = chunk_rows
+
+        # The pump reads the SQLite schema and holds the converter's column type rules
+        self.pump = SQLiteToPostgreSQLPump(sqlite_path, prisma_schema=prisma_schema)
+        self.snapshot = None
+        if is_snapshot(sqlite_path):
+            self.snapshot = ColumnarSnapshot(sqlite_path)
+            self.tables = self.load_snapshot_schemas()
+            return
+
+        sqlite_conn = sqlite3.connect(sqlite_path)
+        try:
+            self.tables = self.pump.load_schemas(sqlite_conn)
+        finally:
+            sqlite_conn.close()
+
+    def load_snapshot_schemas(self) -> List[str]:
+        """Register the snapshot's CREATE TABLE statements with the converter, returning table names in order"""
+        converter = self.pump.converter
+        tables = []
+        for statement in self.snapshot.create_statements():
+            table_name = re.match(r'CREATE TABLE IF NOT EXISTS "(\w+)"', statement).group(1)
+            converter.register_table_schema(table_name, converter.parse_table_schema(table_name, statement))
+            tables.append(table_name)
+        return tables
+
+    def column_kinds(self, table_name: str) -> Tuple[str, ...]:
+        """How each column is normalized: 'timestamp', 'boolean', 'json', 'number' or 'value'"""
+        converter = self.pump.converter
+        schema = converter.table_schemas[table_name]
+        kinds = []
+        for position, column in enumerate(schema['columns']):
+            column_type = schema['column_types'].get(column, '').split('(')[0].upper()
+            if converter.is_timestamp_column(table_name, position):
+                kinds.append('timestamp')
+            elif converter.is_boolean_column(table_name, position):
+                kinds.append('boolean')
+            elif column_type in ('JSON', 'JSONB'):
+                kinds.append('json')
+            elif column_type in NUMERIC_TYPES:
+                kinds.append('number')
+            else:
+                kinds.append('value')
+        return tuple(kinds)
+
+    def build_query(self, table_name: str, target: bool, key_range: Optional[Tuple[str, Optional[str]]] = None) -> Tuple[str, List[Any]]:
+        """SELECT of a table's columns ordered by id; PostgreSQL compares ids bytewise like SQLite"""
+        columns = self.pump.converter.table_schemas[table_name]['columns']
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        query = f'SELECT {column_list} FROM "{table_name}"'
+        if 'id' not in columns:
+            return query, []
+
+        key = '"id" COLLATE "C"' if target else '"id"'
+        placeholder = '%s' if target else '?'
+        params = []
+        if key_range is not None:
+            low, high = key_range
+            query += f' WHERE {key} >= {placeholder}'
+            params.append(low)
+            if high is not None:
+                query += f' AND {key} < {placeholder}'
+                params.append(high)
+        return query + f' ORDER BY {key}', params
+
+    def iter_rows(self, conn: Any, query: str, params: List[Any], target: bool) -> Iterator[Tuple[Any, ...]]:
+        """Stream query results, with a server-side cursor on PostgreSQL"""
+        cursor = conn.cursor(name='verify_rows') if target else conn.cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+    def checksum_chunks(self, rows: Iterator[Tuple[Any, ...]], kinds: Tuple[str, ...], id_position: Optional[int],
+                        bounds: Optional[List[str]]) -> Tuple[List[int], List[int], List[str]]:
+        """Row counts and checksums per chunk; without bounds, chunk bounds are chosen every chunk_rows ids"""
+        counts = []
+        sums = []
+        new_bounds = []
+        keys = bounds[1:] if bounds else []
+
+        for row_number, row in enumerate(rows):
+            if id_position is None:
+                chunk = 0
+            elif bounds is None:
+                chunk = row_number // self.chunk_rows
+                if chunk == len(counts):
+                    new_bounds.append(row[id_position])
+            else:
+                chunk = bisect_right(keys, row[id_position])
+            while chunk >= len(counts):
+                counts.append(0)
+                sums.append(0)
+            counts[chunk] += 1
+            sums[chunk] = (sums[chunk] + row_digest(row, kinds)) % CHECKSUM_MODULUS
+
+        return counts, sums, new_bounds
+
+    def source_rows(self, sqlite_conn: Any, table_name: str,
+                    key_range: Optional[Tuple[str, Optional[str]]] = None) -> Iterator[Tuple[Any, ...]]:
+        """Source rows ordered by id, from SQLite or read column by column from the snapshot"""
+        if self.snapshot is None:
+            query, params = self.build_query(table_name, False, key_range)
+            return self.iter_rows(sqlite_conn, query, params, False)
+
+        rows = self.snapshot.value_rows(table_name) if table_name in self.snapshot.tables else iter(())
+        columns = self.pump.converter.table_schemas[table_name]['columns']
+        if 'id' not in columns:
+            return rows
+        id_position = columns.index('id')
+        if key_range is not None:
+            low, high = key_range
+            rows = (row for row in rows if row[id_position] >= low and (high is None or row[id_position] < high))
+        # Python orders str by code point, which is the bytewise UTF-8 order SQLite uses
+        return iter(sorted(rows, key=lambda row: row[id_position]))
+
+    def target_rows(self, pg_conn: Any, table_name: str,
+                    key_range: Optional[Tuple[str, Optional[str]]] = None) -> Iterator[Tuple[Any, ...]]:
+        """PostgreSQL rows ordered by id"""
+        query, params = self.build_query(table_name, True, key_range)
+        return self.iter_rows(pg_conn, query, params, True)
+
+    def row_digests(self, rows: Iterator[Tuple[Any, ...]], kinds: Tuple[str, ...], id_position: int) -> Dict[str, int]:
+        """Digest of each row, keyed by id"""
+        return {row[id_position]: row_digest(row, kinds) for row in rows}
+
+    def verify_table(self, table_name: str) -> Dict[str, Any]:
+        """Compare one table, returning counts, checksums and the differing ranges and rows"""
+        columns = self.pump.converter.table_schemas[table_name]['columns']
+        kinds = self.column_kinds(table_name)
+        id_position = columns.index('id') if 'id' in columns else None
+
+        sqlite_conn = sqlite3.connect(self.sqlite_path) if self.snapshot is None else None
+        pg_conn = connect_postgresql(self.dsn)
+        try:
+            source_counts, source_sums, bounds = self.checksum_chunks(
+                self.source_rows(sqlite_conn, table_name), kinds, id_position, None)
+            target_counts, target_sums, _ = self.checksum_chunks(
+                self.target_rows(pg_conn, table_name), kinds, id_position, bounds or [None])
+
+            chunks = max(len(source_counts), len(target_counts))
+            source_counts += [0] * (chunks - len(source_counts))
+            source_sums += [0] * (chunks - len(source_sums))
+            target_counts += [0] * (chunks - len(target_counts))
+            target_sums += [0] * (chunks - len(target_sums))
+
+            result = {
+                'table': table_name,
+                'source_rows': sum(source_counts),
+                'target_rows': sum(target_counts),
+                'source_checksum': sum(source_sums) % CHECKSUM_MODULUS,
+                'target_checksum': sum(target_sums) % CHECKSUM_MODULUS,
+                'chunks': chunks,
+                'differing_ranges': [],
+                'differing_rows': [],
+            }
+
+            differing = [chunk for chunk in range(chunks)
+                         if (source_counts[chunk], source_sums[chunk]) != (target_counts[chunk], target_sums[chunk])]
+            for chunk in differing[:MAX_REPORTED_CHUNKS]:
+                if id_position is None or not bounds:
+                    result['differing_ranges'].append((None, None))
+                    continue
+                key_range = (bounds[chunk], bounds[chunk + 1] if chunk + 1 < len(bounds) else None)
+                result['differing_ranges'].append(key_range)
+
+                # Drill down: compare the rows of the range one by one
+                source = self.row_digests(self.source_rows(sqlite_conn, table_name, key_range), kinds, id_position)
+                target = self.row_digests(self.target_rows(pg_conn, table_name, key_range), kinds, id_position)
+                for row_id in sorted(set(source) | set(target)):
+                    if source.get(row_id) == target.get(row_id):
+                        continue
+                    if row_id not in target:
+                        problem = 'missing in PostgreSQL'
+                    elif row_id not in source:
+                        problem = 'only in PostgreSQL'
+                    else:
+                        problem = 'values differ'
+                    if len(result['differing_rows']) < MAX_REPORTED_ROWS:
+                        result['differing_rows'].append((row_id, problem))
+
+            result['ok'] = not differing
+            return result
+        finally:
+            pg_conn.close()
+            if sqlite_conn is not None:
+                sqlite_conn.close()
+
+    def run(self, tables: Optional[List[str]] = None, jobs: int = DEFAULT_JOBS) -> bool:
+        """Verify the selected tables (all by default) concurrently, printing a report"""
+        selected = [table for table in self.tables if not tables or table in tables]
+
+        def verify(table_name: str) -> Dict[str, Any]:
+            try:
+                return self.verify_table(table_name)
+            except Exception as e:
+                return {'table': table_name, 'ok': False, 'error': str(e)}
+
+        all_ok = True
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for result in executor.map(verify, selected):
+                all_ok = all_ok and result['ok']
+                self.print_result(result)
+        return all_ok
+
+    def print_result(self, result: Dict[str, Any]):
+        """Print the outcome for one table"""
+        table_name = result['table']
+        if 'error' in result:
+            print(f"  ERROR     {table_name}: {result['error']}")
+            return
+
+        status = 'OK' if result['ok'] else 'MISMATCH'
+        print(f"  {status:<9} {table_name}: {result['source_rows']} / {result['target_rows']} rows, "
+              f"checksum {result['source_checksum']:016x} / {result['target_checksum']:016x}")
+        for low, high in result['differing_ranges']:
+            if low is None:
+                print("            whole table differs")
+            else:
+                print(f"            id range [{low}, {high if high is not None else '...'})")
+        for row_id, problem in result['differing_rows']:
+            print(f"            id {row_id}: {problem}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify a PostgreSQL load against its source SQLite database')
+    parser.add_argument('sqlite_path', help='SQLite database file the load came from, e.g. prisma/dev.db, '
+                                            'or a columnar_snapshot.py snapshot of its dump')
+    parser.add_argument('dsn', help='PostgreSQL connection string, e.g. postgresql://localhost/elecsion')
+    parser.add_argument('--tables', nargs='+', help='only verify these tables')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help='tables verified at the same time')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help='rows per checksum chunk; mismatches are reported per chunk id range')
+    parser.add_argument('--prisma-schema', metavar='PATH',
+                        help='take column types from a schema.prisma file, as the load did')
+    args = parser.parse_args()
+
+    prisma_schema = load_prisma_schema(args.prisma_schema) if args.prisma_schema else None
+
+    print("Starting load verification...")
+    try:
+        verifier = LoadVerifier(args.sqlite_path, args.dsn, args.chunk_rows, prisma_schema)
+        all_ok = verifier.run(args.tables, args.jobs)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if not all_ok:
+        print("\nVerification found differences!")
+        sys.exit(1)
+    print("\nVerification completed successfully!")
+
+if __name__ == "__main__":
+    main()